@@ -0,0 +1,386 @@
+################################################## LIBRERIAS #########################################################
+import threading
+from pathlib import Path
+import numpy as np
+
+#####################################################################################################################
+############################################ RECURSOS DE LOS SETS DE MEDICIÓN ######################################
+#####################################################################################################################
+
+# Set INTI: generador HP3245A + multímetro HP3458A
+Recurso_HP3245A = "GPIB0::9::INSTR"
+Recurso_HP3458A = "GPIB0::22::INSTR"
+Aper_Time       = 3e-6
+Arranque_sincronizado_INTI = True   # Sweep del HP3458A arrancado en el flanco ascendente del HP3245A (EXT TRIG <- CHANB)
+
+# Set FRH: generador Tektronix AFG1022 + multímetro Keithley 2110
+Recurso_AFG1022     = "USB0::0x0699::0x0353::2234106::INSTR"
+Recurso_KL2110      = "USB0::0x05E6::0x2110::8018964::INSTR"
+Muestras_por_trigger = 2000
+Sweep_Time_FRH       = 0.02      # ~50 lecturas/s con NPLC 0.02
+Rafaga_FRH           = True      # AFG1022 en ráfaga disparada junto con el Keithley 2110 (sin ciclos parciales)
+Pasadas_tiempo_equivalente = 20  # Ráfagas intercaladas por registro en tiempo equivalente (intervalo efectivo Sweep_time/Pasadas)
+
+Ruta_Bloqueo_Instrumental = Path(__file__).parent / "Mediciones" / "instrumental.lock"
+
+#####################################################################################################################
+
+class Bloqueo_Instrumental:
+    """
+    Acceso exclusivo al instrumental de medición.
+    Combina un candado entre hilos del mismo proceso con un bloqueo del sistema operativo sobre
+    un archivo, de modo que otra instancia de Principal.py no pueda usar el GPIB al mismo tiempo.
+    Lo toman las campañas (Ejecutar_Campania) y la adquisición interactiva de Principal.py, desde la
+    configuración del generador hasta el último registro; se usa con "with" o con tomar() y liberar().
+    El sistema operativo libera el bloqueo del archivo aunque el proceso termine de forma abrupta.
+    """
+
+    _candado_hilos = threading.RLock()
+
+    def __init__(self, ruta=Ruta_Bloqueo_Instrumental):
+        self.ruta    = Path(ruta)
+        self.archivo = None
+
+    def __enter__(self):
+        return self.tomar()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.liberar()
+
+    def tomar(self):
+        """ Toma el instrumental o lanza RuntimeError si otra tarea o proceso lo está usando. """
+        if not self._candado_hilos.acquire(blocking=False):
+            raise RuntimeError("El instrumental ya está siendo usado por otra tarea de este proceso.")
+        try:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            self.archivo = open(self.ruta, "a+")
+            try:
+                import msvcrt
+                self.archivo.seek(0)
+                msvcrt.locking(self.archivo.fileno(), msvcrt.LK_NBLCK, 1)
+            except ImportError:
+                import fcntl
+                fcntl.flock(self.archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._liberar_archivo()
+            self._candado_hilos.release()
+            raise RuntimeError(f"El instrumental está bloqueado por otro proceso ({self.ruta}).")
+        return self
+
+    def liberar(self):
+        """ Libera el instrumental; no hace nada si ya estaba liberado. """
+        if self.archivo is None:
+            return
+        self._liberar_archivo()
+        self._candado_hilos.release()
+
+    def _liberar_archivo(self):
+        if self.archivo is None:
+            return
+        try:
+            import msvcrt
+            self.archivo.seek(0)
+            msvcrt.locking(self.archivo.fileno(), msvcrt.LK_UNLCK, 1)
+        except ImportError:
+            import fcntl
+            fcntl.flock(self.archivo.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        self.archivo.close()
+        self.archivo = None
+
+#####################################################################################################################
+################################################## SET INTI #########################################################
+#####################################################################################################################
+
+def Configurar_Generador_INTI(Frec, Sweep_time):
+    """
+    Configura el HP3245A. La salida sigue activa después de cerrar la sesión GPIB.
+    """
+    from Instrumental.HP3245A import HP3245A
+
+    with HP3245A(Recurso_HP3245A) as gen:
+        gen.configurar_generador_full(Frec=Frec, Sweep_Time=Sweep_time)
+
+
+def Demora_Sincronizada_INTI(Frec, Sweep_time):
+    """
+    Demora del sweep del HP3458A respecto del flanco de la entrada EXT TRIG (cableada a la cuadrada de 5 V del
+    CHANB, en fase con el CHANA por PHSYNC). El HP3458A dispara en el flanco descendente, que es el inicio de una
+    descarga; la carga empieza medio período después. El sweep arranca un poco antes de ese flanco ascendente:
+    Semiciclos_Fase verifica cada borde con muestras a Margen_fase períodos de distancia, así que un registro que
+    empieza justo en el flanco pierde la primera carga. Con el anticipo de Margen_fase períodos más dos muestras
+    la primera carga es el primer semiciclo del registro y los bordes quedan en posiciones fijas.
+    Sin Arranque_sincronizado_INTI o sin la frecuencia devuelve None (el sweep arranca en cualquier fase).
+    """
+    if not Arranque_sincronizado_INTI or Frec is None:
+        return None
+    import Funciones_Medicion
+
+    anticipo = (max(2, round(Funciones_Medicion.Margen_fase/(Frec*Sweep_time))) + 2)*Sweep_time
+    return max(0.0, 1/(2*Frec) - anticipo)
+
+
+def Verificar_Arranque_INTI(registro, Sweep_time, Frec):
+    """
+    Comprueba que un registro con arranque sincronizado empiece en la primera carga: el primer semiciclo de carga
+    que ubica Semiciclos_Fase tiene que ser válido y empezar dentro del primer medio período. Si no, avisa (el
+    cable de EXT TRIG o la fase del HP3245A no son los esperados) y devuelve False.
+    """
+    import Funciones_Medicion
+
+    if Demora_Sincronizada_INTI(Frec, Sweep_time) is None:
+        return True
+    try:
+        Fase = Funciones_Medicion.Semiciclos_Fase(registro, Sweep_time, Frec, *Funciones_Medicion.Umbrales_Registro(registro))
+        correcto = bool(Fase["Valido"][0]) and Fase["Inicio"][0] < Fase["Periodo"]/2
+    except (ValueError, IndexError):
+        correcto = False
+    if not correcto:
+        print("[AVISO] El registro sincronizado no empieza en una carga completa: revisar la conexión CHANB -> EXT TRIG.")
+    return correcto
+
+
+def Medir_Tension_INTI(Cant_Muestras, Sweep_time, aper_time=Aper_Time, Frec=None):
+    """
+    Realiza un sweep con el HP3458A sin graficar (apto para mediciones desatendidas).
+    Con la frecuencia del generador el sweep arranca sincronizado (ver Demora_Sincronizada_INTI).
+    """
+    from Instrumental.HP3458A import HP3458A
+
+    with HP3458A(Recurso_HP3458A, verbose=False) as dvm:
+        registro = dvm.Medicion_de_Tension(Cant_Muestras, Sweep_time, aper_time, Demora_Sincronizada_INTI(Frec, Sweep_time))
+    Verificar_Arranque_INTI(registro, Sweep_time, Frec)
+    return registro
+
+
+def Medir_Codigos_INTI(Cant_Muestras, Sweep_time, aper_time=Aper_Time, Frec=None):
+    """
+    Igual que Medir_Tension_INTI pero devuelve los códigos SINT (int16) y el factor de escala ISCALE.
+    """
+    from Instrumental.HP3458A import HP3458A
+
+    with HP3458A(Recurso_HP3458A, verbose=False) as dvm:
+        codigos, escala = dvm.Medicion_de_Codigos(Cant_Muestras, Sweep_time, aper_time, Demora_Sincronizada_INTI(Frec, Sweep_time))
+    Verificar_Arranque_INTI(codigos, Sweep_time, Frec)
+    return codigos, escala
+
+#####################################################################################################################
+################################################## SET FRH ##########################################################
+#####################################################################################################################
+
+def Configurar_Generador_FRH(Frec):
+    """
+    Configura el AFG1022: canal 1 cuadrada de medición y canal 2 pulso TTL de disparo.
+    """
+    from Instrumental.AFG1022 import TektronixAFG1022
+
+    afg = TektronixAFG1022(Recurso_AFG1022)
+    try:
+        afg.reset()
+        afg.modo_independiente()
+        afg.configurar_senal_medida(Frec)
+        afg.configurar_trigger_ttl(Frec)
+        afg.sincronizar_canales()
+        afg.iniciar_salidas()
+    finally:
+        afg.close()
+
+
+def Medir_Tension_FRH(Cant_Muestras=Muestras_por_trigger, NPLC=0.02):
+    """
+    Mide con el Keithley 2110 disparado por el pulso TTL del AFG1022.
+    NPLC: 0.02 (rápido), 1 (normal) o 10 (preciso).
+    """
+    from Instrumental.KL2110 import Keithley2110
+
+    dmm = Keithley2110(Recurso_KL2110)
+    try:
+        dmm.reset()
+        dmm.configurar_dc_range(rango=10)
+        modos = {0.02: dmm.configurar_fast_mode, 1: dmm.configurar_normal_mode, 10: dmm.configurar_precise_mode}
+        if NPLC not in modos:
+            raise ValueError(f"NPLC {NPLC} no soportado por el Keithley 2110.")
+        modos[NPLC]()
+        dmm.configurar_trigger_externo(muestras=Cant_Muestras)
+        return np.asarray(dmm.medir_por_trigger())
+    finally:
+        dmm.close()
+
+
+def Ciclos_Rafaga_FRH(Frec, Cant_Muestras, Sweep_time):
+    """
+    Ciclos enteros del generador que entran en Cant_Muestras lecturas y lecturas que los cubren.
+    """
+    ciclos = int(Cant_Muestras*Sweep_time*Frec)
+    if ciclos < 1:
+        raise ValueError("Cant_Muestras no alcanza para un ciclo completo del generador.")
+    return ciclos, int(ciclos/(Frec*Sweep_time) + 1e-9)
+
+
+def Medir_Rafaga_FRH(Frec, Cant_Muestras=Muestras_por_trigger, NPLC=0.02, Sweep_time=Sweep_Time_FRH):
+    """
+    Medición del set FRH sincronizada con la ráfaga del AFG1022: se arma el Keithley 2110, se dispara una
+    ráfaga de ciclos enteros y el pulso TTL del canal 2 inicia la medición en el primer flanco. La cantidad
+    de lecturas se recorta a los ciclos completos que entran en Cant_Muestras, así que ninguna lectura cae
+    en un ciclo parcial. Deja el AFG1022 en modo ráfaga (Configurar_Generador_FRH lo vuelve a continuo).
+    """
+    from Instrumental.AFG1022 import TektronixAFG1022
+    from Instrumental.KL2110 import Keithley2110
+
+    ciclos, muestras = Ciclos_Rafaga_FRH(Frec, Cant_Muestras, Sweep_time)
+
+    afg = TektronixAFG1022(Recurso_AFG1022)
+    dmm = Keithley2110(Recurso_KL2110)
+    try:
+        afg.reset()
+        afg.modo_independiente()
+        afg.configurar_rafaga(Frec, ciclos)
+        afg.iniciar_salidas()
+
+        dmm.reset()
+        dmm.configurar_dc_range(rango=10)
+        dmm.configurar_nplc(NPLC)
+        dmm.configurar_trigger_externo(muestras=muestras)
+        dmm.armar()
+        afg.disparar_rafaga()
+        return dmm.leer(duracion_estimada=ciclos/Frec)
+    finally:
+        dmm.close()
+        afg.close()
+
+def Adquirir_Tiempo_Equivalente(afg, dmm, Frec, ciclos, muestras, Pasadas=Pasadas_tiempo_equivalente, Sweep_time=Sweep_Time_FRH):
+    """
+    Adquisición en tiempo equivalente con el AFG1022 en ráfaga (configurar_rafaga) y el multímetro ya configurado
+    con trigger externo de `muestras` lecturas. La pasada p demora el pulso de disparo p/Pasadas intervalos de
+    muestreo, así que las lecturas de todas las pasadas intercaladas forman un registro de los mismos `ciclos`
+    períodos con un intervalo Pasadas veces menor. El intervalo real del multímetro se mide en la primera pasada
+    (Estimar_Intervalo_Muestreo, error relativo de 3e-5 a 1e-4) y se afina sobre el registro intercalado; si alguna
+    de las dos mediciones falla se avisa y se usa Sweep_time o el intervalo de la primera pasada.
+    Retorna: (registro, intervalo efectivo entre muestras).
+    """
+    import Funciones_Medicion
+
+    def pasada(demora):
+        afg.configurar_demora_trigger(demora)
+        dmm.armar()
+        afg.disparar_rafaga()
+        return dmm.leer(duracion_estimada=ciclos/Frec + demora)
+
+    lecturas = [pasada(0)]
+    try:
+        intervalo = Funciones_Medicion.Estimar_Intervalo_Muestreo(lecturas[0], Sweep_time, Frec)
+    except ValueError as e:
+        print(f"[AVISO] No se pudo medir el intervalo entre lecturas ({e}); se usa el nominal {Sweep_time} s.")
+        intervalo = Sweep_time
+    if muestras*intervalo > ciclos/Frec:
+        # Con el intervalo real las lecturas se salen de la ráfaga: se descartan las que sobran
+        muestras = int(ciclos/(Frec*intervalo))
+    lecturas += [pasada(p*intervalo/Pasadas) for p in range(1, Pasadas)]
+    registro  = Funciones_Medicion.Intercalar_Tiempo_Equivalente([l[:muestras] for l in lecturas])
+
+    # El registro intercalado tiene flancos Pasadas veces mejor resueltos: el intervalo efectivo se vuelve a medir sobre él
+    try:
+        return registro, Funciones_Medicion.Estimar_Intervalo_Muestreo(registro, intervalo/Pasadas, Frec)
+    except ValueError as e:
+        print(f"[AVISO] No se pudo medir el intervalo del registro intercalado ({e}); se usa el de la primera pasada "
+              f"{intervalo/Pasadas} s, con un error relativo de hasta 1e-4.")
+        return registro, intervalo/Pasadas
+
+
+def Medir_Tiempo_Equivalente_FRH(Frec, Cant_Muestras=Muestras_por_trigger, Pasadas=Pasadas_tiempo_equivalente, NPLC=0.02,
+                                 Sweep_time=Sweep_Time_FRH):
+    """
+    Registro en tiempo equivalente del set FRH (ver Adquirir_Tiempo_Equivalente): Cant_Muestras lecturas por pasada,
+    Pasadas ráfagas. Retorna (registro, intervalo efectivo entre muestras); el registro tiene Pasadas veces más
+    muestras de los mismos ciclos y se analiza con ese intervalo en lugar de Sweep_time.
+    """
+    from Instrumental.AFG1022 import TektronixAFG1022
+    from Instrumental.KL2110 import Keithley2110
+
+    ciclos, muestras = Ciclos_Rafaga_FRH(Frec, Cant_Muestras, Sweep_time)
+
+    afg = TektronixAFG1022(Recurso_AFG1022)
+    dmm = Keithley2110(Recurso_KL2110)
+    try:
+        afg.reset()
+        afg.modo_independiente()
+        afg.configurar_rafaga(Frec, ciclos)
+        afg.iniciar_salidas()
+
+        dmm.reset()
+        dmm.configurar_dc_range(rango=10)
+        dmm.configurar_nplc(NPLC)
+        dmm.configurar_trigger_externo(muestras=muestras)
+        return Adquirir_Tiempo_Equivalente(afg, dmm, Frec, ciclos, muestras, Pasadas, Sweep_time)
+    finally:
+        dmm.close()
+        afg.close()
+
+#####################################################################################################################
+############################################ SELECCIÓN POR SET ######################################################
+#####################################################################################################################
+
+def Configurar_Generador(Modo, Frec, Sweep_time):
+    if Modo == "Set INTI":
+        Configurar_Generador_INTI(Frec, Sweep_time)
+    elif Modo == "Set FRH":
+        Configurar_Generador_FRH(Frec)
+    else:
+        raise ValueError(f"Set de medición '{Modo}' no soportado.")
+
+
+def Medir_Tension(Modo, Cant_Muestras, Sweep_time, Apertura=None, Frec=None):
+    """
+    Apertura: tiempo de apertura del HP3458A en el set INTI o NPLC del Keithley 2110 en el set FRH
+    (None usa Aper_Time o NPLC 0.02).
+    En el set INTI, con la frecuencia del generador el sweep arranca en el flanco ascendente (Arranque_sincronizado_INTI).
+    En el set FRH, con Rafaga_FRH y la frecuencia del generador, la medición es por ráfaga (Medir_Rafaga_FRH).
+    """
+    if Modo == "Set INTI":
+        return Medir_Tension_INTI(Cant_Muestras, Sweep_time, Aper_Time if Apertura is None else Apertura, Frec)
+    elif Modo == "Set FRH":
+        if Rafaga_FRH and Frec is not None:
+            return Medir_Rafaga_FRH(Frec, Cant_Muestras, 0.02 if Apertura is None else Apertura, Sweep_time)
+        return Medir_Tension_FRH(Cant_Muestras, 0.02 if Apertura is None else Apertura)
+    else:
+        raise ValueError(f"Set de medición '{Modo}' no soportado.")
+
+
+
+def Medir_Registro(Modo, Cant_Muestras, Sweep_time, Apertura=None, Frec=None):
+    """
+    Como Medir_Tension pero conserva el formato nativo del multímetro: devuelve (registro, Escala).
+    En el set INTI son los códigos SINT del HP3458A y su ISCALE; en el set FRH el Keithley 2110 entrega
+    lecturas en volt y Escala es None.
+    """
+    if Modo == "Set INTI":
+        return Medir_Codigos_INTI(Cant_Muestras, Sweep_time, Aper_Time if Apertura is None else Apertura, Frec)
+    return Medir_Tension(Modo, Cant_Muestras, Sweep_time, Apertura, Frec), None
+
+#####################################################################################################################
+############################################ ADQUISICIÓN SECUENCIAL #################################################
+#####################################################################################################################
+
+def Medir_Secuencial(Modo, Sweep_time, Frec, Rp, Vn_Cx, Vn_Rp, Objetivo_uc_porcentual, Apertura=None, **opciones):
+    """
+    Adquisición por bloques hasta alcanzar la incertidumbre objetivo (ver Funciones_Medicion.Adquisicion_Secuencial).
+    En el set INTI la sesión con el HP3458A queda abierta entre bloques; en el set FRH cada bloque
+    es un disparo del Keithley 2110 de Muestras_por_trigger lecturas.
+    """
+    import Funciones_Medicion
+
+    if Modo == "Set INTI":
+        from Instrumental.HP3458A import HP3458A
+
+        with HP3458A(Recurso_HP3458A, verbose=False) as dvm:
+            return Funciones_Medicion.Adquisicion_Secuencial(
+                lambda n: dvm.Medicion_de_Tension(n, Sweep_time, Aper_Time if Apertura is None else Apertura, Demora_Sincronizada_INTI(Frec, Sweep_time)),
+                Sweep_time, Frec, Rp, Vn_Cx, Vn_Rp, Objetivo_uc_porcentual, **opciones)
+    elif Modo == "Set FRH":
+        opciones.setdefault("Muestras_por_bloque", Muestras_por_trigger)
+        NPLC = 0.02 if Apertura is None else Apertura
+        return Funciones_Medicion.Adquisicion_Secuencial(
+            lambda n: Medir_Tension_FRH(n, NPLC), Sweep_time, Frec, Rp, Vn_Cx, Vn_Rp, Objetivo_uc_porcentual, **opciones)
+    else:
+        raise ValueError(f"Set de medición '{Modo}' no soportado.")
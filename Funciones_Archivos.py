@@ -3,6 +3,7 @@ import os
 import sys 
 import json
 import datetime
+import threading
 from time import sleep
 import numpy as np
 import pandas as pd
@@ -38,30 +39,38 @@ def Menu_Inicial():
     print("--- Modo de aplicación ---\n") 
     print("1. Medir y calibrar")
     print("2. Calcular desde una medición ya existente")
+    print("3. Ejecutar una campaña de mediciones")
     while True:
             
-            opcion = input("Introducir modo (1 o 2):")
+            opcion = input("Introducir modo (1, 2 o 3):")
             if opcion ==   '1' :
                 break
                  
             elif opcion == '2':
                 break
             
+            elif opcion == '3':
+                break
+            
             else:
                 limpiar_pantalla()
                 print("--- Modo de aplicación ---\n") 
                 print("1. Medir y calibrar")
                 print("2. Calcular desde una medición ya existente")
+                print("3. Ejecutar una campaña de mediciones")
                       
     return opcion   
 #####################################################################################################################
 
 def Ruta_de_analisis_existente():
-    # --- pedir y validar ruta del generador ---
+    # --- pedir y validar ruta del generador (vacía para el modo de registro único) ---
     limpiar_pantalla()
     while True:
-        ruta_generador_str = input("Introducir la ruta de archivo de medición de generador:\n")
+        ruta_generador_str = input("Introducir la ruta de archivo de medición de generador (Enter si es registro único):\n")
         ruta_generador = Path(ruta_generador_str)
+        if ruta_generador_str.strip() == "":
+            ruta_generador = None
+            break
         if ruta_generador.exists():
             ruta_generador = ruta_generador.resolve()  # normalizar ruta absoluta
             break
@@ -88,13 +97,27 @@ def Ruta_de_analisis_existente():
             print("⚠️ La ruta no existe o está mal escrita. Intente de nuevo.\n")
 
     # --- obtener nombres de archivo ---
-    nombre_archivo_generador = ruta_generador.name  # solo el nombre con extensión
+    nombre_archivo_generador = ruta_generador.name if ruta_generador else None  # solo el nombre con extensión
     nombre_archivo_curva = ruta_curva_carga.name
     nombre_archivo_config = ruta_curva_config.name
 
-    return (str(ruta_generador), str(ruta_curva_carga),str(ruta_curva_config),
+    return (str(ruta_generador) if ruta_generador else None, str(ruta_curva_carga),str(ruta_curva_config),
             nombre_archivo_generador, nombre_archivo_curva, nombre_archivo_config)
 
+#####################################################################################################################
+
+def Ruta_de_campania():
+    """
+    Pide y valida la ruta del archivo JSON con la lista de trabajos de la campaña.
+    """
+    limpiar_pantalla()
+    while True:
+        ruta_campania = Path(input("Introducir la ruta del archivo de trabajos de la campaña:\n"))
+        if ruta_campania.exists():
+            return str(ruta_campania.resolve())
+        else:
+            print("⚠️ La ruta no existe o está mal escrita. Intente de nuevo.\n")
+
 #####################################################################################################################
 def extraccion_datos(ruta_json):
     """
@@ -122,15 +145,38 @@ def extraccion_datos(ruta_json):
 
 #####################################################################################################################
 
-def Ruta_de_analisis_nuevo():
+# Último instante entregado como identificador de corrida (compartido entre hilos)
+_bloqueo_id_corrida = threading.Lock()
+_ultimo_id_corrida  = None
+
+def Generar_ID_Corrida():
+    """
+    Devuelve un identificador de corrida con resolución de microsegundos.
+    Si dos pedidos caen en el mismo microsegundo se avanza el reloj en 1 us,
+    de modo que los identificadores generados por el proceso son estrictamente crecientes.
+    """
+    global _ultimo_id_corrida
+
+    with _bloqueo_id_corrida:
+        fecha_actual = datetime.datetime.now()
+        if _ultimo_id_corrida is not None and fecha_actual <= _ultimo_id_corrida:
+            fecha_actual = _ultimo_id_corrida + datetime.timedelta(microseconds=1)
+        _ultimo_id_corrida = fecha_actual
+
+    return fecha_actual.strftime("Medicion_%Y-%m-%d_%H-%M-%S-%f")
+
+#####################################################################################################################
+
+def Ruta_de_analisis_nuevo(id_corrida=None):
+    """
+    Entrada: Identificador de corrida opcional (si no se indica se genera uno nuevo).
+    Salida: Rutas del archivo del generador, del capacitor y de configuración.
+    Función: Crea las carpetas de medición y reserva el archivo de configuración de la corrida.
+             La reserva se hace con creación exclusiva, así dos procesos nunca comparten nombre.
+    """
     # Base de ejecución
     base_path = Path(__file__).parent
 
-    # Timestamp para nombre del archivo
-    fecha_actual = datetime.datetime.now()
-    nombre_archivo = fecha_actual.strftime("Medicion_%Y-%m-%d_%H-%M-%S.txt")
-    nombre_archivo_config = fecha_actual.strftime("Medicion_%Y-%m-%d_%H-%M-%S.json")
-
     # Carpetas
     carpeta_mediciones = base_path / "Mediciones" 
 
@@ -145,16 +191,38 @@ def Ruta_de_analisis_nuevo():
     Carpeta_Mediciones_Carga.mkdir(parents=True, exist_ok=True)
     Carpeta_Mediciones_Config.mkdir(parents=True, exist_ok=True)
 
+    # Reserva del nombre: si el archivo ya existe (otro proceso) se pide un identificador nuevo
+    while True:
+        if id_corrida is None:
+            id_corrida = Generar_ID_Corrida()
+        ruta_medicion_Config = Carpeta_Mediciones_Config / f"{id_corrida}.json"
+        try:
+            with open(ruta_medicion_Config, "x"):
+                pass
+            break
+        except FileExistsError:
+            id_corrida = None
 
     # Ruta final del archivo de Medición
-    ruta_medicion_generador = Carpeta_Mediciones_Generador / nombre_archivo
-    ruta_medicion_CargayDescarga = Carpeta_Mediciones_Carga / nombre_archivo
-
-    # Ruta final del archivo de Configuración
-    ruta_medicion_Config = Carpeta_Mediciones_Config / nombre_archivo_config
+    ruta_medicion_generador = Carpeta_Mediciones_Generador / f"{id_corrida}.txt"
+    ruta_medicion_CargayDescarga = Carpeta_Mediciones_Carga / f"{id_corrida}.txt"
  
     return str(ruta_medicion_generador), str(ruta_medicion_CargayDescarga), str(ruta_medicion_Config)
 
+#####################################################################################################################
+def Liberar_Ruta_de_analisis(ruta_config):
+    """
+    Entrada: Ruta de configuración reservada por Ruta_de_analisis_nuevo.
+    Salida: True si se borró la reserva.
+    Función: Si la corrida falló antes de Guardar_Medicion_Config el archivo de configuración sigue vacío;
+             se borra para no dejar corridas sin datos en Config.
+    """
+    ruta = Path(ruta_config)
+    if ruta.exists() and ruta.stat().st_size == 0:
+        ruta.unlink()
+        return True
+    return False
+
 #####################################################################################################################
 def Menu_Instrumental():
     
@@ -180,6 +248,47 @@ def Menu_Instrumental():
         
     return opcion   
 
+#####################################################################################################################
+def Menu_Adquisicion():
+    
+    while True:
+        print("Seleccionar modo de adquisición \n")
+        print("1. Registro único (V_max estimado desde el capacitor)")
+        print("2. Dos registros (generador y capacitor)")
+        print("3. Secuencial (registro único hasta alcanzar una incertidumbre objetivo)")
+        limpiar_teclado()
+        opcion_adquisicion = input("Introducir modo (1, 2 o 3):")
+        
+        if opcion_adquisicion == "1":
+            opcion = "REGISTRO_UNICO"
+            break
+        elif opcion_adquisicion == "2":
+            opcion = "DOS_REGISTROS"
+            break  
+        elif opcion_adquisicion == "3":
+            opcion = "SECUENCIAL"
+            break  
+        
+        else:
+            limpiar_pantalla()
+        
+    return opcion   
+
+#####################################################################################################################
+def Objetivo_Incertidumbre():
+    """
+    Pide la incertidumbre objetivo (%) y el presupuesto de muestras de la adquisición secuencial.
+    """
+    while True:
+        try:
+            objetivo     = float(input("Incertidumbre objetivo uc (%): "))
+            max_muestras = int(input("Máxima cantidad de muestras: "))
+            if objetivo > 0 and max_muestras > 0:
+                return objetivo, max_muestras
+        except ValueError:
+            pass
+        print("Valores inválidos, intentar nuevamente.")
+
 #####################################################################################################################
 def Menu_Config():   
     
@@ -215,11 +324,28 @@ def Configuracion():
         
     limpiar_pantalla()
                         
-    Vn_Tau, Frec, Sweep_time, Cantidad_Ciclos = Funciones_Medicion.Calculo_Ciclos(Vn_Cx,Vn_Rp,Tau_x_ciclo)              
+    Plan = Funciones_Medicion.Planificar_Adquisicion(Vn_Cx,Vn_Rp,tau_por_ciclo_on=Tau_x_ciclo)
+    Mostrar_Plan(Plan)
+    input("Presionar Enter para continuar")
         
     limpiar_pantalla()
         
-    return Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time ,Cantidad_Ciclos   
+    return Vn_Cx, Vn_Rp, Plan["tau"], Plan["Frec"], Plan["Sweep_time"], Plan["Ciclos"], Plan["Cant_Muestras"], Plan["Apertura"]
+#####################################################################################################################
+
+def Mostrar_Plan(Plan):
+    
+    print("\n--- Plan de adquisición ---\n") 
+    print(f"Frecuencia del generador          : {Plan['Frec']} Hz")
+    print(f"Tiempo entre muestras             : {Plan['Sweep_time']} s")
+    print(f"Apertura                          : {Plan['Apertura']}")
+    print(f"Cantidad de muestras              : {Plan['Cant_Muestras']}")
+    print(f"Ciclos útiles previstos           : {Plan['Ciclos']}")
+    print(f"Muestras por ventana              : {Plan['Muestras_por_ventana']}")
+    print(f"Duración del registro             : {Plan['Tiempo_total']:.3f} s")
+    print(f"Incertidumbre prevista            : {Plan['uc_porcentual']:.5f} %")
+    for advertencia in Plan["Advertencias"]:
+        print(f"[ADVERTENCIA] {advertencia}")
 #####################################################################################################################
 
 def Mostrar_Configuracion(Modo, Vn_Cx, Vn_Rp, Vn_Tau, Frec):
@@ -276,6 +402,86 @@ def Guardar_Medicion(Ruta_Guardado,Medicion_Realizada):
 
 ###################################################################################################################
 
+def Guardar_Codigos(Ruta_Guardado,Codigos,Escala):
+    """
+    Entrada: Ruta de la medición (se usa la misma con extensión .npy), códigos SINT y factor de escala ISCALE.
+    Salida: Ruta del archivo .npy guardado.
+    Función: Guarda el registro como int16 (2 bytes por muestra en lugar de un texto o un float64) y los
+             metadatos en un .json con el mismo nombre; la tensión es código * Escala.
+    """
+    ruta_npy = Path(Ruta_Guardado).with_suffix(".npy")
+    np.save(ruta_npy, np.asarray(Codigos, dtype=np.int16))
+    with open(ruta_npy.with_suffix(".json"), "w") as json_file:
+        json.dump({"Formato": "SINT", "Escala": float(Escala), "Muestras": len(Codigos)}, json_file, indent=4)
+    return str(ruta_npy)
+
+###################################################################################################################
+
+def Guardar_Registro(Ruta_Guardado,Medicion_Realizada,Escala=None):
+    """
+    Guarda un registro de códigos SINT con Guardar_Codigos y uno en volt con Guardar_Medicion.
+    Salida: Ruta del archivo guardado.
+    """
+    if Escala is None:
+        Guardar_Medicion(Ruta_Guardado, Medicion_Realizada)
+        return str(Ruta_Guardado)
+    return Guardar_Codigos(Ruta_Guardado, Medicion_Realizada, Escala)
+
+###################################################################################################################
+
+def Guardar_Calidad_Ciclos(Ruta_Registro,Tabla):
+    """
+    Entrada: Ruta del registro del capacitor y tabla de calidad por ciclo (Funciones_Medicion.Tabla_Calidad).
+    Salida: Ruta del .csv guardado junto al registro (<nombre>_calidad.csv).
+    """
+    ruta_csv = Path(Ruta_Registro).with_name(Path(Ruta_Registro).stem + "_calidad.csv")
+    pd.DataFrame(Tabla).to_csv(ruta_csv, index=False)
+    return str(ruta_csv)
+
+###################################################################################################################
+
+def Cargar_Registro(ruta_archivo,mmap=True):
+    """
+    Entrada: Ruta de un registro .npy (códigos SINT con su .json) o de texto (un valor en volt por línea).
+    Salida: Registro y factor de escala (None si el registro ya está en volt).
+    Función: Los .npy se abren mapeados en memoria por defecto, sin convertirlos a float.
+    """
+    ruta = Path(ruta_archivo)
+    if ruta.suffix != ".npy":
+        return np.loadtxt(ruta), None
+    with open(ruta.with_suffix(".json"), "r") as json_file:
+        metadatos = json.load(json_file)
+    return np.load(ruta, mmap_mode="r" if mmap else None), metadatos["Escala"]
+
+###################################################################################################################
+
+def Cargar_Piramide(ruta_archivo,Registro=None):
+    """
+    Entrada: Ruta de un registro .npy y, opcionalmente, el registro ya abierto.
+    Salida: Pirámide de mínimos y máximos (Funciones_Medicion.Piramide_MinMax) del registro.
+    Función: La pirámide se guarda junto al registro como <nombre>.piramide.npz y se reutiliza mientras
+             sea más nueva que el registro; si no existe o quedó vieja se calcula y se guarda.
+    """
+    ruta     = Path(ruta_archivo)
+    ruta_npz = ruta.with_suffix(".piramide.npz")
+
+    if ruta_npz.exists() and ruta_npz.stat().st_mtime >= ruta.stat().st_mtime:
+        with np.load(ruta_npz) as datos:
+            niveles = [(datos[f"min_{i}"], datos[f"max_{i}"]) for i in range(int(datos["niveles"]))]
+            return {"Factor": int(datos["factor"]), "Muestras": int(datos["muestras"]), "Niveles": niveles}
+
+    if Registro is None:
+        Registro, _ = Cargar_Registro(ruta)
+    Piramide = Funciones_Medicion.Piramide_MinMax(Registro)
+    arreglos = {}
+    for i, (minimos, maximos) in enumerate(Piramide["Niveles"]):
+        arreglos[f"min_{i}"] = minimos
+        arreglos[f"max_{i}"] = maximos
+    np.savez(ruta_npz, factor=Piramide["Factor"], muestras=Piramide["Muestras"], niveles=len(Piramide["Niveles"]), **arreglos)
+    return Piramide
+
+###################################################################################################################
+
 def Guardar_Medicion_Config(Ruta_Config, Modo,Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time):
     """
     Guardar los datos de la medición en un archivo de texto
@@ -0,0 +1,255 @@
+################################################## LIBRERIAS #########################################################
+import csv
+import json
+import datetime
+from pathlib import Path
+import numpy as np
+import Funciones_Archivos
+import Funciones_Medicion
+import Funciones_Adquisicion
+
+#####################################################################################################################
+
+Tau_x_ciclo   = 5
+Bootstrap     = True   # Intervalo percentil de Cx por bootstrap sobre ciclos en cada corrida
+Reintentos_Triage = 1  # Nuevas adquisiciones del capacitor si el triage rechaza el registro
+Segmentacion  = "UMBRAL" # Segmentación de ciclos del registro único (ver Funciones_Medicion.Segmentar_Ciclos)
+
+Columnas_Campania = [
+    "ID_Corrida", "Fecha", "Trabajo", "Repeticion", "Modo", "Registro_Unico", "Metodo", "Vn_Cx", "Vn_Rp", "Frec", "Sweep_time",
+    "V_max", "V_max_std", "Ciclos_validos", "Cx_uF", "uc_uF", "uc_porcentual", "Cx_IC_inf_uF", "Cx_IC_sup_uF", "Muestras", "Motivo", "Estado",
+    "Ruta_Generador", "Ruta_Capacitor", "Ruta_Config", "Ruta_Calidad",
+]
+
+#####################################################################################################################
+
+def Normalizar_Trabajo(trabajo):
+    """
+    Entrada: Trabajo como tupla (Vn_Cx, Vn_Rp, Modo, Repeticiones) o como diccionario con esas claves.
+    Salida: Diccionario con las claves Vn_Cx, Vn_Rp, Modo, Repeticiones y Registro_Unico.
+            Por defecto se usa el registro único, que no requiere cambiar la llave entre mediciones.
+            Con la clave opcional Objetivo_uc_porcentual la corrida es secuencial: se adquiere por bloques
+            hasta alcanzar esa incertidumbre o agotar Max_Muestras.
+            Metodo elige el cálculo de tau: "LINEALIZACION" (por defecto), "SINCRONICO", "EXPONENCIAL", "ARMONICOS" o "INTEGRAL".
+    """
+    if isinstance(trabajo, dict):
+        datos = dict(trabajo)
+    else:
+        Vn_Cx, Vn_Rp, Modo, Repeticiones = trabajo
+        datos = {"Vn_Cx": Vn_Cx, "Vn_Rp": Vn_Rp, "Modo": Modo, "Repeticiones": Repeticiones}
+
+    datos.setdefault("Modo", "Set INTI")
+    datos.setdefault("Repeticiones", 1)
+    datos.setdefault("Registro_Unico", True)
+    datos.setdefault("Objetivo_uc_porcentual", None)
+    datos.setdefault("Max_Muestras", 100000)
+    datos.setdefault("Metodo", "LINEALIZACION")
+
+    if datos["Modo"] not in ("Set INTI", "Set FRH"):
+        raise ValueError(f"Set de medición '{datos['Modo']}' no soportado.")
+    if int(datos["Repeticiones"]) < 1:
+        raise ValueError("La cantidad de repeticiones debe ser al menos 1.")
+    if datos["Metodo"] not in ("LINEALIZACION", "SINCRONICO") and datos["Metodo"] not in Funciones_Medicion.Metodos_Sin_Vmax:
+        raise ValueError(f"Método de ajuste '{datos['Metodo']}' no soportado.")
+    if datos["Objetivo_uc_porcentual"] is not None and not datos["Registro_Unico"]:
+        raise ValueError("La adquisición secuencial solo está disponible con registro único.")
+
+    datos["Repeticiones"] = int(datos["Repeticiones"])
+    return datos
+
+#####################################################################################################################
+
+def Cargar_Campania(ruta_json):
+    """
+    Lee un archivo JSON con la lista de trabajos de una campaña, por ejemplo:
+    [{"Vn_Cx": 207, "Vn_Rp": 100, "Modo": "Set INTI", "Repeticiones": 3}, ...]
+    """
+    ruta = Path(ruta_json)
+    if not ruta.exists():
+        raise FileNotFoundError(f"No se encontró el archivo: {ruta_json}")
+
+    with open(ruta, "r") as file:
+        trabajos = json.load(file)
+
+    return [Normalizar_Trabajo(trabajo) for trabajo in trabajos]
+
+#####################################################################################################################
+
+def Ruta_Tabla_Campania(id_campania):
+    carpeta = Path(__file__).parent / "Mediciones" / "Campanias"
+    carpeta.mkdir(parents=True, exist_ok=True)
+    return carpeta / f"Campania_{id_campania}.csv"
+
+
+def Agregar_Fila_Campania(ruta_tabla, fila):
+    """
+    Agrega una fila a la tabla de la campaña. El encabezado se escribe solo al crear el archivo,
+    así la tabla queda completa hasta el último trabajo aunque la campaña se interrumpa.
+    """
+    nueva = not Path(ruta_tabla).exists()
+    with open(ruta_tabla, "a", newline="") as file:
+        escritor = csv.DictWriter(file, fieldnames=Columnas_Campania)
+        if nueva:
+            escritor.writeheader()
+        escritor.writerow({clave: fila.get(clave, "") for clave in Columnas_Campania})
+
+#####################################################################################################################
+
+def Analizar_Corrida(Medicion_Generador, Medicion_Capacitor, Sweep_time, Frec, Vn_Cx, Vn_Rp, Vn_Tau=None, Metodo="LINEALIZACION", Escala=None):
+    """
+    Cálculo de Cx e incertidumbre de una corrida sin intervención del operador.
+    Si no hay medición del generador, V_max se estima desde el registro del capacitor.
+    Con los métodos de Funciones_Medicion.Metodos_Sin_Vmax no se necesita V_max.
+    Intervalo es el intervalo del 95 % de Cx (uF) del bootstrap sobre ciclos, o (nan, nan) si no se calcula.
+    Con Escala el registro del capacitor son códigos SINT; el registro único los procesa sin pasarlos a float.
+    Tabla es la tabla de calidad por ciclo del registro único linealizado (Funciones_Medicion.Tabla_Calidad) o None.
+    """
+    if Metodo in Funciones_Medicion.Metodos_Sin_Vmax:
+        Cx, tau, utau_A, Cantidad_ciclos_validos = Funciones_Medicion.Procesamiento_Sin_Vmax(
+            Metodo, Funciones_Medicion.Tension_Registro(Medicion_Capacitor, Escala), Sweep_time, Frec, Vn_Rp, tau_inicial=Vn_Tau, incluir_descarga=True,
+            Medicion_Generador=Medicion_Generador, Vn_Cx=Vn_Cx)
+        ucx, ucxp = Funciones_Medicion.Calculo_Incertidumbre_Tau(tau, utau_A, 1-np.exp(-1), 1.0, Vn_Cx, Vn_Rp, fraccion_carga=0.0)
+        return np.nan, np.nan, Cantidad_ciclos_validos, Cx, ucx, ucxp, (np.nan, np.nan), None
+
+    if Medicion_Generador is None:
+        Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig,Cantidad_cargas,V_max,V_max_std,V_off,Tabla = Funciones_Medicion.Procesamiento_Registro_Unico(
+            Medicion_Capacitor, Sweep_time, Frec, Vn_Rp, tau_inicial=Vn_Tau, incluir_descarga=True, Escala=Escala, Segmentacion=Segmentacion,
+            Sincronico=Metodo == "SINCRONICO", Calidad=True)
+        uVM_A = V_max_std/np.sqrt(Cantidad_ciclos_validos)
+    else:
+        V_max, V_max_std = Funciones_Medicion.analizar_senal_cuadrada(np.asarray(Medicion_Generador))
+        if Metodo == "SINCRONICO":
+            Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig,_ = Funciones_Medicion.Procesamiento_Sincronico(
+                Medicion_Capacitor, V_max, Sweep_time, Frec, Vn_Rp, incluir_descarga=False, Escala=Escala)
+        else:
+            Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig = Funciones_Medicion.Procesamiento_Curva(
+                Funciones_Medicion.Tension_Registro(Medicion_Capacitor, Escala), V_max, Sweep_time, Vn_Rp, interactivo=False)
+        uVM_A = 0.0
+        Cantidad_cargas = None
+        Tabla = None
+
+    if Cantidad_ciclos_validos == 0:
+        raise ValueError("Ningún ciclo superó el filtro de R².")
+
+    Cx        = np.mean(Cx_vector)
+    ucx, ucxp = Funciones_Medicion.Calculo_Incertidumbre(slope_vector, Cantidad_ciclos_validos, V_dig, V_max, Vn_Cx, Vn_Rp, uVM_A=uVM_A, Cantidad_cargas=Cantidad_cargas)
+
+    Intervalo = (np.nan, np.nan)
+    if Bootstrap and Cantidad_ciclos_validos > 1:
+        Intervalo = Funciones_Medicion.Bootstrap_Ciclos(slope_vector, Vn_Rp)["Intervalo_Cx"]
+
+    return V_max, V_max_std, Cantidad_ciclos_validos, Cx, ucx, ucxp, Intervalo, Tabla
+
+#####################################################################################################################
+
+def Ejecutar_Campania(trabajos, confirmar_llave=None, ruta_tabla=None):
+    """
+    Entrada: Lista de trabajos (Vn_Cx, Vn_Rp, Modo, Repeticiones), función opcional que se llama
+             antes de medir el capacitor en los trabajos de dos registros (cambio de llave) y ruta
+             opcional de la tabla de campaña.
+    Salida: Ruta de la tabla de campaña.
+    Función: Ejecuta los trabajos uno detrás de otro con acceso exclusivo al instrumental.
+             El generador solo se reconfigura cuando cambia el set, la frecuencia o el sweep,
+             y cada corrida se agrega a la tabla apenas termina.
+    """
+    if confirmar_llave is None:
+        confirmar_llave = lambda: input("Cambiar posición de llave para medir la tensión en el capacitor y presionar Enter")
+
+    trabajos = [Normalizar_Trabajo(trabajo) for trabajo in trabajos]
+
+    if ruta_tabla is None:
+        ruta_tabla = Ruta_Tabla_Campania(Funciones_Archivos.Generar_ID_Corrida().replace("Medicion_", ""))
+
+    configuraciones    = {}   # Plan de adquisición por (Modo, Vn_Cx, Vn_Rp, objetivo)
+    config_generador   = None # (Modo, Frec, Sweep_time) cargada en el generador
+
+    with Funciones_Adquisicion.Bloqueo_Instrumental():
+        for numero, trabajo in enumerate(trabajos, start=1):
+            Modo, Vn_Cx, Vn_Rp = trabajo["Modo"], trabajo["Vn_Cx"], trabajo["Vn_Rp"]
+
+            clave = (Modo, Vn_Cx, Vn_Rp, trabajo["Objetivo_uc_porcentual"])
+            if clave not in configuraciones:
+                try:
+                    configuraciones[clave] = Funciones_Medicion.Planificar_Adquisicion(
+                        Vn_Cx, Vn_Rp, Modo, trabajo["Objetivo_uc_porcentual"], tau_por_ciclo_on=Tau_x_ciclo)
+                except ValueError as e:
+                    configuraciones[clave] = e
+            plan = configuraciones[clave]
+            if isinstance(plan, ValueError):
+                Agregar_Fila_Campania(ruta_tabla, {"Trabajo": numero, "Modo": Modo, "Vn_Cx": Vn_Cx, "Vn_Rp": Vn_Rp,
+                                                   "Estado": f"ERROR: {plan}"})
+                print(f"[INFO] Trabajo {numero}/{len(trabajos)}: ERROR: {plan}")
+                continue
+            Vn_Tau, Frec, Sweep_time, Apertura = plan["tau"], plan["Frec"], plan["Sweep_time"], plan["Apertura"]
+            Cant_Muestras_set = plan["Cant_Muestras"]
+
+            for repeticion in range(1, trabajo["Repeticiones"] + 1):
+                Ruta_Generador, Ruta_Capacitor, Ruta_Config = Funciones_Archivos.Ruta_de_analisis_nuevo()
+                fila = {
+                    "ID_Corrida": Path(Ruta_Config).stem,
+                    "Fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "Trabajo": numero, "Repeticion": repeticion, "Modo": Modo, "Registro_Unico": trabajo["Registro_Unico"],
+                    "Metodo": trabajo["Metodo"],
+                    "Vn_Cx": Vn_Cx, "Vn_Rp": Vn_Rp, "Frec": Frec, "Sweep_time": Sweep_time,
+                    "Ruta_Generador": Ruta_Generador, "Ruta_Capacitor": Ruta_Capacitor, "Ruta_Config": Ruta_Config,
+                }
+                try:
+                    if config_generador != (Modo, Frec, Sweep_time):
+                        Funciones_Adquisicion.Configurar_Generador(Modo, Frec, Sweep_time)
+                        config_generador = (Modo, Frec, Sweep_time)
+
+                    Funciones_Archivos.Guardar_Medicion_Config(Ruta_Config, Modo, Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time)
+
+                    if trabajo["Objetivo_uc_porcentual"] is not None:
+                        Cx, ucx, ucxp, _, ciclos, Muestras, V_max, Motivo, Medicion_Capacitor = Funciones_Adquisicion.Medir_Secuencial(
+                            Modo, Sweep_time, Frec, Vn_Rp, Vn_Cx, Vn_Rp, trabajo["Objetivo_uc_porcentual"],
+                            Apertura=Apertura, Max_Muestras=trabajo["Max_Muestras"], tau_inicial=Vn_Tau)
+                        Funciones_Archivos.Guardar_Medicion(Ruta_Capacitor, Medicion_Capacitor)
+                        fila.update({"Ruta_Generador": "", "V_max": V_max, "Ciclos_validos": ciclos, "Cx_uF": Cx*1e6,
+                                     "uc_uF": ucx, "uc_porcentual": ucxp, "Muestras": Muestras, "Motivo": Motivo, "Estado": "OK"})
+                        Agregar_Fila_Campania(ruta_tabla, fila)
+                        print(f"[INFO] Trabajo {numero}/{len(trabajos)}, repetición {repeticion}: {fila['Estado']} ({Motivo})")
+                        continue
+
+                    if trabajo["Registro_Unico"]:
+                        Medicion_Generador = None
+                        fila["Ruta_Generador"] = ""
+                    else:
+                        Medicion_Generador = Funciones_Adquisicion.Medir_Tension(Modo, Cant_Muestras_set, Sweep_time, Apertura, Frec)
+                        Funciones_Archivos.Guardar_Medicion(Ruta_Generador, Medicion_Generador)
+                        confirmar_llave()
+
+                    # En el set INTI el registro del capacitor queda como códigos SINT (.npy) de punta a punta.
+                    # Un registro que no pasa el triage se vuelve a adquirir antes de analizarlo.
+                    for intento in range(Reintentos_Triage + 1):
+                        Medicion_Capacitor, Escala = Funciones_Adquisicion.Medir_Registro(Modo, Cant_Muestras_set, Sweep_time, Apertura, Frec)
+                        Triage = Funciones_Medicion.Triage_Registro(Medicion_Capacitor, Sweep_time, Frec, Escala)
+                        if Triage["Valido"]:
+                            break
+                    fila["Ruta_Capacitor"] = Funciones_Archivos.Guardar_Registro(Ruta_Capacitor, Medicion_Capacitor, Escala)
+
+                    if not Triage["Valido"]:
+                        fila.update({"Muestras": len(Medicion_Capacitor), "Motivo": "; ".join(Triage["Motivos"]), "Estado": "DESCARTADO"})
+                        Agregar_Fila_Campania(ruta_tabla, fila)
+                        print(f"[INFO] Trabajo {numero}/{len(trabajos)}, repetición {repeticion}: DESCARTADO ({fila['Motivo']})")
+                        continue
+
+                    V_max, V_max_std, ciclos, Cx, ucx, ucxp, Intervalo, Tabla = Analizar_Corrida(Medicion_Generador, Medicion_Capacitor, Sweep_time, Frec, Vn_Cx, Vn_Rp, Vn_Tau,
+                                                                       trabajo["Metodo"], Escala)
+                    fila.update({"V_max": V_max, "V_max_std": V_max_std, "Ciclos_validos": ciclos, "Cx_uF": Cx*1e6,
+                                 "uc_uF": ucx, "uc_porcentual": ucxp, "Cx_IC_inf_uF": Intervalo[0], "Cx_IC_sup_uF": Intervalo[1],
+                                 "Muestras": len(Medicion_Capacitor), "Estado": "OK"})
+                    if Tabla is not None:
+                        fila["Ruta_Calidad"] = Funciones_Archivos.Guardar_Calidad_Ciclos(fila["Ruta_Capacitor"], Tabla)
+
+                except Exception as e:
+                    # Un trabajo fallido queda registrado y la campaña sigue con el siguiente
+                    config_generador = None
+                    fila["Estado"] = f"ERROR: {e}"
+                    if Funciones_Archivos.Liberar_Ruta_de_analisis(Ruta_Config):
+                        fila["Ruta_Config"] = ""
+
+                Agregar_Fila_Campania(ruta_tabla, fila)
+                print(f"[INFO] Trabajo {numero}/{len(trabajos)}, repetición {repeticion}: {fila['Estado']}")
+
+    return str(ruta_tabla)
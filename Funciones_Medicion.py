@@ -1,10 +1,13 @@
 ################################## LIBRERIAS ###############################################
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import scipy.stats as stats
 from scipy.stats import linregress
 from pathlib import Path
+import csv
+import json
+import functools
+import itertools
 
 #############################################################################################
 Extremo_de_ventana_inf = 0.1
@@ -12,6 +15,31 @@ Extremo_de_ventana_sup = 0.9
 R_Cuadrado    = 0.9
 Cant_Muestras = 10000
 cantidad_de_ciclos = 5
+Remuestreos_Bootstrap      = 10000
+Elementos_Bloque_Bootstrap = 2**22    # elementos por bloque de remuestreos (acota la memoria del bootstrap)
+Tamano_Bloque              = 2**20    # muestras por bloque en el análisis de registros por partes
+Factor_Piramide            = 64       # diezmado entre niveles de la pirámide de mínimos y máximos
+Muestras_Iniciales_Niveles = 4096     # muestras con las que se estima el período de la cuadrada antes de acumular
+Bins_Niveles               = 2**20    # intervalos de la grilla fija del estimador de niveles sobre el rango del DCV
+Fraccion_histeresis_fase   = 0.05     # semiancho de la histéresis de los cruces de referencia (fracción de V_max)
+Margen_fase                = 0.02     # distancia de verificación de cada borde previsto (fracción del período)
+Muestras_Meseta            = 16       # muestras promediadas para el nivel de meseta de cada semiciclo
+Min_Armonicos              = 5        # armónicos impares sobre el ruido, con la fundamental, para el método ARMONICOS
+Sigmas_Armonicos           = 3        # diferencia de tau entre armónicos bajos y altos, en incertidumbres, que se avisa
+Residuo_relativo_maximo    = 5e-3     # desvío de los residuos del ajuste exponencial, relativo a la excursión
+Tau_por_semiperiodo_min    = 3        # constantes de tiempo mínimas por semiperíodo para los métodos sin V_max
+Tolerancia_nominal         = 0.25     # desvío relativo admitido entre el Cx de los métodos sin V_max y el nominal
+Error_relativo_integral    = 0.01     # error estándar máximo de la pendiente de cada semiciclo en el método INTEGRAL
+Min_Semiciclos_Integral    = 2        # semiciclos válidos mínimos para el método INTEGRAL
+
+################################## Triage de registros ###########################################
+
+Rango_DCV          = 10.0   # rango DCV usado en el HP3458A; lee hasta el 120 % del rango
+Sobrerango_DCV     = 1.2
+Amplitud_minima    = 0.1    # V, excursión mínima esperada en el capacitor
+LSB_minimos        = 16     # excursiones de menos cuentas que esto son solo ruido de cuantización
+Tolerancia_cruces  = 0.2    # desvío relativo admitido entre cruces medidos y Frec*duración
+Estabilidad_maxima = 0.01   # desvío estándar admitido de los extremos por período, relativo a la excursión
 
 ################################## Datos de DVM HP3458 ###########################################
 
@@ -25,6 +53,19 @@ HP3458_Gain_error_V = 60e-6         # pag 99 sampling with ...
 HP3458_Resolution_V = 1/200000      # pag 51 // 5 dig y medio // Synthesys and Sampling
 
 
+################################## Límites de adquisición ###########################################
+
+# Set INTI: el HP3458A en modo sweep con formato SINT (memoria con opción 001) y el HP3245A como generador.
+# Ruido_V es el ruido de una lectura con Apertura_ref y escala con la raíz de la apertura.
+# Set FRH: intervalo entre lecturas del Keithley 2110 para cada NPLC, lecturas por disparo y el AFG1022.
+Limites_Adquisicion = {
+    "Set INTI": {"Intervalo_minimo": 20e-6, "Resolucion_intervalo": 100e-9, "Tiempo_muerto": 17e-6,
+                 "Apertura_minima": 500e-9, "Apertura_maxima": 1.0, "Apertura_ref": 3e-6, "Ruido_V": 1e-4,
+                 "Memoria": 75000, "Frec_minima": 1e-3, "Frec_maxima": 1e6},
+    "Set FRH":  {"NPLC": {0.02: 0.02, 1: 0.04, 10: 0.22}, "Apertura_ref": 0.02, "Ruido_V": 1e-4,
+                 "Memoria": 2000, "Frec_minima": 1e-6, "Frec_maxima": 12.5e6},
+}
+
 ################################## Valores de Cables ###########################################
 
 Rcablegenerador1  = 54e-3
@@ -36,105 +77,342 @@ RDVM              = 10e9+5e3+5e3
 ##################################  FUNCIONES GENERALES  ########################################
 
 def Calculo_Ciclos(Cx,Rp,tau_por_ciclo_on,):
-    
-    Cantidad_de_ciclos_default = 5
-    tau = (float(Cx)/1000000)*float(Rp)
-    
-    periodo=2*tau_por_ciclo_on*tau
-
-    frec_recomendada=round((1/periodo),2)
-    
-    sweep_time= round((periodo*Cantidad_de_ciclos_default/10000)*1000000,0)
-
-    if tau < 0.5:
-        if sweep_time < 20:
-            sweep_Time = 20 *1e-6
-            cantidad_de_ciclos=0.2/(tau*2*tau_por_ciclo_on)
-            print("El tiempo entre muestras es = ",(sweep_Time))
-        
-        else:
-            sweep_Time=sweep_time*1e-6
-            cantidad_de_ciclos = Cantidad_de_ciclos_default
-            print("El tiempo entre muestras es = ",(sweep_Time)) 
-    
+    """
+    Entrada: Cx nominal en uF, Rp nominal en ohm y cantidad de tau por semiciclo.
+    Retorna: tau, frecuencia, tiempo entre muestras y ciclos previstos del plan de Planificar_Adquisicion
+             para el set INTI sin incertidumbre objetivo.
+    """
+    plan = Planificar_Adquisicion(Cx, Rp, tau_por_ciclo_on=tau_por_ciclo_on)
+    return plan["tau"], plan["Frec"], plan["Sweep_time"], plan["Ciclos"]
 
-    return tau,frec_recomendada,sweep_Time,cantidad_de_ciclos   
 #########################################################################################################
 
-def analizar_senal_cuadrada(signal: np.ndarray, umbral: float = 0.01):
+def Incertidumbre_Pendiente_Prevista(tau,Sweep_Time,Ruido_V,V_max=1.0):
     """
-    Analiza una señal cuadrada para obtener los valores promedio y desviación estándar de Von y Voff.
+    Entrada: tau, tiempo entre muestras, ruido de una lectura (V) y V_max.
+    Retorna: Incertidumbre prevista de tau para un semiciclo y muestras dentro de la ventana 0.1 a 0.9.
+    Función: Varianza de la pendiente de la regresión ponderada sobre ln(1-V/V_max): el ruido de cada
+             muestra linealizada es Ruido_V/(V_max*exp(-t/tau)), igual para cargas y descargas.
     """
-# Estimar niveles
-    v_max = np.max(signal)
-    v_min = np.min(signal)
-    amplitud = v_max - v_min
+    t_inf = -tau*np.log(1 - Extremo_de_ventana_inf)
+    t_sup = -tau*np.log(1 - Extremo_de_ventana_sup)
+    t     = np.arange(np.ceil(t_inf/Sweep_Time), np.floor(t_sup/Sweep_Time) + 1)*Sweep_Time
+    if len(t) < 3:
+        return np.inf, len(t)
 
-    # Estimar umbrales
-    umbral_superior = v_max - umbral * amplitud
-    umbral_inferior = v_min + umbral * amplitud
+    w       = (V_max*np.exp(-t/tau)/Ruido_V)**2
+    t_medio = np.sum(w*t)/np.sum(w)
+    u_slope = 1/np.sqrt(np.sum(w*(t - t_medio)**2))
 
-    # Clasificar valores
-    von_values  = signal[signal >= umbral_superior]
-    voff_values = signal[signal <= umbral_inferior]
+    return tau**2*u_slope, len(t)
 
-    # Calcular estadísticas
-    von_mean = np.mean(von_values)
-    von_std = np.std(von_values)
+#########################################################################################################
 
-    voff_mean = np.mean(voff_values)
-    voff_std = np.std(voff_values)
+def Planificar_Adquisicion(Vn_Cx,Vn_Rp,Modo="Set INTI",Objetivo_uc_porcentual=None,tau_por_ciclo_on=5,
+                           Min_Ciclos=cantidad_de_ciclos,Min_Muestras_ventana=20,incluir_descarga=False,V_max=1.0):
+    """
+    Entrada: Cx nominal en uF, Rp nominal en ohm, set de medición, incertidumbre objetivo en % (None para
+             medir solo Min_Ciclos), tau por semiciclo, ciclos y muestras por ventana mínimos, uso de descargas y V_max.
+    Retorna: Diccionario con tau, Frec, Sweep_time, Apertura (s en el HP3458A, NPLC en el Keithley 2110),
+             Cant_Muestras, Ciclos y Muestras_por_ventana previstos, Tiempo_total (s), uc_porcentual previsto,
+             Alcanzable y la lista de Advertencias.
+    Función: Recorre los tiempos entre muestras que admite el instrumental y, para cada uno, busca la menor
+             cantidad de ciclos que alcanza el objetivo con el presupuesto de Calculo_Incertidumbre_Tau.
+             Elige el plan de menor duración; si el objetivo no es alcanzable, el de menor incertidumbre.
+    """
+    if Modo not in Limites_Adquisicion:
+        raise ValueError(f"Set de medición '{Modo}' no soportado.")
+    lim = Limites_Adquisicion[Modo]
+    advertencias = []
+
+    tau = (float(Vn_Cx)/1000000)*float(Vn_Rp)
+
+    # Frecuencia: tau_por_ciclo_on tau por semiciclo, dentro del rango del generador
+    Frec = 1/(2*tau_por_ciclo_on*tau)
+    if Frec > lim["Frec_maxima"]:
+        Frec = lim["Frec_maxima"]
+    elif Frec < lim["Frec_minima"]:
+        Frec = lim["Frec_minima"]
+        advertencias.append("El semiciclo del generador no alcanza tau_por_ciclo_on tau.")
+    Frec    = float(f"{Frec:.6g}")
+    periodo = 1/Frec
+
+    # Tiempos entre muestras posibles: (intervalo, apertura, ruido de una lectura)
+    intervalo_max = -tau*np.log((1 - Extremo_de_ventana_sup)/(1 - Extremo_de_ventana_inf))/Min_Muestras_ventana
+    intervalo_mem = (Min_Ciclos + 1)*periodo/lim["Memoria"]
+    if "NPLC" in lim:
+        candidatos = [(intervalo, nplc, lim["Ruido_V"]*np.sqrt(lim["Apertura_ref"]/nplc))
+                      for nplc, intervalo in lim["NPLC"].items()]
+    else:
+        intervalo_min = max(lim["Intervalo_minimo"], intervalo_mem)
+        intervalos    = np.geomspace(intervalo_min, max(intervalo_max, intervalo_min), 40)
+        intervalos    = np.unique(np.round(np.ceil(intervalos/lim["Resolucion_intervalo"])*lim["Resolucion_intervalo"], 9))
+        candidatos    = []
+        for intervalo in intervalos:
+            apertura = round(float(np.clip(intervalo - lim["Tiempo_muerto"], lim["Apertura_minima"], lim["Apertura_maxima"])), 9)
+            candidatos.append((float(intervalo), apertura, lim["Ruido_V"]*np.sqrt(lim["Apertura_ref"]/apertura)))
+
+    semiciclos = 2 if incluir_descarga else 1
+    V_dig      = V_max*(1 - np.exp(-1))
+
+    def uc_prevista(utau_1, n):
+        return Presupuesto_Incertidumbre(tau, utau_1/np.sqrt(n*semiciclos), V_dig, V_max, Vn_Cx, Vn_Rp,
+                                         fraccion_carga=1/semiciclos)["uc_porcentual"]
+
+    planes = []
+    for intervalo, apertura, ruido in candidatos:
+        utau_1, muestras_ventana = Incertidumbre_Pendiente_Prevista(tau, intervalo, ruido, V_max)
+        n_max = int(lim["Memoria"]*intervalo/periodo) - 1
+        if n_max < 1 or not np.isfinite(utau_1):
+            continue
+
+        # Menor cantidad de ciclos que alcanza el objetivo, evaluando todos los n posibles de una vez.
+        # Si la memoria no alcanza, se busca llegar al 1 % del mínimo posible en lugar de llenar la
+        # memoria por una mejora despreciable.
+        n = min(Min_Ciclos, n_max)
+        if Objetivo_uc_porcentual is not None:
+            n_posibles = np.arange(n, n_max + 1)
+            ucs        = uc_prevista(utau_1, n_posibles)
+            objetivo   = max(Objetivo_uc_porcentual, 1.01*ucs[-1])
+            n          = int(n_posibles[np.argmax(ucs <= objetivo)])
+
+        ucp           = float(uc_prevista(utau_1, n))
+        Cant_Muestras = int(np.ceil((n + 1)*periodo/intervalo))
+        planes.append({
+            "tau": tau, "Frec": Frec, "Sweep_time": intervalo, "Apertura": apertura,
+            "Cant_Muestras": Cant_Muestras, "Ciclos": n, "Muestras_por_ventana": muestras_ventana,
+            "Tiempo_total": Cant_Muestras*intervalo, "uc_porcentual": ucp,
+            "Alcanzable": Objetivo_uc_porcentual is None or ucp <= Objetivo_uc_porcentual,
+        })
+
+    if not planes:
+        raise ValueError(f"El {Modo} no puede muestrear un tau de {tau} s.")
+
+    alcanzables = [plan for plan in planes if plan["Alcanzable"]]
+    if not alcanzables:
+        uc_minima   = min(plan["uc_porcentual"] for plan in planes)
+        alcanzables = [plan for plan in planes if plan["uc_porcentual"] <= 1.01*uc_minima]
+        advertencias.append(f"El objetivo de {Objetivo_uc_porcentual} % no es alcanzable; se usa el plan más corto cercano a la menor incertidumbre.")
+    plan = min(alcanzables, key=lambda p: (p["Tiempo_total"], p["uc_porcentual"]))
+
+    if plan["Muestras_por_ventana"] < Min_Muestras_ventana:
+        advertencias.append(f"Solo {plan['Muestras_por_ventana']} muestras por ventana de linealización.")
+
+    plan["Advertencias"] = advertencias
+    return plan
 
-    V_max = von_mean - voff_mean
+#########################################################################################################
 
-    
-    if von_std>voff_std:
-        Gen_std=von_std
-    else:
-        Gen_std=voff_std
-        
-    return  V_max, Gen_std
+def analizar_senal_cuadrada(signal: np.ndarray, umbral: float = 0.01):
+    """
+    Analiza una señal cuadrada para obtener los valores promedio y desviación estándar de Von y Voff.
+    Retorna V_max = Von - Voff y la mayor de las dos desviaciones (ver Estimar_Niveles).
+    """
+    Niveles = Estimar_Niveles(signal, umbral)
+    return Niveles["V_max"], Niveles["Gen_std"]
 ###############################################################################################################################################################
 #########################################################################################################
 
 def Analizar_senal_Generador(Medicion_generador, umbral: float = 0.01):
     """
     Analiza una señal cuadrada para obtener los valores promedio y desviación estándar de Von y Voff.
+    Igual que analizar_senal_cuadrada; acepta listas, arreglos o iteradores de bloques.
     """
-    
-    # **AQUÍ ESTÁ LA SOLUCIÓN:** Asegurar que sea un array de NumPy
-    if not isinstance(Medicion_generador, np.ndarray):
-        Medicion_generador_np = np.array(Medicion_generador)
-
-    # Estimar niveles
-    v_max = np.max(Medicion_generador_np)
-    v_min = np.min(Medicion_generador_np)
-    amplitud = v_max - v_min
-
-    # Estimar umbrales
-    umbral_superior = v_max - umbral * amplitud
-    umbral_inferior = v_min + umbral * amplitud
+    return analizar_senal_cuadrada(Medicion_generador, umbral)
+###############################################################################################################################################################
+#########################################################################################################
 
-    # Clasificar valores
-    von_values  = Medicion_generador_np[Medicion_generador_np >= umbral_superior]
-    voff_values = Medicion_generador_np[Medicion_generador_np <= umbral_inferior]
+class Estimador_Niveles:
+    """
+    Niveles de una señal cuadrada en una sola pasada, bloque a bloque (apto para adquisición por partes), con la
+    misma definición que el análisis original: Von es la media de las muestras a menos de umbral*amplitud del
+    máximo del registro y Voff la de las muestras a menos de umbral*amplitud del mínimo. Como las bandas dependen
+    de los extremos de todo el registro, cada muestra se acumula en una grilla fija de Bins_Niveles intervalos sobre
+    el rango del DCV, por período (cuenta, suma y suma de cuadrados respecto del borde de cada intervalo, solo para
+    los pares período-intervalo ocupados), y las bandas se aplican a la grilla al final con el máximo y el mínimo
+    acumulados. Cada intervalo entra entero o no entra en una banda según su media: solo las muestras que comparten
+    intervalo con el borde de una banda pueden quedar del lado contrario.
+    """
 
-    # Calcular estadísticas
-    von_mean = np.mean(von_values)
-    von_std = np.std(von_values)
+    def __init__(self,umbral=0.01,Muestras_por_periodo=None,Muestras_iniciales=Muestras_Iniciales_Niveles,
+                 Bins=Bins_Niveles,Rango=Rango_DCV*Sobrerango_DCV):
+        self.umbral               = umbral
+        self.Muestras_por_periodo = Muestras_por_periodo
+        self.Muestras_iniciales   = Muestras_iniciales
+        self.Bins                 = Bins
+        self.Rango                = Rango
+        self.ancho                = 2*Rango/Bins
+        self.maximo               = -np.inf
+        self.minimo               = np.inf
+        self.pendiente            = []
+        self.Muestras             = 0
+        self.claves               = np.zeros(0, dtype=np.int64)   # período*Bins + intervalo
+        self.sumas                = np.zeros((3, 0))              # cuenta, suma y suma de cuadrados por clave
+
+    def _estimar_periodo(self,valores):
+        """ Muestras por período a partir de los flancos de subida (histéresis al 25 % y 75 % de la amplitud). """
+        amplitud = self.maximo - self.minimo
+        _, subidas, _, _ = Cruces_Histeresis(valores, self.minimo + 0.25*amplitud, self.minimo + 0.75*amplitud)
+        if len(subidas) >= 2:
+            self.Muestras_por_periodo = float(np.mean(np.diff(subidas)))
+
+    def _acumular(self,valores,base):
+        """ Suma las muestras a la grilla, por período y por intervalo. """
+        intervalo = np.clip(np.floor((valores + self.Rango)/self.ancho), 0, self.Bins - 1).astype(np.int64)
+        if self.Muestras_por_periodo is None:
+            periodo = np.zeros(len(valores), dtype=np.int64)
+        else:
+            periodo = ((base + np.arange(len(valores)))/self.Muestras_por_periodo).astype(np.int64)
+        desvio = valores - (intervalo*self.ancho - self.Rango)
+
+        claves = np.concatenate([self.claves, periodo*self.Bins + intervalo])
+        sumas  = np.concatenate([self.sumas, np.vstack([np.ones_like(desvio), desvio, desvio**2])], axis=1)
+        self.claves, indice = np.unique(claves, return_inverse=True)
+        self.sumas = np.vstack([np.bincount(indice, fila, len(self.claves)) for fila in sumas])
+
+    def _vaciar_pendiente(self):
+        """ Estima el período con las muestras retenidas y las acumula. """
+        bloque = np.concatenate(self.pendiente)
+        self.pendiente = []
+        if self.Muestras_por_periodo is None:
+            self._estimar_periodo(bloque)
+        self._acumular(bloque, self.Muestras)
+        self.Muestras += len(bloque)
+
+    def agregar(self,bloque):
+        """ Procesa un bloque de muestras. """
+        bloque = np.asarray(bloque, dtype=float).ravel()
+        if len(bloque):
+            self.maximo = max(self.maximo, float(np.max(bloque)))
+            self.minimo = min(self.minimo, float(np.min(bloque)))
+        if self.pendiente or self.Muestras == 0:
+            # Las primeras Muestras_iniciales muestras se retienen para estimar el período
+            self.pendiente.append(bloque)
+            if sum(len(b) for b in self.pendiente) >= self.Muestras_iniciales:
+                self._vaciar_pendiente()
+            return
+        self._acumular(bloque, self.Muestras)
+        self.Muestras += len(bloque)
+
+    def resultados(self):
+        """
+        Retorna: Diccionario con Von y Voff (medias), sus desviaciones estándar, V_max = Von - Voff, Gen_std (la mayor
+                 de las dos desviaciones), muestras por período y los niveles Von y Voff de cada período (nan si el
+                 período no tiene muestras en la banda).
+        """
+        if self.pendiente:
+            self._vaciar_pendiente()
+        if self.Muestras == 0:
+            raise ValueError("Registro del generador vacío.")
+
+        periodo, intervalo = np.divmod(self.claves, self.Bins)
+        borde        = intervalo*self.ancho - self.Rango
+        n, suma, SS  = self.sumas
+        unicos, cual = np.unique(intervalo, return_inverse=True)
+        media_bin    = (borde + np.bincount(cual, suma)[cual]/np.bincount(cual, n)[cual])
+        semiancho    = self.umbral*(self.maximo - self.minimo)
+        bandas       = {"on": media_bin >= self.maximo - semiancho, "off": media_bin <= self.minimo + semiancho}
+
+        Resultado = {}
+        for nivel, nombre in (("on", "Von"), ("off", "Voff")):
+            banda = bandas[nivel]
+            N     = np.sum(n[banda])
+            if N == 0:
+                raise ValueError("La amplitud del registro del generador es menor que la resolución de la grilla de niveles.")
+            media = np.sum(n[banda]*borde[banda] + suma[banda])/N
+            d     = borde[banda] - media
+            M2    = np.sum(SS[banda] + 2*d*suma[banda] + n[banda]*d**2)
+            Resultado[nombre]          = media
+            Resultado[nombre + "_std"] = np.sqrt(max(M2, 0.0)/N)
+            if self.Muestras_por_periodo is None:
+                Resultado[nombre + "_periodo"] = np.zeros(0)
+                continue
+            largo   = int(np.max(periodo)) + 1
+            cuentas = np.bincount(periodo[banda], n[banda], largo)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                Resultado[nombre + "_periodo"] = np.bincount(periodo[banda], n[banda]*borde[banda] + suma[banda], largo)/cuentas
+        Resultado["V_max"]                = Resultado["Von"] - Resultado["Voff"]
+        Resultado["Gen_std"]              = max(Resultado["Von_std"], Resultado["Voff_std"])
+        Resultado["Muestras_por_periodo"] = self.Muestras_por_periodo
+        return Resultado
 
-    voff_mean = np.mean(voff_values)
-    voff_std = np.std(voff_values)
+###############################################################################################################################################################
 
-    V_max = von_mean - voff_mean
+def Estimar_Niveles(fuente,umbral=0.01,Muestras_por_periodo=None,Tamano_bloque=Tamano_Bloque):
+    """
+    Entrada: Señal del generador como lista, arreglo, ruta o iterador de bloques (ver Bloques_Registro), umbral
+             relativo de las bandas, muestras por período (None lo estima de los flancos) y muestras por bloque.
+    Retorna: El diccionario de Estimador_Niveles.resultados.
+    Función: Una sola pasada por bloques; un iterador de bloques no se junta en memoria.
+    """
+    Estimador = Estimador_Niveles(umbral, Muestras_por_periodo)
+    for bloque in Bloques_Registro(fuente, Tamano_bloque):
+        Estimador.agregar(bloque)
+    return Estimador.resultados()
+###############################################################################################################################################################
 
-    
-    if von_std>voff_std:
-        Gen_std=von_std
+def Triage_Registro(Mediciones,Sweep_Time,Frec,Escala=None):
+    """
+    Entrada: Registro (en volt o códigos SINT), tiempo entre muestras, frecuencia del generador y factor de escala.
+    Retorna: Diccionario con "Valido", la lista "Motivos" de rechazo y las magnitudes evaluadas: muestras saturadas,
+             excursión (V), paso de cuantización (V), cruces medidos y esperados y estabilidad de los extremos.
+    Función: Revisión O(n) y vectorizada antes de Procesamiento_*: saturación del rango DCV, registro plano o con
+             solo ruido de cuantización (falta la señal del generador), cantidad de cargas contra Frec*duración y
+             estabilidad de los máximos y mínimos de cada período. Un registro rechazado se descarta o se vuelve a
+             adquirir sin esperar a la regresión.
+    """
+    valores = np.asarray(Mediciones)
+    n       = len(valores)
+    Motivos = []
+    if n == 0:
+        return {"Valido": False, "Motivos": ["Registro vacío"]}
+
+    # Saturación: códigos extremos del SINT o lecturas en el límite del sobrerango
+    if Escala is not None:
+        saturadas = int(np.count_nonzero((valores >= np.iinfo(np.int16).max) | (valores <= np.iinfo(np.int16).min)))
+        tension   = valores*Escala
+        LSB       = Escala
     else:
-        Gen_std=voff_std
-        
-    return  V_max, Gen_std
+        tension   = np.asarray(valores, dtype=float)
+        saturadas = int(np.count_nonzero(np.abs(tension) >= 0.999*Rango_DCV*Sobrerango_DCV))
+        distintos = np.unique(tension[:65536])
+        LSB       = float(np.min(np.diff(distintos))) if len(distintos) > 1 else 0.0
+    if saturadas:
+        Motivos.append(f"{saturadas} muestras saturadas en el rango DCV {Rango_DCV:g}")
+
+    v_min, v_max = np.percentile(tension, [0.5, 99.5])
+    amplitud     = v_max - v_min
+    if amplitud < Amplitud_minima:
+        Motivos.append(f"Registro plano: excursión de {amplitud:.3g} V (¿falta la señal del generador?)")
+    if LSB > 0 and amplitud < LSB_minimos*LSB:
+        Motivos.append(f"Solo ruido de cuantización: excursión de {amplitud/LSB:.0f} cuentas")
+
+    # Cargas completas contra las esperadas por la frecuencia y la duración (sin señal no tiene sentido evaluarlas)
+    senal     = amplitud >= Amplitud_minima
+    esperados = Frec*n*Sweep_Time
+    cruces    = 0
+    if senal:
+        _, subidas, _, _ = Cruces_Histeresis(tension, v_min + 0.25*amplitud, v_min + 0.75*amplitud)
+        cruces = len(subidas)
+    if esperados < 1:
+        Motivos.append(f"Registro más corto que un período ({esperados:.2f} períodos)")
+    elif senal and abs(cruces - esperados) > max(1.0, Tolerancia_cruces*esperados):
+        Motivos.append(f"{cruces} cargas detectadas y {esperados:.1f} esperadas")
+
+    # Estabilidad de las mesetas: extremos de cada período
+    por_periodo = int(round(1/(Frec*Sweep_Time)))
+    periodos    = n//por_periodo if por_periodo > 0 else 0
+    estabilidad = (np.nan, np.nan)
+    if periodos >= 2 and senal:
+        matriz      = tension[:periodos*por_periodo].reshape(periodos, por_periodo)
+        estabilidad = (np.std(matriz.max(axis=1))/amplitud, np.std(matriz.min(axis=1))/amplitud)
+        if max(estabilidad) > Estabilidad_maxima:
+            Motivos.append(f"Mesetas inestables: {100*max(estabilidad):.2f} % de la excursión entre períodos")
+
+    return {"Valido": not Motivos, "Motivos": Motivos, "Muestras": n, "Saturadas": saturadas, "Amplitud": amplitud,
+            "LSB": LSB, "Cruces": cruces, "Cruces_esperados": esperados,
+            "Estabilidad_alta": estabilidad[0], "Estabilidad_baja": estabilidad[1]}
+
 ###############################################################################################################################################################
 ###############################################################################################################################################################
 def Procesamiento_CargayDescarga(Ruta_Medicion_Carga_Descarga,V_max,Sweep_Time,Rp,Rcablegenerador):
@@ -144,6 +422,7 @@ def Procesamiento_CargayDescarga(Ruta_Medicion_Carga_Descarga,V_max,Sweep_Time,R
     Retorna: Vector de capacidades calculadas, vectores de parámetros de la linealización, cantidad de ciclos válidos,
     Función: Procesa los datos de medición de tensión en la carga del capacitor para calcular su valor nominal y la incertidumbre asociada.
     """
+    import pandas as pd
     
     # Inicializa vectores de resultados
     Muestras_Filtradas              = []  
@@ -281,141 +560,1773 @@ def Procesamiento_CargayDescarga(Ruta_Medicion_Carga_Descarga,V_max,Sweep_Time,R
 
 ##################################################################################################################################################################
 ##################################################################################################################################################################
-def Procesamiento_Curva(Mediciones_capacitor,V_max,Sweep_Time,Rp):
+def Procesamiento_Curva(Mediciones_capacitor,V_max,Sweep_Time,Rp,interactivo=True,V_offset=0.0):
     """
-    Entrada: Ruta del archivo de medición, Vector de muestras, Valor máximo de tensión del generador, Tiempo entre muestras,
-              Valor de resistencia patrón, Resistencia del cable del generador.
+    Entrada: Vector de muestras (ndarray, lista o DataFrame con la columna 'Tensión', que no se modifica),
+              Valor máximo de tensión del generador, Tiempo entre muestras, Valor de resistencia patrón.
+              Con interactivo=False no se imprimen los índices ni se espera al operador (campañas desatendidas).
+              V_offset es el nivel bajo del generador (0 V si se usa la medición del generador).
     Retorna: Vector de capacidades calculadas, vectores de parámetros de la linealización, cantidad de ciclos válidos,
     Función: Procesa los datos de medición de tensión en la carga del capacitor para calcular su valor nominal y la incertidumbre asociada.
+             Trabaja sobre una vista del registro, sin pandas: el tiempo es implícito (índice*Sweep_Time) y la
+             regresión de todos los ciclos se hace por lotes en Regresion_Ciclos.
     """
     
-    # Inicializa vectores de resultados
-    Muestras_Filtradas              = []  
-    muestrasdeinicio                = []  # Almacenará los números de muestra del inicio de cada carga
-    muestrasdefin                   = []  # Almacenará los números de muestra de final de cada carga
-    slope_vector                    = []   
-    intercept_vector                = []
-    r_value_vector                  = []
-    p_value_vector                  = []
-    std_err_vector                  = []
-    
-    V_offset                        = 0.0 
-    R_Cuadrado                      = 0.9
-    Indice                          = 0  
-    cargando                        = False  # Bandera para identificar si estamos en una carga
-    enganche                        = False
-    
     V_dig            = V_max* 0.6321205588  
     valor_inicial    = 0.1 * V_max 
     valor_final      = 0.9 * V_max  
     
-    print(f"Valor inicial de disparo: {valor_inicial} V")
-    print(f"Valor final de disparo: {valor_final} V")
+    if interactivo:
+        print(f"Valor inicial de disparo: {valor_inicial} V")
+        print(f"Valor final de disparo: {valor_final} V")
+
+    # Un DataFrame se lee por su columna sin copiarlo ni agregarle columnas
+    if hasattr(Mediciones_capacitor, "columns"):
+        Mediciones_capacitor = Mediciones_capacitor["Tensión"]
+    valores = np.asarray(Mediciones_capacitor, dtype=float)
 
+    muestrasdeinicio, muestrasdefin = Detectar_Ciclos(valores, valor_inicial, valor_final)
+    
+    if interactivo:
+        print(muestrasdeinicio)
+        print(muestrasdefin)
+    
+        input("Presione Enter para continuar...")
+
+    slope_vector,intercept_vector,r_value_vector,p_value_vector,std_err_vector = Regresion_Ciclos(
+        valores, muestrasdeinicio, muestrasdefin, V_max, Sweep_Time, V_offset)
        
-    if not isinstance(Mediciones_capacitor, pd.DataFrame):      
-        Mediciones_capacitor_df = pd.DataFrame(Mediciones_capacitor, columns=['Tensión'])
+    # Obtengo el número de ciclos válidos
+    Cantidad_ciclos_validos = len(slope_vector)   
+
+    # Creación del vector de capacidad sabiendo que: C = tau/R y tau = -1/slope  => C = -1/R*slope
+    Cx = [-1 / float(slope * float(Rp)) for slope in slope_vector]
+
+    #Devuelve los valores calculados para su análisis posterior
+    return Cx,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,len(valores),V_dig
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Detectar_Ciclos(valores,valor_inicial,valor_final,descarga=False,Piramide=None):
+    """
+    Entrada: Vector de muestras, umbral inferior, umbral superior, tipo de semiciclo y pirámide de mínimos y
+             máximos opcional (Piramide_MinMax).
+    Retorna: Listas de inicios y finales (numeración desde 1, como en Procesamiento_Curva) de cada semiciclo.
+    Función: Misma máquina de estados que Procesamiento_Curva. En carga se engancha por debajo del umbral
+             inferior y el ciclo va del cruce ascendente del inferior al del superior; en descarga es el espejo:
+             se engancha por encima del umbral superior y el ciclo va del cruce descendente del superior al del inferior.
+             En registros largos la búsqueda es de grueso a fino (Transiciones_Piramide), con el mismo resultado.
+    """
+    if Piramide is None and len(valores) >= 16*Factor_Piramide:
+        Piramide = Piramide_MinMax(valores, Niveles=1)
+    if Piramide is not None:
+        muestrasdeinicio, muestrasdefin, _, _ = Transiciones_Piramide(valores, valor_inicial, valor_final, descarga, Piramide)
     else:
-        Mediciones_capacitor_df = Mediciones_capacitor # Si ya es un DF, úsalo directamente
+        muestrasdeinicio, muestrasdefin, _, _ = Transiciones_Ciclos(valores, valor_inicial, valor_final, descarga)
 
-    for i, valor in enumerate(Mediciones_capacitor_df['Tensión'].values, start=1):   
-        
-        # Si no fue disparado, no está cargando y el valor es superior al mínimo disparo
-        if not enganche and not cargando and valor <= valor_inicial:
+    Cantidad_ciclos = min(len(muestrasdeinicio), len(muestrasdefin))
+    return muestrasdeinicio[:Cantidad_ciclos], muestrasdefin[:Cantidad_ciclos]
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Transiciones_Ciclos(valores,valor_inicial,valor_final,descarga=False,cargando=False,enganche=False,base=1):
+    """
+    Entrada: Vector de muestras, umbrales, tipo de semiciclo, estado de la máquina al comenzar (cargando, enganche)
+             y número de la primera muestra.
+    Retorna: Inicios y finales detectados en el vector (sin emparejar) y el estado final de la máquina.
+    Función: Máquina de estados de Detectar_Ciclos. Al devolver el estado se puede continuar con el bloque
+             siguiente de un registro leído por partes.
+    """
+    muestrasdeinicio = []
+    muestrasdefin    = []
+
+    for i, valor in enumerate(np.asarray(valores).tolist(), start=base):
+        if descarga:
+            afuera  = valor >= valor_final
+            entrada = valor <= valor_final
+            salida  = valor <= valor_inicial
+        else:
+            afuera  = valor <= valor_inicial
+            entrada = valor >= valor_inicial
+            salida  = valor >= valor_final
+
+        if not enganche and not cargando and afuera:
             enganche = True
-        # Una vez que se sincronizo con un cero analizo cuando sale del mismo.
-        if not cargando and enganche and valor >= valor_inicial:
-        # Detecta el inicio de una carga
+        if not cargando and enganche and entrada:
             muestrasdeinicio.append(i)
             cargando = True
-        #Va a cargar y adquirir datos hasta que llegue al final.
-        elif cargando and valor >= valor_final:
-        # Detectar el final de una carga
+        elif cargando and salida:
             muestrasdefin.append(i)
             cargando = False
             enganche = False
- 
-    Cantidad_inicios = len(muestrasdeinicio)
-    Cantidad_finales = len(muestrasdefin)
-    
-    #Si la cantidad de inicios y finales fuesen distintos tomaria el de menor valor 'n'
-    Cantidad_ciclos  = min(Cantidad_inicios, Cantidad_finales)
-    
-    print(muestrasdeinicio)
-    print(muestrasdefin)
-    
-    input("Presione Enter para continuar...")
-    
-    #Tomo finalmente los primeros 'n' valores
-    muestrasdeinicio = muestrasdeinicio[:Cantidad_ciclos]
-    muestrasdefin    = muestrasdefin[:Cantidad_ciclos]
 
-    Muestras_de_Ciclo        =[0]*Cantidad_ciclos 
-    Muestras_de_Ciclo_Lin    =[0]*Cantidad_ciclos 
-    Num_Muestras_de_Ciclo    =[0]*Cantidad_ciclos 
+    return muestrasdeinicio, muestrasdefin, cargando, enganche
 
-    #Mediciones_leidas = pd.read_csv(Ruta_Medicion_Carga_Descarga, header=None, names=['Tensión'], sep='\s+', skiprows=13)  
-    Cantidad_de_muestras= len(Mediciones_capacitor_df)
-    
-    # Genera el vector de tiempo en función del `timer`  
-    tiempo_final = (Cantidad_de_muestras - 1) * Sweep_Time
-    Mediciones_capacitor_df['Tiempo'] = np.linspace(
-    start=0, 
-    stop=tiempo_final, 
-    num=Cantidad_de_muestras
-    )
-         
-    for i in range(Cantidad_ciclos):
-        # Usar .loc para asegurar un indexado correcto en Pandas si las muestras
-        # son usadas para seleccionar filas (iloc es mejor para índices enteros)
-        Muestras_Filtradas_aux = Mediciones_capacitor_df.iloc[muestrasdeinicio[i]-1 : muestrasdefin[i]] # Nota: -1 para ajustar el índice si 'start=1' se usó
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Piramide_MinMax(valores,Factor=Factor_Piramide,Niveles=None,Minimo=1000):
+    """
+    Entrada: Registro (arreglo o np.memmap), factor de diezmado, cantidad de niveles (None: hasta que un nivel
+             tenga menos de Minimo puntos).
+    Retorna: Diccionario {"Factor": k, "Muestras": n, "Niveles": [(mínimos, máximos), ...]} donde el nivel i resume
+             bloques de k^(i+1) muestras.
+    Función: Pirámide de mínimos y máximos para detección de grueso a fino y vistas previas. El primer nivel se
+             calcula por partes de Tamano_Bloque muestras, así un registro mapeado en memoria no se carga entero.
+    """
+    n       = len(valores)
+    minimos = []
+    maximos = []
+    for k in range(0, n, Tamano_Bloque):
+        parte = np.asarray(valores[k:k + Tamano_Bloque])
+        resto = (-len(parte)) % Factor
+        if resto:
+            parte = np.concatenate([parte, np.full(resto, parte[-1], dtype=parte.dtype)])
+        parte = parte.reshape(-1, Factor)
+        minimos.append(parte.min(axis=1))
+        maximos.append(parte.max(axis=1))
+    niveles = [(np.concatenate(minimos), np.concatenate(maximos))]
+
+    while (Niveles is None and len(niveles[-1][0]) >= Minimo*Factor) or (Niveles is not None and len(niveles) < Niveles):
+        minimos, maximos = niveles[-1]
+        resto = (-len(minimos)) % Factor
+        if resto:
+            minimos = np.concatenate([minimos, np.full(resto, minimos[-1])])
+            maximos = np.concatenate([maximos, np.full(resto, maximos[-1])])
+        niveles.append((minimos.reshape(-1, Factor).min(axis=1), maximos.reshape(-1, Factor).max(axis=1)))
+
+    return {"Factor": Factor, "Muestras": n, "Niveles": niveles}
 
-        # Filtrar los datos seleccionados (Necesitas definir Extremo_de_ventana_inf/sup, asumo que están definidos fuera o son constantes)
-        Muestras_Filtradas_aux = Muestras_Filtradas_aux[
-            (Muestras_Filtradas_aux['Tensión'] >= Extremo_de_ventana_inf) & (Muestras_Filtradas_aux['Tensión'] <= Extremo_de_ventana_sup)
-        ]
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Transiciones_Piramide(valores,valor_inicial,valor_final,descarga,Piramide,cargando=False,enganche=False,base=1):
+    """
+    Entrada: Los mismos datos que Transiciones_Ciclos más la pirámide de Piramide_MinMax del vector.
+    Retorna: Lo mismo que Transiciones_Ciclos.
+    Función: En cada estado de la máquina solo una condición puede cambiarlo (en carga: tocar el umbral inferior,
+             superarlo y luego alcanzar el superior). Con los mínimos y máximos del primer nivel se busca el primer
+             bloque donde esa condición puede cumplirse, se lo recorre a resolución completa y se saltea el resto.
+             El costo es O(n/k) operaciones vectorizadas más O(ciclos·k) muestras recorridas.
+    """
+    k                = Piramide["Factor"]
+    minimos, maximos = Piramide["Niveles"][0]
 
-        Muestras_de_Ciclo[Indice] = Muestras_Filtradas_aux['Tensión'].values
-        Num_Muestras_de_Ciclo[Indice] = Muestras_Filtradas_aux.index.values
+    # Bloques candidatos para salir de cada estado: desenganchado, enganchado y cargando
+    if descarga:
+        candidatos = (np.flatnonzero(maximos >= valor_final), np.flatnonzero(minimos <= valor_final), np.flatnonzero(minimos <= valor_inicial))
+    else:
+        candidatos = (np.flatnonzero(minimos <= valor_inicial), np.flatnonzero(maximos >= valor_inicial), np.flatnonzero(maximos >= valor_final))
+
+    muestrasdeinicio = []
+    muestrasdefin    = []
+    posicion         = 0
+    n                = len(valores)
+
+    while posicion < n:
+        lista = candidatos[2 if cargando else (1 if enganche else 0)]
+        j     = np.searchsorted(lista, posicion//k)
+        if j == len(lista):
+            break
+        desde = max(posicion, int(lista[j])*k)
+        hasta = min(n, (int(lista[j]) + 1)*k)
+        inicios, fines, cargando, enganche = Transiciones_Ciclos(valores[desde:hasta], valor_inicial, valor_final, descarga,
+                                                                 cargando, enganche, base=base + desde)
+        muestrasdeinicio.extend(inicios)
+        muestrasdefin.extend(fines)
+        posicion = hasta
+
+    return muestrasdeinicio, muestrasdefin, cargando, enganche
 
-        # Linealización
-        Muestras_de_Ciclo_Lin[Indice] = np.log(1 - (Muestras_Filtradas_aux['Tensión'] - V_offset) / V_max)
-        
-        # Regresión lineal
-        slope, intercept, r_value, p_value, std_err = linregress(
-            Muestras_Filtradas_aux['Tiempo'], 
-            Muestras_de_Ciclo_Lin[Indice]
-        )          
-              
-        # Evalua si la medición es válida según el coeficiente de determinación R^2
-        if (r_value)**2 > R_Cuadrado:
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Vista_Previa(Piramide,Sweep_Time,inicio=0,fin=None,Puntos=2000):
+    """
+    Entrada: Pirámide de Piramide_MinMax, tiempo entre muestras, rango de muestras y cantidad de puntos buscada.
+    Retorna: Tiempo, mínimos y máximos del nivel más grueso que tenga al menos Puntos bloques en el rango.
+    """
+    fin    = Piramide["Muestras"] if fin is None else fin
+    nivel  = 0
+    for i in range(len(Piramide["Niveles"])):
+        if (fin - inicio)//Piramide["Factor"]**(i + 1) >= Puntos:
+            nivel = i
+    bloque           = Piramide["Factor"]**(nivel + 1)
+    minimos, maximos = Piramide["Niveles"][nivel]
+    rango            = slice(inicio//bloque, -(-fin//bloque))
+    return np.arange(rango.start, rango.start + len(minimos[rango]))*bloque*Sweep_Time, minimos[rango], maximos[rango]
 
-            # Si es válida, almacena los resultados    
-            slope_vector.append(slope)  
-            intercept_vector.append(intercept)
-            r_value_vector.append(r_value)
-            p_value_vector.append(p_value)
-            std_err_vector.append(std_err)
-       
-    # Obtengo el número de ciclos válidos
-    Cantidad_ciclos_validos = len(slope_vector)   
-    Muestras_Filtradas      = [elemento for sublista in  Muestras_Filtradas  for elemento in sublista]
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Ventanas_Linealizadas(valores,muestrasdeinicio,muestrasdefin,V_max,Sweep_Time,V_offset=0.0,descarga=False,Escala=None,Por_Tiempo=False):
+    """
+    Entrada: Vector de muestras, inicios y finales de ciclo (desde 1), V_max, tiempo entre muestras, nivel bajo
+             del generador, tipo de semiciclo, factor de escala si las muestras son códigos SINT y si la ventana ya
+             está dada por los inicios y finales (Por_Tiempo, segmentación por fase) en lugar de por la tensión.
+    Retorna: Lista de pares (tiempo, tensión linealizada) de cada semiciclo con al menos 3 muestras en la ventana.
+    Función: Recorte a [Extremo_de_ventana_inf, Extremo_de_ventana_sup] y linealización que usan Regresion_Ciclos
+             y Bootstrap_Residuos. Con códigos la ventana se compara en enteros y el logaritmo se toma de
+             Tabla_Linealizacion. Elegir las muestras por su propia tensión sesga la pendiente cuando el ruido es
+             comparable a la distancia a los extremos de la ventana; con Por_Tiempo se usan todas las muestras del tramo.
+    """
+    if Escala is not None:
+        return Ventanas_Linealizadas_Codigos(valores, muestrasdeinicio, muestrasdefin, V_max, Sweep_Time, V_offset, descarga, Escala, Por_Tiempo)
 
-    # Creación del vector de capacidad sabiendo que: C = tau/R y tau = -1/slope  => C = -1/R*slope
-    Cx=[0]*Cantidad_ciclos_validos
+    valores  = np.asarray(valores, dtype=float)
+    ventanas = []
 
-    for i in range(Cantidad_ciclos_validos):
-        Cx[i] = (-1 / float((slope_vector[i]) * float(Rp)))
+    for inicio, fin in zip(muestrasdeinicio, muestrasdefin):
+        tension = valores[inicio-1 : fin]
+        tiempo  = np.arange(inicio-1, fin)*Sweep_Time
 
-    #Devuelve los valores calculados para su análisis posterior
-    return Cx,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig
+        if Por_Tiempo:
+            ventana = np.ones(len(tension), dtype=bool)
+        else:
+            ventana = (tension >= Extremo_de_ventana_inf) & (tension <= Extremo_de_ventana_sup)
+        if np.count_nonzero(ventana) < 3:
+            continue
+
+        if descarga:
+            tension_lin = np.log((tension[ventana] - V_offset)/V_max)
+        else:
+            tension_lin = np.log(1 - (tension[ventana] - V_offset)/V_max)
+
+        ventanas.append((tiempo[ventana], tension_lin))
+
+    return ventanas
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+# Código SINT correspondiente a cada índice de una tabla indexada con codigos.view(np.uint16)
+Codigos_SINT = np.arange(2**16, dtype=np.uint16).view(np.int16)
+
+@functools.lru_cache(maxsize=16)
+def Tabla_Linealizacion(Escala,V_max,V_offset=0.0,descarga=False):
+    """
+    Entrada: Factor de escala ISCALE, V_max, nivel bajo del generador y tipo de semiciclo.
+    Retorna: Tabla de solo lectura con los 65536 valores linealizados, indexada por el código visto como uint16.
+    Función: ln(1-(V-V_off)/V_max) en carga o ln((V-V_off)/V_max) en descarga para cada código posible, de modo que
+             linealizar un registro es una indexación. Se calcula una vez por combinación de parámetros; los códigos
+             fuera del dominio del logaritmo quedan en nan.
+    """
+    tension = Codigos_SINT*float(Escala)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if descarga:
+            tabla = np.log((tension - V_offset)/V_max)
+        else:
+            tabla = np.log(1 - (tension - V_offset)/V_max)
+    tabla.setflags(write=False)
+    return tabla
+
+def Umbral_Codigo(tension,Escala):
+    """
+    Umbral de tensión expresado en unidades de código SINT. No se redondea: comparar un código entero contra
+    tension/Escala con <= o >= equivale a comparar la tensión, así que los ciclos detectados son los mismos
+    que con el registro en volt.
+    """
+    return tension/Escala
+
+def Tension_Registro(valores,Escala=None):
+    """
+    Registro en volt: los códigos SINT se escalan y un registro que ya está en volt se devuelve como float.
+    """
+    if Escala is None:
+        return np.asarray(valores, dtype=float)
+    return np.asarray(valores)*Escala
+
+def Ventanas_Linealizadas_Codigos(codigos,muestrasdeinicio,muestrasdefin,V_max,Sweep_Time,V_offset,descarga,Escala,Por_Tiempo=False):
+    """
+    Ventanas_Linealizadas sobre códigos int16: la ventana se compara contra los códigos límite exactos
+    y la linealización es una lectura de Tabla_Linealizacion.
+    """
+    codigos    = np.asarray(codigos, dtype=np.int16)
+    tabla      = Tabla_Linealizacion(float(Escala), float(V_max), float(V_offset), bool(descarga))
+    limite_inf = int(np.ceil(Extremo_de_ventana_inf/Escala))
+    limite_sup = int(np.floor(Extremo_de_ventana_sup/Escala))
+    ventanas   = []
+
+    for inicio, fin in zip(muestrasdeinicio, muestrasdefin):
+        codigo = codigos[inicio-1 : fin]
+        if Por_Tiempo:
+            ventana = np.ones(len(codigo), dtype=bool)
+        else:
+            ventana = (codigo >= limite_inf) & (codigo <= limite_sup)
+        if np.count_nonzero(ventana) < 3:
+            continue
+        ventanas.append((np.arange(inicio-1, fin)[ventana]*Sweep_Time, tabla[codigo[ventana].view(np.uint16)]))
+
+    return ventanas
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Regresion_Ventanas(valores,muestrasdeinicio,muestrasdefin,V_max,Sweep_Time,V_offset=0.0,descarga=False,Escala=None,Por_Tiempo=False,
+                       Tamano_bloque=Tamano_Bloque):
+    """
+    Entrada: Las mismas que Ventanas_Linealizadas y muestras por lote.
+    Retorna: Diccionario de arreglos con un elemento por semiciclo: Inicio y Fin (desde 1), Muestras (dentro de
+             la ventana), slope, intercept, r_value, p_value, std_err, Residuo_rms y Residuo_max (en la escala
+             linealizada), Muestra_residuo_max (desde 1; 0 si no hay) y Meseta (V, promedio de las Muestras_Meseta
+             muestras anteriores al flanco del generador, ubicado donde la recta ajustada vale 0). Los semiciclos
+             con menos de 3 muestras en la ventana quedan con los parámetros en nan.
+    Función: Las mismas ventanas y la misma regresión que linregress sobre Ventanas_Linealizadas, por lotes de
+             semiciclos: las muestras de todas las ventanas del lote se leen de una vez desde una vista del registro
+             y las sumas de cada semiciclo salen de np.bincount (dos pasadas, centradas, como linregress).
+             El tiempo es implícito (índice*Sweep_Time) y la memoria se reserva por lote, no por semiciclo.
+    """
+    if Escala is not None:
+        valores    = np.asarray(valores, dtype=np.int16)
+        tabla      = Tabla_Linealizacion(float(Escala), float(V_max), float(V_offset), bool(descarga))
+        limite_inf = int(np.ceil(Extremo_de_ventana_inf/Escala))
+        limite_sup = int(np.floor(Extremo_de_ventana_sup/Escala))
+    else:
+        valores    = np.asarray(valores, dtype=float)
+        limite_inf, limite_sup = Extremo_de_ventana_inf, Extremo_de_ventana_sup
+
+    inicios    = np.asarray(muestrasdeinicio, dtype=np.int64) - 1
+    fines      = np.asarray(muestrasdefin, dtype=np.int64)
+    acumulado  = np.concatenate(([0], np.cumsum(fines - inicios)))
+    claves     = ("Inicio", "Fin", "Muestras", "slope", "intercept", "r_value", "p_value", "std_err",
+                  "Residuo_rms", "Residuo_max", "Muestra_residuo_max", "Meseta")
+    escala     = 1.0 if Escala is None else float(Escala)
+    anteriores = np.arange(Muestras_Meseta - 1, -1, -1)
+    resultados = {clave: [] for clave in claves}
+
+    desde = 0
+    while desde < len(inicios):
+        hasta = max(desde + 1, int(np.searchsorted(acumulado, acumulado[desde] + Tamano_bloque, side="right")) - 1)
+        a     = inicios[desde:hasta]
+        largo = fines[desde:hasta] - a
+        k     = len(a)
+
+        # Posición de cada muestra dentro de su semiciclo y número de semiciclo dentro del lote
+        semiciclo = np.repeat(np.arange(k), largo)
+        posicion  = np.arange(len(semiciclo)) - np.repeat(acumulado[desde:hasta] - acumulado[desde], largo)
+        muestra   = valores[a[semiciclo] + posicion]
+        if not Por_Tiempo:
+            ventana = (muestra >= limite_inf) & (muestra <= limite_sup)
+            semiciclo, posicion, muestra = semiciclo[ventana], posicion[ventana], muestra[ventana]
+
+        if Escala is not None:
+            y = tabla[muestra.view(np.uint16)]
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                y = np.log((muestra - V_offset)/V_max) if descarga else np.log(1 - (muestra - V_offset)/V_max)
+
+        n = np.bincount(semiciclo, minlength=k)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_media = np.bincount(semiciclo, posicion, k)/n
+            y_media = np.bincount(semiciclo, y, k)/n
+            dx  = posicion - x_media[semiciclo]
+            dy  = y - y_media[semiciclo]
+            Sxx = np.bincount(semiciclo, dx*dx, k)
+            Sxy = np.bincount(semiciclo, dx*dy, k)
+            Syy = np.bincount(semiciclo, dy*dy, k)
+
+            pendiente = Sxy/Sxx
+            r_value   = np.clip(np.where(Syy > 0, Sxy/np.sqrt(Sxx*Syy), 0.0), -1.0, 1.0)
+            gl        = n - 2
+            t         = r_value*np.sqrt(gl/((1.0 - r_value + 1e-20)*(1.0 + r_value + 1e-20)))
+            p_value   = 2*stats.t.sf(np.abs(t), np.maximum(gl, 1))
+            std_err   = np.sqrt((1 - r_value**2)*Syy/Sxx/gl)/Sweep_Time
+
+
+            # Residuos de cada muestra respecto de la recta de su semiciclo
+            residuo     = dy - pendiente[semiciclo]*dx
+            residuo_rms = np.sqrt(np.bincount(semiciclo, residuo*residuo, k)/n)
+            residuo     = np.abs(residuo)
+        residuo_max = np.full(k, np.nan)
+        muestra_max = np.zeros(k, dtype=np.int64)
+        con_datos   = n > 0
+        if np.any(con_datos):
+            residuo_max[con_datos] = np.maximum.reduceat(residuo, (np.cumsum(n) - n)[con_datos])
+            maximos = np.flatnonzero(residuo == residuo_max[semiciclo])
+            _, primero = np.unique(semiciclo[maximos], return_index=True)
+            maximos = maximos[primero]
+            muestra_max[semiciclo[maximos]] = a[semiciclo[maximos]] + posicion[maximos] + 1
+
+        util  = n >= 3
+        slope = np.where(util, pendiente/Sweep_Time, np.nan)
+        intercept = y_media - slope*(a + x_media)*Sweep_Time
+
+        # Nivel de meseta antes del flanco del generador (la recta linealizada vale 0 en el flanco)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            flanco = np.floor(-intercept/slope/Sweep_Time)
+        meseta = np.full(k, np.nan)
+        finito = np.isfinite(flanco)
+        if np.any(finito):
+            indices = np.clip(flanco[finito].astype(np.int64)[:, None] - anteriores, 0, len(valores) - 1)
+            meseta[finito] = np.mean(valores[indices], axis=1)*escala
+
+        valores_lote = (a + 1, a + largo, n, slope, intercept, np.where(util, r_value, np.nan), np.where(util, p_value, np.nan),
+                        np.where(util, std_err, np.nan), residuo_rms, residuo_max, muestra_max, meseta)
+        for clave, valor in zip(claves, valores_lote):
+            resultados[clave].append(valor)
+        desde = hasta
+
+    return {clave: np.concatenate(valor) if valor else np.array([]) for clave, valor in resultados.items()}
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Regresion_Ciclos(valores,muestrasdeinicio,muestrasdefin,V_max,Sweep_Time,V_offset=0.0,descarga=False,R_Cuadrado=R_Cuadrado,Escala=None,Por_Tiempo=False,
+                     Calidad=False):
+    """
+    Entrada: Vector de muestras, inicios y finales de ciclo (desde 1), V_max, tiempo entre muestras, nivel bajo
+             del generador, tipo de semiciclo, umbral de R² y si se devuelve la tabla de calidad.
+    Retorna: Vectores de pendiente, ordenada, r, p y error estándar de los ciclos válidos y, con Calidad=True,
+             la tabla de calidad de todos los ciclos (Tabla_Calidad).
+    Función: Linealiza cada semiciclo dentro de la ventana [Extremo_de_ventana_inf, Extremo_de_ventana_sup]
+             y hace la regresión lineal. En carga ln(1-(V-V_off)/V_max), en descarga ln((V-V_off)/V_max);
+             en ambos casos la pendiente es -1/tau. Con Escala las muestras son códigos SINT y con Por_Tiempo la
+             ventana es el tramo completo entre inicio y fin (ver Ventanas_Linealizadas). Las regresiones se
+             hacen por lotes en Regresion_Ventanas.
+    """
+    Lote    = Regresion_Ventanas(valores, muestrasdeinicio, muestrasdefin, V_max, Sweep_Time, V_offset, descarga, Escala, Por_Tiempo)
+    Tabla   = Tabla_Calidad(Lote, R_Cuadrado, descarga)
+    validos = Tabla["Valido"]
+
+    resultados = tuple(list(Lote[clave][validos]) for clave in ("slope", "intercept", "r_value", "p_value", "std_err"))
+    return resultados + (Tabla,) if Calidad else resultados
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+Columnas_Calidad = ("Tipo", "Inicio", "Fin", "Muestras", "slope", "intercept", "r2", "Residuo_rms", "Residuo_max",
+                    "Muestra_residuo_max", "Meseta", "Valido", "Motivo")
+
+def Tabla_Calidad(Lote,R_Cuadrado=R_Cuadrado,descarga=False):
+    """
+    Entrada: Resultado de Regresion_Ventanas, umbral de R² y tipo de semiciclo.
+    Retorna: Tabla de calidad por ciclo: diccionario de arreglos con las Columnas_Calidad. Motivo vale "" en los
+             ciclos aceptados, "VENTANA" si quedaron menos de 3 muestras en la ventana y "R2" si no superaron el
+             umbral de R².
+    Función: Deja registro de todos los ciclos, aceptados y rechazados, para filtrar o recalificar sin repetir
+             las regresiones (por ejemplo con otro umbral de R² o por residuo máximo).
+    """
+    r2        = Lote["r_value"]**2
+    ventana   = Lote["Muestras"] >= 3
+    valido    = ventana & (r2 > R_Cuadrado)
+    Tabla     = {clave: Lote[clave] for clave in Columnas_Calidad if clave in Lote}
+    Tabla.update({"Tipo": np.full(len(r2), "DESCARGA" if descarga else "CARGA"), "r2": r2, "Valido": valido,
+                  "Motivo": np.where(valido, "", np.where(ventana, "R2", "VENTANA"))})
+    return {clave: Tabla[clave] for clave in Columnas_Calidad}
+
+def Unir_Tablas_Calidad(*Tablas):
+    """
+    Concatena tablas de calidad (por ejemplo cargas y descargas) columna por columna.
+    """
+    return {clave: np.concatenate([Tabla[clave] for Tabla in Tablas]) for clave in Columnas_Calidad}
+
+def Resumen_Calidad(Tabla):
+    """
+    Entrada: Tabla de calidad.
+    Retorna: Texto con la cantidad de ciclos aceptados y rechazados por motivo, por tipo de semiciclo, y el
+             residuo máximo entre los aceptados.
+    """
+    lineas = []
+    for tipo in np.unique(Tabla["Tipo"]):
+        de_tipo = Tabla["Tipo"] == tipo
+        validos = de_tipo & Tabla["Valido"]
+        lineas.append(f"{tipo}: {np.sum(validos)} de {np.sum(de_tipo)} aceptados, "
+                      f"{np.sum(de_tipo & (Tabla['Motivo'] == 'R2'))} rechazados por R², "
+                      f"{np.sum(de_tipo & (Tabla['Motivo'] == 'VENTANA'))} con menos de 3 muestras en la ventana"
+                      + (f", residuo máximo {np.max(Tabla['Residuo_max'][validos]):.3e}" if np.any(validos) else ""))
+    return "\n".join(lineas)
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Cruces_Submuestra(valores,umbral,semiancho,desde=0,hasta=None,descarga=False):
+    """
+    Entrada: Vector de muestras, umbral, semiancho de la histéresis alrededor del umbral, rango de muestras [desde, hasta)
+             y sentido (descarga: cruces descendentes).
+    Retorna: Posiciones fraccionarias (índice desde 0) de los cruces del umbral en el rango.
+    Función: Cada cruce de Cruces_Histeresis se afina con una recta ajustada desde la última muestra de una zona
+             hasta la primera de la otra; la posición es donde la recta vale el umbral.
+    """
+    hasta = len(valores) if hasta is None else hasta
+    tramo = np.asarray(valores[desde:hasta], dtype=float)
+    if descarga:
+        tramo, umbral = -tramo, -umbral
+
+    salida, llegada, _, _ = Cruces_Histeresis(tramo, umbral - semiancho, umbral + semiancho)
+    cruces = []
+    for a, b in zip(salida, llegada):
+        indice = np.arange(a - 1, b + 1)
+        pendiente, ordenada = np.polyfit(indice, tramo[indice], 1)
+        if pendiente > 0:
+            cruces.append(desde + (umbral - ordenada)/pendiente)
+    return np.array(cruces)
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Semiciclos_Fase(valores,Sweep_Time,Frec,valor_inicial,valor_final,descarga=False,Cruces_referencia=5):
+    """
+    Entrada: Vector de muestras, tiempo entre muestras, frecuencia del generador, umbrales de Detectar_Ciclos (en las
+             unidades del registro), tipo de semiciclo y cantidad de cruces de referencia en cada extremo del registro.
+    Retorna: Diccionario con el número de cada semiciclo completo del registro, sus cruces previstos de entrada y
+             salida (posiciones fraccionarias desde 0), su primera y última muestra (desde 0), si sus bordes
+             concuerdan con el registro, el período y el desfasaje entre cruces en muestras.
+    Función: El período nominal 1/(Frec*Sweep_Time) se corrige con unos pocos cruces con resolución de submuestra al
+             principio y al final del registro, y todos los semiciclos se ubican aritméticamente con ese período.
+             Cada borde se verifica con dos muestras a Margen_fase períodos de distancia.
+    """
+    n         = len(valores)
+    Periodo   = 1/(Frec*Sweep_Time)
+    semiancho = Fraccion_histeresis_fase*(valor_final - valor_inicial)/0.8
+    margen    = max(2, int(round(Margen_fase*Periodo)))
+    umbral_entrada, umbral_salida = (valor_final, valor_inicial) if descarga else (valor_inicial, valor_final)
+
+    # Cruces de referencia al principio del registro
+    limite  = min(n, int((Cruces_referencia + 1)*Periodo))
+    cruces  = Cruces_Submuestra(valores, umbral_entrada, semiancho, 0, limite, descarga)
+    if len(cruces) < 2:
+        raise ValueError("No hay cruces suficientes para la segmentación por fase.")
+    k       = np.round((cruces - cruces[0])/Periodo)
+    Periodo, x0 = np.polyfit(k, cruces, 1)
+
+    # Cruces de referencia al final: se buscan alrededor de la posición prevista
+    k_final = int((n - 1 - x0)//Periodo)
+    for j in range(k_final, max(int(k[-1]), k_final - Cruces_referencia), -1):
+        centro = x0 + j*Periodo
+        cerca  = Cruces_Submuestra(valores, umbral_entrada, semiancho, max(0, int(centro - Periodo/4)), min(n, int(centro + Periodo/4)), descarga)
+        if len(cerca):
+            k      = np.append(k, j)
+            cruces = np.append(cruces, cerca[np.argmin(np.abs(cerca - centro))])
+    Periodo, x0 = np.polyfit(k, cruces, 1)
+
+    # Desfasaje del umbral de salida respecto del de entrada
+    salidas = Cruces_Submuestra(valores, umbral_salida, semiancho, 0, limite, descarga)
+    if len(salidas) == 0:
+        raise ValueError("No hay cruces del umbral de salida para la segmentación por fase.")
+    desfasaje = np.median((salidas - x0) % Periodo)
+
+    # Todos los semiciclos completos del registro y verificación de sus bordes
+    k_min     = int(np.ceil((margen + 1 - x0)/Periodo))
+    k_max     = int(np.floor((n - 2 - margen - x0 - desfasaje)/Periodo))
+    semiciclo = np.arange(k_min, k_max + 1)
+    entrada   = x0 + semiciclo*Periodo
+    salida    = entrada + desfasaje
+    inicio    = np.floor(entrada).astype(int) + 1        # primera muestra después del cruce de entrada
+    fin       = np.ceil(salida).astype(int) - 1          # última muestra antes del cruce de salida
+
+    signo = -1 if descarga else 1
+    v     = lambda indices: signo*np.asarray(valores[indices], dtype=float)
+    valido = ((v(inicio - 1 - margen) < signo*umbral_entrada) & (v(inicio + margen) > signo*umbral_entrada) &
+              (v(fin - margen) < signo*umbral_salida) & (v(fin + 1 + margen) > signo*umbral_salida) & (fin - inicio >= 2))
+
+    return {"Semiciclo": semiciclo, "Entrada": entrada, "Salida": salida, "Inicio": inicio, "Fin": fin,
+            "Valido": valido, "Periodo": Periodo, "Desfasaje": desfasaje}
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Segmentacion_Fase(valores,Sweep_Time,Frec,valor_inicial,valor_final,descarga=False,Cruces_referencia=5):
+    """
+    Entrada: Las mismas que Semiciclos_Fase.
+    Retorna: Inicios y finales (desde 1) de los semiciclos que concuerdan con la predicción, lista de discrepancias
+             (diccionarios con el número de semiciclo y el inicio y fin previstos) y período estimado en muestras.
+    Función: Segmentación enganchada en fase: el inicio de cada semiciclo es el cruce previsto del umbral de entrada
+             y el fin el del umbral de salida. Los semiciclos donde el registro no coincide con la predicción (picos
+             en un borde, pulsos perdidos) se informan y se descartan. El costo es O(ciclos) y un pico de ruido no
+             puede disparar un ciclo espurio.
+    """
+    Fase   = Semiciclos_Fase(valores, Sweep_Time, Frec, valor_inicial, valor_final, descarga, Cruces_referencia)
+    valido = Fase["Valido"]
+
+    Discrepancias = [{"Semiciclo": int(j), "Inicio": int(a) + 1, "Fin": int(b) + 1}
+                     for j, a, b in zip(Fase["Semiciclo"][~valido], Fase["Inicio"][~valido], Fase["Fin"][~valido])]
+
+    return list(Fase["Inicio"][valido] + 1), list(Fase["Fin"][valido] + 1), Discrepancias, Fase["Periodo"]
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Umbrales_Registro(valores):
+    """
+    Entrada: Registro (en volt o códigos SINT) de la cuadrada o de la curva del capacitor.
+    Retorna: Umbrales al 10 % y 90 % del rango del registro, para segmentar sin conocer V_max.
+    """
+    minimo, maximo = float(np.min(valores)), float(np.max(valores))
+    return minimo + 0.1*(maximo - minimo), minimo + 0.9*(maximo - minimo)
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Estimar_Intervalo_Muestreo(valores,Sweep_Time,Frec):
+    """
+    Entrada: Registro de la cuadrada o de la curva del capacitor, tiempo nominal entre muestras y frecuencia del generador.
+    Retorna: Tiempo real entre muestras (s).
+    Función: El período en muestras que ajusta Semiciclos_Fase (umbrales al 10 % y 90 % del rango del registro)
+             es 1/(Frec*Sweep_Time) con el intervalo real del multímetro; la frecuencia del generador es la referencia.
+             Cada flanco se ubica a menos de una muestra, así que con una sola pasada de pocos períodos el error
+             relativo es de 3e-5 a 1e-4 según la fase de arranque: alcanza para ubicar las demoras de las pasadas,
+             pero no para la base de tiempos de un registro largo, que conviene volver a medir sobre el registro
+             intercalado (Adquirir_Tiempo_Equivalente).
+    """
+    Fase = Semiciclos_Fase(valores, Sweep_Time, Frec, *Umbrales_Registro(valores))
+    return 1/(Frec*Fase["Periodo"])
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Intercalar_Tiempo_Equivalente(Pasadas):
+    """
+    Entrada: Matriz (pasadas x muestras): la pasada p empieza p/P intervalos de muestreo después del flanco del generador.
+    Retorna: Registro de P*muestras valores con un intervalo entre muestras P veces menor.
+    Función: Reconstrucción en tiempo equivalente: la muestra j de la pasada p ocupa la posición j*P + p.
+    """
+    return np.asarray(Pasadas).T.ravel()
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Ciclos_Alineados(valores,entradas,Largo,Elementos_bloque=Elementos_Bloque_Bootstrap):
+    """
+    Entrada: Registro, posiciones fraccionarias (desde 0) de los cruces de entrada de cada semiciclo, muestras por
+             semiciclo y elementos por bloque.
+    Retorna: Generador de matrices (semiciclos del bloque x Largo): la fila k es el semiciclo k evaluado en
+             entrada_k + j, j = 0..Largo-1.
+    Función: Alineación con resolución de submuestra por interpolación lineal entre las dos muestras vecinas.
+             Aplicada a V_off + V_max*(1 - c*exp(-t/tau)) la interpolación da otra exponencial con el mismo tau,
+             por lo que el promedio de los semiciclos alineados conserva la constante de tiempo.
+    """
+    j     = np.arange(Largo)
+    filas = max(1, Elementos_bloque//Largo)
+    for desde in range(0, len(entradas), filas):
+        entrada = np.asarray(entradas[desde:desde + filas])
+        base    = np.floor(entrada).astype(int)
+        frac    = (entrada - base)[:, None]
+        indices = base[:, None] + j
+        yield (1 - frac)*valores[indices] + frac*valores[indices + 1]
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Regresion_Filas(y,t):
+    """
+    Entrada: Matriz (filas x muestras) de valores linealizados y vector de tiempos común.
+    Retorna: Pendientes, ordenadas, coeficientes r y errores estándar de las pendientes, uno por fila.
+    Función: Regresión lineal de todas las filas a la vez, como linregress pero con t compartido.
+    """
+    t_media  = np.mean(t)
+    dt       = t - t_media
+    Sxx      = dt @ dt
+    y_media  = np.mean(y, axis=1)
+    dy       = y - y_media[:, None]
+    Syy      = np.einsum("ij,ij->i", dy, dy)
+    pendiente = (dy @ dt)/Sxx
+    ordenada  = y_media - pendiente*t_media
+    residuo   = np.maximum(Syy - pendiente**2*Sxx, 0.0)
+    r_value   = pendiente*np.sqrt(Sxx/Syy)
+    std_err   = np.sqrt(residuo/(len(t) - 2)/Sxx)
+    return pendiente, ordenada, r_value, std_err
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Procesamiento_Sincronico(Mediciones_capacitor,V_max,Sweep_Time,Frec,Rp,V_offset=0.0,incluir_descarga=True,Escala=None):
+    """
+    Entrada: Las mismas que Procesamiento_Carga_y_Descarga más la frecuencia del generador.
+    Retorna: Los mismos resultados que Procesamiento_Carga_y_Descarga. Cada pendiente es el pseudovalor jackknife
+             de un semiciclo: su media es la pendiente del semiciclo promedio corregida por sesgo y su dispersión
+             da la incertidumbre tipo A entre ciclos, así que Calculo_Incertidumbre y Bootstrap_Ciclos se usan sin
+             cambios. Las ordenadas también son pseudovalores; r y el error estándar son los de cada ajuste con
+             un semiciclo excluido.
+    Función: Promedio sincrónico. Con el período de Semiciclos_Fase todos los semiciclos válidos se alinean con
+             resolución de submuestra (Ciclos_Alineados), se promedian en uno solo y se linealiza una vez entre los
+             cruces de 0.1 y 0.9. El ruido y la cuantización del promedio bajan con la raíz de la cantidad de ciclos,
+             lo que importa con tau chicos, donde cada ciclo deja pocas decenas de muestras dentro de la ventana.
+             Si las cargas o las descargas tienen menos de dos semiciclos válidos se excluyen con un aviso y se
+             promedia solo la otra rama.
+    """
+    valores, valor_inicial, valor_final = Umbrales_Ciclos(Mediciones_capacitor, V_max, V_offset, Escala)
+    escala = 1.0 if Escala is None else Escala
+
+    V_dig = V_max* 0.6321205588
+    slope_vector,intercept_vector,r_value_vector,std_err_vector = [], [], [], []
+    Cantidad_cargas_validas = 0
+
+    for descarga in ((False, True) if incluir_descarga else (False,)):
+        Fase = Semiciclos_Fase(valores, Sweep_Time, Frec, valor_inicial, valor_final, descarga)
+        if not np.all(Fase["Valido"]):
+            print(f"[AVISO] {np.sum(~Fase['Valido'])} semiciclos de {'descarga' if descarga else 'carga'} no coinciden con la "
+                  f"predicción por fase y se excluyen del promedio: {list(Fase['Semiciclo'][~Fase['Valido']])}")
+        entradas = Fase["Entrada"][Fase["Valido"]]
+        Cantidad = len(entradas)
+        if Cantidad < 2:
+            print(f"[AVISO] Solo {Cantidad} semiciclos de {'descarga' if descarga else 'carga'} válidos; se necesitan al menos "
+                  f"dos para el promedio sincrónico y se excluyen {'las descargas' if descarga else 'las cargas'}.")
+            continue
+
+        Largo = int(np.floor(Fase["Desfasaje"])) + 1
+        t     = np.arange(Largo)*Sweep_Time
+
+        def linealizar(promedio):
+            u = (promedio*escala - V_offset)/V_max
+            return np.log(u) if descarga else np.log(1 - u)
+
+        suma = np.zeros(Largo)
+        for bloque in Ciclos_Alineados(valores, entradas, Largo):
+            suma += bloque.sum(axis=0)
+        pendiente, ordenada, _, _ = Regresion_Filas(linealizar(suma/Cantidad)[None, :], t)
+
+        # Jackknife: un ajuste por semiciclo excluido, sobre el promedio de los demás
+        for bloque in Ciclos_Alineados(valores, entradas, Largo):
+            s, o, r, e = Regresion_Filas(linealizar((suma - bloque)/(Cantidad - 1)), t)
+            slope_vector.extend(Cantidad*pendiente[0] - (Cantidad - 1)*s)
+            intercept_vector.extend(Cantidad*ordenada[0] - (Cantidad - 1)*o)
+            r_value_vector.extend(r)
+            std_err_vector.extend(e)
+        if not descarga:
+            Cantidad_cargas_validas = Cantidad
+
+    if not slope_vector:
+        raise ValueError("Se necesitan al menos dos semiciclos de carga o de descarga para el promedio sincrónico.")
+
+    Cantidad_ciclos_validos = len(slope_vector)
+    Cx = [-1 / float(slope * float(Rp)) for slope in slope_vector]
+
+    return Cx,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,len(valores),V_dig,Cantidad_cargas_validas
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Segmentar_Ciclos(valores,valor_inicial,valor_final,descarga=False,Segmentacion="UMBRAL",Sweep_Time=None,Frec=None,Piramide=None):
+    """
+    Entrada: Registro, umbrales, tipo de semiciclo, modo de segmentación ("UMBRAL": máquina de estados de
+             Detectar_Ciclos; "FASE": Segmentacion_Fase), tiempo entre muestras y frecuencia (necesarios para "FASE")
+             y pirámide de mínimos y máximos.
+    Retorna: Inicios, finales (desde 1) y si la ventana de linealización se toma por tiempo (Por_Tiempo).
+    """
+    if Segmentacion == "FASE":
+        inicios, fines, Discrepancias, _ = Segmentacion_Fase(valores, Sweep_Time, Frec, valor_inicial, valor_final, descarga)
+        if Discrepancias:
+            print(f"[AVISO] {len(Discrepancias)} semiciclos de {'descarga' if descarga else 'carga'} no coinciden con la "
+                  f"predicción por fase y se descartan: {[d['Semiciclo'] for d in Discrepancias]}")
+        return inicios, fines, True
+    if Segmentacion != "UMBRAL":
+        raise ValueError(f"Segmentación '{Segmentacion}' no soportada.")
+    inicios, fines = Detectar_Ciclos(valores, valor_inicial, valor_final, descarga, Piramide)
+    return inicios, fines, False
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Umbrales_Ciclos(Mediciones_capacitor,V_max,V_offset=0.0,Escala=None):
+    """
+    Entrada: Registro (en volt o códigos SINT), V_max, nivel bajo del generador y factor de escala de los códigos.
+    Retorna: El registro como arreglo y los umbrales inferior y superior de Detectar_Ciclos en sus mismas unidades.
+    """
+    if Escala is None:
+        return np.asarray(Mediciones_capacitor, dtype=float), 0.1 * V_max + V_offset, 0.9 * V_max + V_offset
+    return (np.asarray(Mediciones_capacitor, dtype=np.int16),
+            Umbral_Codigo(0.1 * V_max + V_offset, Escala), Umbral_Codigo(0.9 * V_max + V_offset, Escala))
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Procesamiento_Carga_y_Descarga(Mediciones_capacitor,V_max,Sweep_Time,Rp,V_offset=0.0,incluir_descarga=True,Escala=None,Piramide=None,
+                                   Segmentacion="UMBRAL",Frec=None,Calidad=False):
+    """
+    Entrada: Vector de muestras, V_max, tiempo entre muestras, resistencia (patrón + cables), nivel bajo del
+             generador, si se usan también las descargas y el factor de escala si las muestras son códigos SINT
+             (en ese caso la detección de ciclos se hace con umbrales enteros y el registro no se pasa a float)
+             la pirámide de mínimos y máximos del registro si ya está calculada y el modo de segmentación
+             (ver Segmentar_Ciclos; "FASE" necesita la frecuencia del generador). Con Calidad=True se agrega
+             la tabla de calidad de todos los ciclos (Tabla_Calidad).
+    Retorna: Los mismos resultados que Procesamiento_Curva más la cantidad de cargas válidas y, si se pide,
+             la tabla de calidad. Las pendientes de carga van primero y a continuación las de descarga.
+    Función: Aprovecha los dos semiperíodos de la cuadrada: cada período aporta una carga y una descarga,
+             por lo que para una misma incertidumbre tipo A hace falta aproximadamente la mitad del registro.
+    """
+    valores, valor_inicial, valor_final = Umbrales_Ciclos(Mediciones_capacitor, V_max, V_offset, Escala)
+
+    V_dig         = V_max* 0.6321205588
+
+    if Segmentacion == "UMBRAL" and Piramide is None and len(valores) >= 16*Factor_Piramide:
+        Piramide = Piramide_MinMax(valores, Niveles=1)
+
+    inicios, fines, Por_Tiempo = Segmentar_Ciclos(valores, valor_inicial, valor_final, False, Segmentacion, Sweep_Time, Frec, Piramide)
+    slope_vector,intercept_vector,r_value_vector,p_value_vector,std_err_vector,Tabla = Regresion_Ciclos(
+        valores, inicios, fines, V_max, Sweep_Time, V_offset, Escala=Escala, Por_Tiempo=Por_Tiempo, Calidad=True)
+    Cantidad_cargas_validas = len(slope_vector)
+
+    if incluir_descarga:
+        inicios, fines, Por_Tiempo = Segmentar_Ciclos(valores, valor_inicial, valor_final, True, Segmentacion, Sweep_Time, Frec, Piramide)
+        *resultados_descarga, Tabla_descarga = Regresion_Ciclos(valores, inicios, fines, V_max, Sweep_Time, V_offset, descarga=True, Escala=Escala,
+                                                                Por_Tiempo=Por_Tiempo, Calidad=True)
+        for vector, vector_descarga in zip((slope_vector,intercept_vector,r_value_vector,p_value_vector,std_err_vector), resultados_descarga):
+            vector.extend(vector_descarga)
+        Tabla = Unir_Tablas_Calidad(Tabla, Tabla_descarga)
+
+    Cantidad_ciclos_validos = len(slope_vector)
+
+    # C = tau/R y tau = -1/slope  => C = -1/R*slope
+    Cx = [-1 / float(slope * float(Rp)) for slope in slope_vector]
+
+    resultados = Cx,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,len(valores),V_dig,Cantidad_cargas_validas
+    return resultados + (Tabla,) if Calidad else resultados
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Bloques_Registro(fuente,Tamano_bloque=Tamano_Bloque):
+    """
+    Entrada: Ruta de un registro (.npy de códigos SINT o texto con un valor por línea), arreglo (por ejemplo un
+             np.memmap) o iterador de bloques, y cantidad de muestras por bloque.
+    Retorna: Generador de bloques de a lo sumo Tamano_bloque muestras.
+    Función: Lectura por partes: el .npy se abre mapeado en memoria y el texto se lee de a Tamano_bloque líneas,
+             así nunca hay más de un bloque en memoria.
+    """
+    if isinstance(fuente, (str, Path)):
+        ruta = Path(fuente)
+        if ruta.suffix == ".npy":
+            fuente = np.load(ruta, mmap_mode="r")
+        else:
+            with open(ruta, "r") as file:
+                while True:
+                    lineas = [linea for linea in itertools.islice(file, Tamano_bloque) if linea.strip()]
+                    if not lineas:
+                        return
+                    yield np.array(lineas, dtype=float)
+
+    if isinstance(fuente, (np.ndarray, list)):
+        for k in range(0, len(fuente), Tamano_bloque):
+            yield np.asarray(fuente[k:k + Tamano_bloque])
+    else:
+        for bloque in fuente:
+            for k in range(0, len(bloque), Tamano_bloque):
+                yield np.asarray(bloque[k:k + Tamano_bloque])
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+class Analizador_Por_Bloques:
+    """
+    Versión por bloques de Procesamiento_Carga_y_Descarga para registros más grandes que la memoria.
+    La máquina de estados de Detectar_Ciclos se continúa de un bloque al siguiente (Transiciones_Ciclos) y de cada
+    semiciclo abierto solo se guardan las sumas de la regresión (n, Σt, Σy, Σt², Σty, Σy², con t relativo al
+    inicio del semiciclo), de modo que la memoria queda acotada por el tamaño de bloque. Al cerrarse un semiciclo
+    se obtienen pendiente, ordenada, r y error estándar con las mismas fórmulas que linregress y se aplica el mismo
+    filtro de R², por lo que los resultados coinciden con el procesamiento en memoria salvo redondeo.
+    Con Escala el registro son códigos SINT y se usan umbrales en unidades de código y Tabla_Linealizacion.
+    """
+
+    def __init__(self,V_max,Sweep_Time,V_offset=0.0,incluir_descarga=True,Escala=None,R_Cuadrado=R_Cuadrado):
+        self.V_max       = V_max
+        self.Sweep_Time  = Sweep_Time
+        self.V_offset    = V_offset
+        self.Escala      = Escala
+        self.R_Cuadrado  = R_Cuadrado
+        self.Muestras    = 0
+
+        if Escala is None:
+            self.umbrales = (0.1 * V_max + V_offset, 0.9 * V_max + V_offset)
+            self.ventana  = (Extremo_de_ventana_inf, Extremo_de_ventana_sup)
+        else:
+            self.umbrales = (Umbral_Codigo(0.1 * V_max + V_offset, Escala), Umbral_Codigo(0.9 * V_max + V_offset, Escala))
+            self.ventana  = (int(np.ceil(Extremo_de_ventana_inf/Escala)), int(np.floor(Extremo_de_ventana_sup/Escala)))
+
+        # Por tipo de semiciclo: estado de la máquina, semiciclo abierto [inicio, sumas] y resultados
+        self.semiciclos = (False, True) if incluir_descarga else (False,)
+        self.estado     = {descarga: (False, False) for descarga in self.semiciclos}
+        self.abierto    = {descarga: None for descarga in self.semiciclos}
+        self.regresion  = {descarga: [] for descarga in self.semiciclos}
+
+    def _linealizar(self,segmento,descarga):
+        """ Tensión linealizada de las muestras del segmento dentro de la ventana y su máscara. """
+        mascara = (segmento >= self.ventana[0]) & (segmento <= self.ventana[1])
+        if self.Escala is not None:
+            tabla = Tabla_Linealizacion(float(self.Escala), float(self.V_max), float(self.V_offset), descarga)
+            return mascara, tabla[np.asarray(segmento[mascara], dtype=np.int16).view(np.uint16)]
+        tension = segmento[mascara]
+        if descarga:
+            return mascara, np.log((tension - self.V_offset)/self.V_max)
+        return mascara, np.log(1 - (tension - self.V_offset)/self.V_max)
+
+    def _sumar(self,bloque,descarga,desde,hasta):
+        """ Agrega al semiciclo abierto las muestras con número (desde 1) entre desde y hasta inclusive. """
+        inicio, sumas = self.abierto[descarga]
+        base          = self.Muestras + 1
+        mascara, y    = self._linealizar(bloque[desde - base:hasta - base + 1], descarga)
+        t             = (np.flatnonzero(mascara) + desde - inicio)*self.Sweep_Time
+        sumas        += (len(t), t.sum(), y.sum(), np.dot(t, t), np.dot(t, y), np.dot(y, y))
+
+    def _cerrar(self,descarga):
+        """ Regresión del semiciclo abierto a partir de sus sumas (fórmulas de linregress). """
+        inicio, (n, St, Sy, Stt, Sty, Syy) = self.abierto[descarga]
+        self.abierto[descarga] = None
+        if n < 3:
+            return
+        Sxx = Stt - St*St/n
+        Sxy = Sty - St*Sy/n
+        Syy = Syy - Sy*Sy/n
+        if Sxx <= 0 or Syy <= 0:
+            return
+        slope   = Sxy/Sxx
+        r_value = np.clip(Sxy/np.sqrt(Sxx*Syy), -1.0, 1.0)
+        if r_value**2 <= self.R_Cuadrado:
+            return
+        std_err   = np.sqrt((1 - r_value**2)*Syy/Sxx/(n - 2))
+        intercept = Sy/n - slope*St/n - slope*(inicio - 1)*self.Sweep_Time
+        self.regresion[descarga].append((slope, intercept, r_value, std_err))
+
+    def agregar(self,bloque):
+        """ Procesa un bloque de muestras. """
+        bloque = np.asarray(bloque) if self.Escala is not None else np.asarray(bloque, dtype=float)
+        base   = self.Muestras + 1
+        fin_bloque = self.Muestras + len(bloque)
+        Piramide   = Piramide_MinMax(bloque, Niveles=1) if len(bloque) >= 16*Factor_Piramide else None
+
+        for descarga in self.semiciclos:
+            cargando, enganche = self.estado[descarga]
+            if Piramide is not None:
+                inicios, fines, cargando, enganche = Transiciones_Piramide(bloque, *self.umbrales, descarga, Piramide, cargando, enganche, base)
+            else:
+                inicios, fines, cargando, enganche = Transiciones_Ciclos(bloque, *self.umbrales, descarga, cargando, enganche, base)
+            self.estado[descarga] = (cargando, enganche)
+
+            # Los eventos alternan: si había un semiciclo abierto el primero es un final
+            eventos = sorted([(i, True) for i in inicios] + [(i, False) for i in fines])
+            cursor  = base
+            for muestra, es_inicio in eventos:
+                if es_inicio:
+                    self.abierto[descarga] = [muestra, np.zeros(6)]
+                    cursor = muestra
+                elif self.abierto[descarga] is not None:
+                    self._sumar(bloque, descarga, cursor, muestra)
+                    self._cerrar(descarga)
+            if self.abierto[descarga] is not None:
+                self._sumar(bloque, descarga, cursor, fin_bloque)
+
+        self.Muestras = fin_bloque
+
+    def resultados(self,Rp):
+        """
+        Retorna: Los mismos resultados que Procesamiento_Carga_y_Descarga con los semiciclos cerrados hasta el momento
+                 (el semiciclo abierto al final del registro se descarta, como en Detectar_Ciclos).
+        """
+        filas = self.regresion[False] + (self.regresion[True] if True in self.regresion else [])
+        slope_vector, intercept_vector, r_value_vector, std_err_vector = (
+            [list(columna) for columna in zip(*filas)] if filas else ([], [], [], []))
+        Cx = [-1 / float(slope * float(Rp)) for slope in slope_vector]
+        return (Cx, slope_vector, intercept_vector, r_value_vector, std_err_vector, len(slope_vector), self.Muestras,
+                self.V_max * 0.6321205588, len(self.regresion[False]))
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Procesamiento_Por_Bloques(fuente,Sweep_Time,Rp,V_max=None,V_offset=0.0,incluir_descarga=True,Escala=None,
+                              Frec=None,tau_inicial=None,Periodos_Vmax=20,Tamano_bloque=Tamano_Bloque):
+    """
+    Entrada: Registro (ver Bloques_Registro), tiempo entre muestras, resistencia (patrón + cables), V_max y V_off
+             (None estima ambos), uso de descargas, factor de escala de los códigos SINT, frecuencia y tau inicial
+             (necesarios para estimar V_max), períodos usados para estimar V_max y muestras por bloque.
+    Retorna: Los mismos resultados que Procesamiento_Registro_Unico: los de Procesamiento_Carga_y_Descarga más V_max,
+             su desviación entre ciclos (0 si V_max es dato) y V_off.
+    Función: Análisis de registros más grandes que la memoria con Analizador_Por_Bloques. Sin V_max se estima con
+             Estimar_Vmax_Exponencial sobre los primeros Periodos_Vmax períodos (como en el registro único), que son
+             los únicos que se retienen a la vez además del bloque en curso.
+    """
+    bloques = Bloques_Registro(fuente, Tamano_bloque)
+
+    previos   = []
+    V_max_std = 0.0
+    if V_max is None:
+        if Frec is None:
+            raise ValueError("Para estimar V_max por bloques hace falta la frecuencia del generador.")
+        Muestras_Vmax = int(np.ceil(Periodos_Vmax/(Frec*Sweep_Time)))
+        for bloque in bloques:
+            previos.append(bloque)
+            if sum(len(b) for b in previos) >= Muestras_Vmax:
+                break
+        inicio_registro = Tension_Registro(np.concatenate(previos)[:Muestras_Vmax], Escala)
+        V_max, V_max_std, V_offset, _ = Estimar_Vmax_Exponencial(inicio_registro, Sweep_Time, Frec, tau_inicial)
+
+    Analizador = Analizador_Por_Bloques(V_max, Sweep_Time, V_offset, incluir_descarga, Escala)
+    for bloque in itertools.chain(previos, bloques):
+        Analizador.agregar(bloque)
+
+    resultados = Analizador.resultados(Rp)
+    if resultados[5] == 0:
+        raise ValueError("Ningún ciclo superó el filtro de R².")
+
+    return resultados + (V_max, V_max_std, V_offset)
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Cruces_Histeresis(valores,nivel_bajo,nivel_alto):
+    """
+    Entrada: Vector de muestras y niveles bajo y alto de la histéresis.
+    Retorna: Para las subidas, la primera muestra que abandona el nivel bajo y la primera que alcanza el alto;
+             para las bajadas, la primera que abandona el nivel alto y la primera que alcanza el bajo.
+    Función: Detección de flancos tipo Schmitt: el ruido alrededor de un único umbral no genera cruces espurios.
+    """
+    valores = np.asarray(valores)
+    zona    = np.where(valores >= nivel_alto, 1, np.where(valores <= nivel_bajo, -1, 0))
+    indices = np.flatnonzero(zona)
+    zona    = zona[indices]
+
+    cambios = np.flatnonzero(zona[1:] != zona[:-1])
+    salida  = indices[cambios] + 1        # primera muestra fuera de la zona anterior
+    llegada = indices[cambios + 1]        # primera muestra en la zona nueva
+    sube    = zona[cambios + 1] == 1
+
+    return salida[sube], llegada[sube], salida[~sube], llegada[~sube]
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Estimar_Tau_Inicial(Mediciones_capacitor,Sweep_Time,Frec):
+    """
+    Entrada: Vector de muestras del capacitor, Tiempo entre muestras, Frecuencia del generador.
+    Retorna: Estimación gruesa de tau.
+    Función: Mide cuántas muestras tarda cada carga en pasar del 25 % al 75 % de la excursión (tau*ln3).
+             Solo se usa como punto de partida de la segmentación y de los ajustes.
+    """
+    valores  = np.asarray(Mediciones_capacitor, dtype=float)
+    v_min, v_max = np.percentile(valores, [0.5, 99.5])
+
+    salida_25, llegada_75, _, _ = Cruces_Histeresis(valores, v_min + 0.25*(v_max - v_min), v_min + 0.75*(v_max - v_min))
+
+    if len(llegada_75) == 0:
+        raise ValueError("No se encontraron cargas completas en el registro del capacitor.")
+
+    return np.median(llegada_75 - salida_25)*Sweep_Time/np.log(3)
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Estimar_Vmax_Exponencial(Mediciones_capacitor,Sweep_Time,Frec,tau_inicial=None):
+    """
+    Entrada: Vector de muestras del capacitor, Tiempo entre muestras, Frecuencia del generador y tau inicial opcional.
+    Retorna: V_max, desviación estándar de V_max entre ciclos, nivel bajo V_off y vector de V_max por carga.
+    Función: Las asíntotas A_k del ajuste exponencial conjunto (Ajuste_Exponencial) son los niveles del generador:
+             el de las cargas es V_off + V_max y el de las descargas V_off. V_max y tau salen del mismo ajuste,
+             sin corregir mesetas con un tau previo.
+    """
+    valores = np.asarray(Mediciones_capacitor, dtype=float)
+    if tau_inicial is None:
+        tau_inicial = Estimar_Tau_Inicial(valores, Sweep_Time, Frec)
+
+    inicios, fines, es_carga = Segmentos_Exponenciales(valores, Sweep_Time, tau_inicial, incluir_descarga=True)
+    if not np.any(es_carga) or np.all(es_carga):
+        raise ValueError("Se necesitan cargas y descargas completas para estimar V_max.")
+    _, _, A, _, _ = Ajuste_Exponencial(valores, inicios, fines, Sweep_Time, tau_inicial)
+
+    V_off        = np.mean(A[~es_carga])
+    V_max_ciclos = A[es_carga] - V_off
+    V_max_std    = np.sqrt(np.var(A[es_carga]) + np.var(A[~es_carga]))
+
+    return np.mean(V_max_ciclos), V_max_std, V_off, V_max_ciclos
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Procesamiento_Registro_Unico(Mediciones_capacitor,Sweep_Time,Frec,Rp,tau_inicial=None,incluir_descarga=True,Escala=None,Piramide=None,
+                                 Segmentacion="UMBRAL",Sincronico=False,Calidad=False):
+    """
+    Entrada: Vector de muestras del capacitor, Tiempo entre muestras, Frecuencia del generador,
+             Valor de resistencia (patrón + cables), tau inicial opcional, si se usan también las descargas
+             el factor de escala si las muestras son códigos SINT, su pirámide de mínimos y máximos, el modo de
+             segmentación (ver Segmentar_Ciclos) y si se promedian los ciclos antes de linealizar
+             (Procesamiento_Sincronico; en ese caso la segmentación es siempre por fase).
+    Retorna: Los mismos resultados que Procesamiento_Carga_y_Descarga más V_max, su desviación entre ciclos y V_off
+             y, con Calidad=True, la tabla de calidad por ciclo (None en el promedio sincrónico).
+    Función: Calibración con una sola adquisición. V_max y V_off se toman de las asíntotas del ajuste
+             exponencial del propio registro y luego se linealiza cada ciclo como en el método de dos registros.
+    """
+    V_max, V_max_std, V_off, V_max_ciclos = Estimar_Vmax_Exponencial(Tension_Registro(Mediciones_capacitor, Escala),
+                                                                     Sweep_Time, Frec, tau_inicial)
+
+    if Sincronico:
+        resultados = Procesamiento_Sincronico(Mediciones_capacitor, V_max, Sweep_Time, Frec, Rp, V_offset=V_off,
+                                              incluir_descarga=incluir_descarga, Escala=Escala)
+        Tabla      = None
+    else:
+        resultados = Procesamiento_Carga_y_Descarga(Mediciones_capacitor, V_max, Sweep_Time, Rp, V_offset=V_off,
+                                                    incluir_descarga=incluir_descarga, Escala=Escala, Piramide=Piramide,
+                                                    Segmentacion=Segmentacion, Frec=Frec, Calidad=True)
+        resultados, Tabla = resultados[:9], resultados[9]
+    if resultados[5] == 0:
+        raise ValueError("Ningún ciclo superó el filtro de R²." + ("" if Tabla is None else "\n" + Resumen_Calidad(Tabla)))
+
+    resultados = resultados + (V_max, V_max_std, V_off)
+    return resultados + (Tabla,) if Calidad else resultados
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Validacion_Registro_Unico(carpeta_mediciones,ruta_reporte=None,Rcablegenerador=0.0):
+    """
+    Entrada: Carpeta 'Mediciones' del archivo, ruta opcional del reporte CSV y resistencia de cables.
+    Retorna: Lista de filas del reporte (una por corrida con generador, capacitor y configuración).
+    Función: Compara V_max, Cx e incertidumbre del método de dos registros contra el de registro único.
+    """
+    carpeta = Path(carpeta_mediciones)
+    filas   = []
+
+    for ruta_config in sorted((carpeta / "Config").glob("Medicion_*.json")):
+        ruta_generador = carpeta / "Generador_1" / (ruta_config.stem + ".txt")
+        ruta_capacitor = carpeta / "Capacitor_1" / (ruta_config.stem + ".txt")
+        if not (ruta_generador.exists() and ruta_capacitor.exists()):
+            continue
+
+        with open(ruta_config, "r") as file:
+            config = json.load(file)
+        Vn_Cx, Vn_Rp, Frec, Sweep_time = config["Vn_Cx"], config["Vn_Rp"], config["Frec"], config["Sweep_time"]
+        Rp = Vn_Rp + Rcablegenerador
+
+        fila = {"Corrida": ruta_config.stem}
+        try:
+            Medicion_Generador = np.loadtxt(ruta_generador)
+            Medicion_Capacitor = np.loadtxt(ruta_capacitor)
+
+            Triage = Triage_Registro(Medicion_Capacitor, Sweep_time, Frec)
+            if not Triage["Valido"]:
+                fila["Estado"] = "DESCARTADO: " + "; ".join(Triage["Motivos"])
+                filas.append(fila)
+                continue
+
+            # Método de dos registros
+            V_max_2, V_max_std_2 = analizar_senal_cuadrada(Medicion_Generador)
+            Cx_v, slope_2, _, _, _, n_2, _, V_dig_2 = Procesamiento_Curva(Medicion_Capacitor, V_max_2, Sweep_time, Rp, interactivo=False)
+            uc_2, ucp_2 = Calculo_Incertidumbre(slope_2, n_2, V_dig_2, V_max_2, Vn_Cx, Vn_Rp)
+            Cx_2 = np.mean(Cx_v)
+
+            # Método de registro único
+            Cx_v, slope_1, _, _, _, n_1, _, V_dig_1, cargas_1, V_max_1, V_max_std_1, V_off_1 = Procesamiento_Registro_Unico(
+                Medicion_Capacitor, Sweep_time, Frec, Rp, tau_inicial=config.get("Vn_Tau"), incluir_descarga=False)
+            uc_1, ucp_1 = Calculo_Incertidumbre(slope_1, n_1, V_dig_1, V_max_1, Vn_Cx, Vn_Rp, uVM_A=V_max_std_1/np.sqrt(n_1))
+            Cx_1 = np.mean(Cx_v)
+
+            fila.update({
+                "V_max_dos_registros": V_max_2, "V_max_registro_unico": V_max_1, "V_off_registro_unico": V_off_1,
+                "Dif_V_max_ppm": (V_max_1 - V_max_2)/V_max_2*1e6,
+                "Cx_dos_registros_uF": Cx_2*1e6, "Cx_registro_unico_uF": Cx_1*1e6,
+                "Dif_Cx_ppm": (Cx_1 - Cx_2)/Cx_2*1e6,
+                "uc_dos_registros_uF": uc_2, "uc_registro_unico_uF": uc_1,
+                "Ciclos_dos_registros": n_2, "Ciclos_registro_unico": n_1, "Estado": "OK",
+            })
+        except Exception as e:
+            fila["Estado"] = f"ERROR: {e}"
+        filas.append(fila)
+
+    if ruta_reporte is not None:
+        columnas = []
+        for fila in filas:
+            columnas += [clave for clave in fila if clave not in columnas]
+        with open(ruta_reporte, "w", newline="") as file:
+            escritor = csv.DictWriter(file, fieldnames=columnas)
+            escritor.writeheader()
+            escritor.writerows(filas)
+
+    return filas
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+
+def Acumular_Estadisticos(acumulado,valores):
+    """
+    Entrada: Tupla (n, media, M2) acumulada y nuevos valores.
+    Retorna: Tupla (n, media, M2) actualizada.
+    Función: Combinación de Chan/Welford de media y varianza por bloques; la desviación estándar
+             poblacional (como np.std) es sqrt(M2/n). No hace falta conservar los valores anteriores.
+    """
+    valores = np.asarray(valores, dtype=float)
+    n_a, media_a, M2_a = acumulado
+    n_b = len(valores)
+    if n_b == 0:
+        return acumulado
+
+    media_b = np.mean(valores)
+    M2_b    = np.sum((valores - media_b)**2)
+    n       = n_a + n_b
+    delta   = media_b - media_a
+
+    return n, media_a + delta*n_b/n, M2_a + M2_b + delta**2*n_a*n_b/n
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Adquisicion_Secuencial(Medir_Bloque,Sweep_Time,Frec,Rp,Vn_Cx,Vn_Rp,Objetivo_uc_porcentual,
+                           Muestras_por_bloque=None,Max_Muestras=100000,Max_Tiempo=None,
+                           V_max=None,V_offset=0.0,tau_inicial=None,incluir_descarga=True,Min_Ciclos=3):
+    """
+    Entrada: Función Medir_Bloque(n) que adquiere n muestras y devuelve un ndarray, tiempo entre muestras,
+             frecuencia, resistencia (patrón + cables), valores nominales, incertidumbre objetivo en %,
+             tamaño de bloque (por defecto 3 períodos), presupuesto de muestras y de tiempo (s),
+             V_max del generador (None para estimarlo del propio registro), V_off, tau inicial,
+             uso de descargas y cantidad mínima de ciclos antes de evaluar el corte.
+    Retorna: Cx, incertidumbre en uF y en %, vector de pendientes, ciclos válidos, muestras adquiridas,
+             V_max, motivo de finalización ("OBJETIVO", "MUESTRAS" o "TIEMPO") y el registro completo.
+    Función: Adquiere por bloques y actualiza pendientes e incertidumbre después de cada bloque, cortando
+             apenas uc_porcentual alcanza el objetivo o se agota el presupuesto.
+    """
+    import time
+
+    if Muestras_por_bloque is None:
+        Muestras_por_bloque = int(np.ceil(3/(Frec*Sweep_Time)))
+
+    registro_unico = V_max is None
+    tau            = tau_inicial
+    acum_slope     = (0, 0.0, 0.0)
+    acum_V_max     = (0, 0.0, 0.0)
+    acum_V_off     = (0, 0.0, 0.0)
+    slope_vector   = []
+    Cantidad_cargas = 0
+    bloques        = []
+    Muestras_totales = 0
+    inicio         = time.monotonic()
+    ucx, ucxp      = np.inf, np.inf
+    motivo         = "MUESTRAS"
+
+    while Muestras_totales < Max_Muestras:
+        n      = min(Muestras_por_bloque, Max_Muestras - Muestras_totales)
+        bloque = np.asarray(Medir_Bloque(n), dtype=float)
+        bloques.append(bloque)
+        Muestras_totales += len(bloque)
+
+        if registro_unico:
+            try:
+                if tau is None:
+                    tau = Estimar_Tau_Inicial(bloque, Sweep_Time, Frec)
+                _, _, V_off_bloque, V_max_ciclos = Estimar_Vmax_Exponencial(bloque, Sweep_Time, Frec, tau)
+            except ValueError:
+                V_max_ciclos = []
+            if len(V_max_ciclos) > 0:
+                acum_V_max = Acumular_Estadisticos(acum_V_max, V_max_ciclos)
+                acum_V_off = Acumular_Estadisticos(acum_V_off, [V_off_bloque]*len(V_max_ciclos))
+            if acum_V_max[0] == 0:
+                continue
+            V_max, V_offset = acum_V_max[1], acum_V_off[1]
+
+        resultados = Procesamiento_Carga_y_Descarga(bloque, V_max, Sweep_Time, Rp, V_offset=V_offset,
+                                                    incluir_descarga=incluir_descarga)
+        slope_vector    += resultados[1]
+        Cantidad_cargas += resultados[8]
+        acum_slope       = Acumular_Estadisticos(acum_slope, resultados[1])
+
+        n_ciclos, slope_promedio, M2 = acum_slope
+        if n_ciclos > 0:
+            tau = -1/slope_promedio
+
+        if n_ciclos >= Min_Ciclos:
+            utau_A = np.sqrt(M2/n_ciclos)/((slope_promedio**2)*np.sqrt(n_ciclos))
+            uVM_A  = np.sqrt(acum_V_max[2]/acum_V_max[0]/acum_V_max[0]) if registro_unico else 0.0
+            ucx, ucxp = Calculo_Incertidumbre_Tau(tau, utau_A, V_max*0.6321205588, V_max, Vn_Cx, Vn_Rp,
+                                                  uVM_A, Cantidad_cargas/n_ciclos)
+            if ucxp <= Objetivo_uc_porcentual:
+                motivo = "OBJETIVO"
+                break
+
+        if Max_Tiempo is not None and time.monotonic() - inicio >= Max_Tiempo:
+            motivo = "TIEMPO"
+            break
+
+    if acum_slope[0] == 0:
+        raise ValueError("Ningún ciclo superó el filtro de R² dentro del presupuesto de adquisición.")
+
+    Cx = -1/(acum_slope[1]*Rp)
+
+    return Cx, ucx, ucxp, slope_vector, acum_slope[0], Muestras_totales, V_max, motivo, np.concatenate(bloques)
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+def Segmentos_Exponenciales(Mediciones,Sweep_Time,tau,incluir_descarga=True,fraccion_nivel=0.05,guarda=2):
+    """
+    Entrada: Vector de muestras del capacitor, tiempo entre muestras, tau estimado, uso de descargas,
+             fracción de la excursión que define los niveles de histéresis y muestras de guarda.
+    Retorna: Índices de inicio y fin (exclusivo) de cada semiciclo y vector booleano que indica las cargas.
+    Función: Cada carga va desde que la tensión abandona el nivel bajo hasta el flanco siguiente; el flanco
+             se ubica retrocediendo desde la salida del nivel alto el tiempo que tarda la exponencial en
+             recorrer fraccion_nivel. Las descargas se segmentan igual con los niveles invertidos.
+    """
+    valores      = np.asarray(Mediciones, dtype=float)
+    v_min, v_max = np.percentile(valores, [0.5, 99.5])
+    excursion    = v_max - v_min
+
+    sale_sube, _, sale_baja, _ = Cruces_Histeresis(valores, v_min + fraccion_nivel*excursion, v_max - fraccion_nivel*excursion)
+    retardo = int(np.ceil(-tau*np.log(1 - fraccion_nivel)/Sweep_Time)) + guarda
+
+    def semiciclos(salidas, siguientes):
+        posicion = np.searchsorted(siguientes, salidas)
+        validos  = posicion < len(siguientes)
+        return salidas[validos], siguientes[posicion[validos]] - retardo
+
+    inicios, fines = semiciclos(sale_sube, sale_baja)
+    es_carga       = np.ones(len(inicios), dtype=bool)
+    if incluir_descarga:
+        inicios_d, fines_d = semiciclos(sale_baja, sale_sube)
+        inicios  = np.concatenate([inicios, inicios_d])
+        fines    = np.concatenate([fines, fines_d])
+        es_carga = np.concatenate([es_carga, np.zeros(len(inicios_d), dtype=bool)])
+
+    validos = fines - inicios >= 5
+    return inicios[validos], fines[validos], es_carga[validos]
+
+##################################################################################################################################################################
+
+def Ajuste_Exponencial(Mediciones,inicios,fines,Sweep_Time,tau_inicial,max_iteraciones=50,tolerancia=1e-10):
+    """
+    Entrada: Vector de muestras, inicios y fines de los semiciclos, tiempo entre muestras y tau inicial.
+    Retorna: tau, su incertidumbre tipo A, vectores A y B por semiciclo y desviación estándar de los residuos.
+    Función: Ajuste conjunto de V(t) = A_k + B_k*exp(-t/tau) a todos los semiciclos (B_k < 0 en las cargas),
+             con tau compartido. Para cada tau los A_k, B_k salen por mínimos cuadrados lineales y tau avanza
+             por Gauss-Newton con el jacobiano analítico proyectado (proyección variable). Todas las sumas por
+             semiciclo se hacen con np.bincount, sin bucles sobre ciclos.
+    """
+    valores  = np.asarray(Mediciones, dtype=float)
+    inicios  = np.asarray(inicios)
+    largos   = np.asarray(fines) - inicios
+    K        = len(largos)
+    if K == 0:
+        raise ValueError("No hay semiciclos para ajustar.")
+
+    seg    = np.repeat(np.arange(K), largos)
+    local  = np.arange(len(seg)) - np.repeat(np.cumsum(largos) - largos, largos)
+    t      = local*Sweep_Time
+    y      = valores[inicios[seg] + local]
+    n      = np.bincount(seg, minlength=K).astype(float)
+
+    def proyeccion(tau):
+        e   = np.exp(-t/tau)
+        Se  = np.bincount(seg, e, K)
+        See = np.bincount(seg, e*e, K)
+        det = n*See - Se**2
+        A   = (See*np.bincount(seg, y, K) - Se*np.bincount(seg, e*y, K))/det
+        B   = (n*np.bincount(seg, e*y, K) - Se*np.bincount(seg, y, K))/det
+        r   = y - A[seg] - B[seg]*e
+
+        # Derivada del modelo respecto de tau, sin la parte explicada por A_k y B_k
+        J   = B[seg]*t*e/tau**2
+        SJ  = np.bincount(seg, J, K)
+        SJe = np.bincount(seg, J*e, K)
+        Jp  = J - ((See*SJ - Se*SJe)/det)[seg] - ((n*SJe - Se*SJ)/det)[seg]*e
+        return A, B, r, Jp
+
+    tau = float(tau_inicial)
+    for _ in range(max_iteraciones):
+        A, B, r, Jp = proyeccion(tau)
+        paso = np.dot(Jp, r)/np.dot(Jp, Jp)
+        if not np.isfinite(paso):
+            raise ValueError("El ajuste exponencial no está definido (semiciclos sin variación o degenerados).")
+        while tau + paso <= 0:
+            paso /= 2
+        tau += paso
+        if abs(paso) < tolerancia*tau:
+            break
+    else:
+        raise ValueError(f"El ajuste exponencial no convergió en {max_iteraciones} iteraciones.")
+
+    A, B, r, Jp = proyeccion(tau)
+    sigma2 = np.dot(r, r)/(len(r) - 2*K - 1)
+    utau_A = np.sqrt(sigma2/np.dot(Jp, Jp))
+
+    return tau, utau_A, A, B, np.sqrt(sigma2)
+
+##################################################################################################################################################################
+
+def Procesamiento_Exponencial(Mediciones_capacitor,Sweep_Time,Frec,Rp,tau_inicial=None,incluir_descarga=True):
+    """
+    Entrada: Vector de muestras del capacitor, tiempo entre muestras, frecuencia, resistencia (patrón + cables),
+             tau inicial opcional y uso de descargas.
+    Retorna: Cx, tau, incertidumbre tipo A de tau, semiciclos ajustados, cargas ajustadas y desviación de los residuos.
+    Función: Alternativa a la linealización con ln(1-V/V_max): no necesita V_max y usa casi todas las muestras
+             de cada semiciclo en lugar de la ventana de 0.1 a 0.9. Si los residuos superan Residuo_relativo_maximo
+             de la excursión lanza ValueError en lugar de devolver el tau.
+    """
+    valores = np.asarray(Mediciones_capacitor, dtype=float)
+    if tau_inicial is None:
+        tau_inicial = Estimar_Tau_Inicial(valores, Sweep_Time, Frec)
+
+    inicios, fines, es_carga = Segmentos_Exponenciales(valores, Sweep_Time, tau_inicial, incluir_descarga)
+    tau, utau_A, A, B, sigma = Ajuste_Exponencial(valores, inicios, fines, Sweep_Time, tau_inicial)
+
+    excursion = np.subtract(*np.percentile(valores, [99.5, 0.5]))
+    if not sigma <= Residuo_relativo_maximo*excursion:
+        raise ValueError(f"Los residuos del ajuste exponencial son {sigma/excursion:.1e} de la excursión "
+                         f"(máximo {Residuo_relativo_maximo:.0e}); el registro no sigue el modelo.")
+
+    return tau/Rp, tau, utau_A, len(inicios), int(np.sum(es_carga)), sigma
 
 ##################################################################################################################################################################
 ##################################################################################################################################################################
+def Espectro_Armonicos(Mediciones,Sweep_Time,Frec,inicio=None,fin=None):
+    """
+    Entrada: Vector de muestras, tiempo entre muestras, frecuencia nominal y tramo opcional [inicio, fin).
+    Retorna: Frecuencia medida, vector complejo de la FFT del tramo y cantidad de períodos que contiene.
+    Función: Toma un número entero de períodos entre el primer y el último flanco de subida, así cada
+             armónico k de la cuadrada cae exactamente en el bin k*períodos y no hay fuga espectral.
+    """
+    valores = np.asarray(Mediciones, dtype=float)
+    if inicio is None:
+        v_min, v_max = np.percentile(valores, [0.5, 99.5])
+        sube, _, _, _ = Cruces_Histeresis(valores, v_min + 0.3*(v_max - v_min), v_min + 0.7*(v_max - v_min))
+        if len(sube) < 2:
+            raise ValueError("El registro no contiene un período completo.")
+        inicio, fin = sube[0], sube[-1]
+
+    periodos = int(round((fin - inicio)*Sweep_Time*Frec))
+    if periodos < 1:
+        raise ValueError("El registro no contiene un período completo.")
+    Frec_medida = periodos/((fin - inicio)*Sweep_Time)
+
+    return Frec_medida, np.fft.rfft(valores[inicio:fin]), periodos
 
 ##################################################################################################################################################################
+
+def Estimar_Tau_Armonicos(Mediciones_capacitor,Sweep_Time,Frec,Medicion_Generador=None,Cant_Armonicos=15,Relacion_Senal_Ruido=10):
+    """
+    Entrada: Vector de muestras del capacitor, tiempo entre muestras, frecuencia, registro opcional del generador,
+             cantidad máxima de armónicos impares y relación señal/ruido mínima de cada armónico.
+    Retorna: tau, incertidumbre tipo A de tau, cantidad de armónicos usados y diferencia relativa del tau de la mitad
+             superior de los armónicos respecto del de la mitad inferior (Diferencia_Armonicos).
+    Función: Estimación de tau en el dominio de la frecuencia con H(f) = 1/(1 + j*2*pi*f*tau) en los armónicos
+             impares de la cuadrada. Con el registro del generador, |X_gen/X_cap|^2 = 1 + (2*pi*f*tau)^2 en cada
+             armónico; la fase no se usa porque los registros no son simultáneos. Sin él, la cuadrada ideal
+             tiene |X_k| proporcional a 1/k, por lo que 1/(k*|X_cap|)^2 es lineal en (2*pi*f_k)^2 con
+             pendiente/ordenada = tau^2. No necesita detectar ciclos ni conocer V_max; el costo es el de una FFT.
+             Un ciclo de trabajo distinto del 50 % o un capacitor cuya constante de tiempo depende de la frecuencia
+             sesgan el resultado sin aumentar su incertidumbre; la diferencia entre armónicos altos y bajos se
+             devuelve junto a tau y se avisa si supera Sigmas_Armonicos incertidumbres.
+    """
+    valores = np.asarray(Mediciones_capacitor, dtype=float)
+    Frec_medida, X_cap, periodos = Espectro_Armonicos(valores, Sweep_Time, Frec)
+
+    # Ruido de fondo: mediana de los bins que no son armónicos de la fundamental
+    bins      = np.arange(len(X_cap))
+    fondo     = np.median(np.abs(X_cap[(bins % periodos) != 0][1:]))
+    k         = np.arange(1, 2*Cant_Armonicos, 2)
+    k         = k[k*periodos < len(X_cap)]
+    X_k       = X_cap[k*periodos]
+    utiles    = np.abs(X_k) > Relacion_Senal_Ruido*fondo
+    k, X_k    = k[utiles], X_k[utiles]
+    omega     = 2*np.pi*k*Frec_medida
+
+    if len(k) < Min_Armonicos or k[0] != 1:
+        raise ValueError(f"Solo {len(k)} armónicos superan el ruido de fondo (se necesitan {Min_Armonicos} con la fundamental).")
+
+    if Medicion_Generador is not None:
+        # Los registros no son simultáneos: solo se comparan módulos, cada uno con sus propios períodos
+        _, X_gen, periodos_gen = Espectro_Armonicos(Medicion_Generador, Sweep_Time, Frec)
+        fondo_gen = np.median(np.abs(X_gen[(np.arange(len(X_gen)) % periodos_gen) != 0][1:]))*periodos/periodos_gen
+        X_gen  = X_gen[k*periodos_gen]*periodos/periodos_gen
+        q      = np.abs(X_gen/X_k)**2
+        tau2_k = (q - 1)/omega**2
+        Diferencia = Diferencia_Armonicos(tau2_k, 2*q*np.hypot(fondo/np.abs(X_k), fondo_gen/np.abs(X_gen))/omega**2)
+        tau_k  = np.sqrt(tau2_k)
+        peso   = np.abs(X_k)**2
+        tau    = np.sum(peso*tau_k)/np.sum(peso)
+        utau_A = np.sqrt(np.sum(peso*(tau_k - tau)**2)/np.sum(peso)/(len(k) - 1))
+        return tau, utau_A, len(k), Diferencia
+
+    # tau de cada armónico respecto de la fundamental: (k*|X_k|/|X_1|)^2 = (1 + w_1^2*tau^2)/(1 + w_k^2*tau^2)
+    r2 = (k[1:]*np.abs(X_k[1:])/np.abs(X_k[0]))**2
+    u_r2 = 2*r2*np.hypot(fondo/np.abs(X_k[1:]), fondo/np.abs(X_k[0]))
+    Diferencia = Diferencia_Armonicos((1 - r2)/(r2*omega[1:]**2 - omega[0]**2),
+                                      u_r2*(omega[1:]**2 - omega[0]**2)/(r2*omega[1:]**2 - omega[0]**2)**2)
+
+    # Mínimos cuadrados ponderados de y = a + b*omega^2, con var(y) proporcional a (2*y/|X_k|)^2
+    y    = 1/(k*np.abs(X_k))**2
+    peso = (np.abs(X_k)/(2*y))**2
+    M    = np.column_stack([np.ones_like(omega), omega**2])*np.sqrt(peso)[:, None]
+    (a, b), residuo, _, _ = np.linalg.lstsq(M, y*np.sqrt(peso), rcond=None)
+    sigma2 = residuo[0]/(len(k) - 2) if len(residuo) and len(k) > 2 else 0.0
+    cov    = sigma2*np.linalg.inv(M.T @ M)
+
+    tau2   = b/a
+    if not np.isfinite(tau2) or tau2 <= 0:
+        raise ValueError("El ajuste de los armónicos no da un tau positivo.")
+    u_tau2 = np.sqrt(cov[1, 1]/a**2 + (b/a**2)**2*cov[0, 0] - 2*b/a**3*cov[0, 1])
+    tau    = np.sqrt(tau2)
+
+    return tau, u_tau2/(2*tau), len(k), Diferencia
+
 ##################################################################################################################################################################
 
+def Diferencia_Armonicos(tau2_k,u_tau2_k):
+    """
+    Entrada: tau^2 obtenido de cada armónico por separado (en orden creciente de frecuencia) y su incertidumbre,
+             propagada desde el ruido de fondo del espectro.
+    Retorna: Diferencia relativa entre el tau promedio de la mitad superior de los armónicos y el de la mitad inferior.
+    Función: Con un único polo todos los armónicos dan el mismo tau. Los promedios de cada mitad se ponderan con la
+             inversa de la varianza de cada tau, y la incertidumbre de la diferencia se escala con la dispersión de
+             los armónicos respecto del promedio de su mitad. Si la diferencia supera Sigmas_Armonicos
+             incertidumbres se avisa. Lanza ValueError si algún armónico no da un tau^2 positivo y finito
+             (registros del generador y del capacitor que no corresponden), porque entonces no hay tau que devolver.
+    """
+    tau2_k   = np.asarray(tau2_k, dtype=float)
+    u_tau2_k = np.asarray(u_tau2_k, dtype=float)
+    if not np.all(np.isfinite(tau2_k) & (tau2_k > 0)):
+        raise ValueError("Hay armónicos que no siguen el modelo de un polo (tau^2 no positivo).")
+    tau_k = np.sqrt(tau2_k)
+    peso  = (2*tau_k/u_tau2_k)**2
+    mitad = len(tau_k)//2
+
+    promedios, varianzas, chi2 = [], [], 0.0
+    for tramo in (slice(None, mitad), slice(mitad, None)):
+        promedio = np.sum(peso[tramo]*tau_k[tramo])/np.sum(peso[tramo])
+        chi2    += np.sum(peso[tramo]*(tau_k[tramo] - promedio)**2)
+        promedios.append(promedio)
+        varianzas.append(1/np.sum(peso[tramo]))
+    escala = max(1.0, chi2/(len(tau_k) - 2)) if len(tau_k) > 2 else 1.0
+
+    bajo, alto = promedios
+    u_dif = np.sqrt(escala*sum(varianzas))
+    if abs(alto - bajo) > Sigmas_Armonicos*u_dif:
+        print(f"[AVISO] Los armónicos altos dan un tau {100*(alto - bajo)/bajo:+.2f} % distinto de los bajos "
+              f"({abs(alto - bajo)/u_dif:.1f} incertidumbres): el registro puede no seguir el modelo de un polo "
+              f"con cuadrada al 50 %.")
+    return (alto - bajo)/bajo
+
+##################################################################################################################################################################
+##################################################################################################################################################################
+
+# Sumas de la regresión V = c0 + c1*t + s*S sobre [1, t, S] (S = integral de V desde el inicio del semiciclo)
+Claves_Sumas_Integrales = ("n", "t", "S", "V", "tt", "tS", "SS", "tV", "SV", "VV")
+
+def Sumas_Integrales(V,t,S,seg=None,K=1):
+    """
+    Entrada: Tensiones, tiempos e integrales de cada muestra, semiciclo al que pertenece cada muestra y cantidad de semiciclos.
+    Retorna: Matriz (K, 10) con las sumas de Claves_Sumas_Integrales por semiciclo.
+    """
+    if seg is None:
+        seg = np.zeros(len(V), dtype=int)
+    columnas = (np.ones_like(V), t, S, V, t*t, t*S, S*S, t*V, S*V, V*V)
+    return np.column_stack([np.bincount(seg, c, K) for c in columnas])
+
+
+def Resolver_Sumas_Integrales(sumas):
+    """
+    Entrada: Matriz (K, 10) de sumas por semiciclo.
+    Retorna: Pendientes s = -1/tau y sus errores estándar por semiciclo, y la pendiente conjunta con su error estándar.
+    Función: Por semiciclo resuelve la regresión de 3 parámetros. La pendiente conjunta comparte s y deja c0, c1
+             libres en cada semiciclo: se proyecta S y V fuera de [1, t] con el complemento de Schur de cada
+             matriz normal y se suman numeradores y denominadores.
+    """
+    sumas = np.atleast_2d(sumas)
+    n, t, S, V, tt, tS, SS, tV, SV, VV = sumas.T
+
+    det    = n*tt - t**2
+    # Proyecciones sobre el complemento de [1, t]
+    SS_p   = SS - (tt*S**2 - 2*t*S*tS + n*tS**2)/det
+    SV_p   = SV - (tt*S*V - t*(S*tV + tS*V) + n*tS*tV)/det
+    VV_p   = VV - (tt*V**2 - 2*t*V*tV + n*tV**2)/det
+
+    slope   = SV_p/SS_p
+    residuo = np.maximum(VV_p - slope*SV_p, 0)
+    std_err = np.sqrt(residuo/np.maximum(n - 3, 1)/SS_p)
+
+    slope_conjunta   = np.sum(SV_p)/np.sum(SS_p)
+    residuo_conjunto = np.maximum(np.sum(VV_p) - slope_conjunta*np.sum(SV_p), 0)
+    std_err_conjunto = np.sqrt(residuo_conjunto/max(np.sum(n) - 2*len(n) - 1, 1)/np.sum(SS_p))
+
+    return slope, std_err, slope_conjunta, std_err_conjunto
+
+
+def Regresion_Integral_Ciclos(Mediciones,inicios,fines,Sweep_Time):
+    """
+    Entrada: Vector de muestras, inicios y fines (exclusivos) de los semiciclos y tiempo entre muestras.
+    Retorna: Pendientes y errores estándar por semiciclo, pendiente conjunta y su error estándar.
+    Función: Método de la integral: de tau*dV/dt = A - V resulta V = V(0) + (A/tau)*t - S/tau, lineal en t y en
+             S = integral de V (trapecios). La pendiente en S es -1/tau, igual que la de la linealización, pero
+             sin V_max y sin iteraciones.
+    """
+    valores = np.asarray(Mediciones, dtype=float)
+    inicios = np.asarray(inicios)
+    largos  = np.asarray(fines) - inicios
+    K       = len(largos)
+    if K == 0:
+        raise ValueError("No hay semiciclos para ajustar.")
+
+    seg   = np.repeat(np.arange(K), largos)
+    local = np.arange(len(seg)) - np.repeat(np.cumsum(largos) - largos, largos)
+    V     = valores[inicios[seg] + local]
+
+    # Integral por trapecios reiniciada al comienzo de cada semiciclo
+    paso       = np.zeros_like(V)
+    paso[1:]   = Sweep_Time*(V[1:] + V[:-1])/2
+    paso[local == 0] = 0
+    S          = np.cumsum(paso)
+    S         -= np.repeat(S[np.cumsum(largos) - largos], largos)
+
+    return Resolver_Sumas_Integrales(Sumas_Integrales(V, local*Sweep_Time, S, seg, K))
+
+##################################################################################################################################################################
+
+class Estimador_Integral:
+    """
+    Estimación incremental de tau con el método de la integral mientras llegan los datos.
+    Cada bloque se segmenta con la misma histéresis que Segmentos_Exponenciales, conservando el estado entre
+    bloques, y solo se guardan las diez sumas de cada semiciclo: el costo es O(1) por muestra y la memoria
+    no crece con la longitud del registro. Las muestras cercanas al último nivel alcanzado quedan pendientes
+    hasta saber si pertenecen al semiciclo abierto (retardo del flanco, como en Segmentos_Exponenciales).
+    Si no se indican los niveles de histéresis, se estiman cuando llegó al menos un período y medio.
+    """
+
+    def __init__(self,Sweep_Time,Frec,tau_inicial,nivel_bajo=None,nivel_alto=None,fraccion_nivel=0.05,guarda=2):
+        self.Sweep_Time       = Sweep_Time
+        self.Muestras_niveles = int(np.ceil(1.5/(Frec*Sweep_Time)))
+        self.fraccion_nivel   = fraccion_nivel
+        self.nivel_bajo       = nivel_bajo
+        self.nivel_alto       = nivel_alto
+        self.retardo          = int(np.ceil(-tau_inicial*np.log(1 - fraccion_nivel)/Sweep_Time)) + guarda
+
+        self.pendiente        = np.zeros(0)   # muestras todavía no asignadas
+        self.base             = 0             # índice global de pendiente[0]
+        self.zona             = 0             # último nivel confirmado (-1 bajo, 1 alto)
+        self.ultimo_en_zona   = -1            # índice global de la última muestra en ese nivel
+        self.Muestras         = 0
+
+        self.abierto          = None          # [inicio, muestras sumadas, S, V anterior, sumas, es_carga]
+        self.sumas            = []
+        self.es_carga         = []
+
+    def _sumar(self,hasta):
+        """ Agrega al semiciclo abierto las muestras pendientes con índice global menor que hasta. """
+        inicio, cuenta, S_prev, V_prev, sumas, es_carga = self.abierto
+        desde = inicio + cuenta
+        if hasta <= desde:
+            return
+        V    = self.pendiente[desde - self.base:hasta - self.base]
+        paso = self.Sweep_Time*(V + np.concatenate([[V_prev], V[:-1]]))/2
+        if cuenta == 0:
+            paso[0] = 0.0
+        S    = S_prev + np.cumsum(paso)
+        t    = (cuenta + np.arange(len(V)))*self.Sweep_Time
+        self.abierto = [inicio, cuenta + len(V), S[-1], V[-1], sumas + Sumas_Integrales(V, t, S)[0], es_carga]
+
+    def agregar(self,bloque):
+        """ Procesa un bloque de muestras. """
+        bloque = np.asarray(bloque, dtype=float)
+        self.pendiente = np.concatenate([self.pendiente, bloque])
+        self.Muestras += len(bloque)
+
+        if self.nivel_bajo is None:
+            if len(self.pendiente) < self.Muestras_niveles:
+                return
+            v_min, v_max    = np.percentile(self.pendiente, [0.5, 99.5])
+            self.nivel_bajo = v_min + self.fraccion_nivel*(v_max - v_min)
+            self.nivel_alto = v_max - self.fraccion_nivel*(v_max - v_min)
+
+        zona = np.where(self.pendiente >= self.nivel_alto, 1, np.where(self.pendiente <= self.nivel_bajo, -1, 0))
+        nz   = np.flatnonzero(zona)
+        z    = zona[nz]
+        if len(nz) == 0:
+            return
+        previa = np.concatenate([[self.zona], z[:-1]])
+
+        for j in np.flatnonzero(z != previa):
+            ultimo = self.base + nz[j - 1] if j > 0 else self.ultimo_en_zona
+            salida = ultimo + 1
+            if self.abierto is not None:
+                self._sumar(salida - self.retardo)
+                if self.abierto[1] >= 5:
+                    self.sumas.append(self.abierto[4])
+                    self.es_carga.append(self.abierto[5])
+                self.abierto = None
+            if self.zona != 0:
+                self.abierto = [salida, 0, 0.0, 0.0, np.zeros(len(Claves_Sumas_Integrales)), z[j] == 1]
+            self.zona = z[j]
+
+        self.ultimo_en_zona = self.base + nz[-1]
+
+        # Se conservan solo las muestras que todavía pueden cambiar de semiciclo
+        if self.abierto is not None:
+            self._sumar(self.ultimo_en_zona + 1 - self.retardo)
+            conservar = self.abierto[0] + self.abierto[1]
+        else:
+            conservar = self.ultimo_en_zona + 1
+        self.pendiente = self.pendiente[conservar - self.base:]
+        self.base      = conservar
+
+    def resultados(self,incluir_descarga=True,incluir_abierto=True):
+        """
+        Retorna: Pendientes y errores estándar de los semiciclos cerrados, pendiente conjunta (incluyendo el
+                 semiciclo en curso si incluir_abierto) con su error estándar, y cantidad de cargas cerradas.
+        """
+        sumas    = [suma for suma, carga in zip(self.sumas, self.es_carga) if carga or incluir_descarga]
+        cargas   = int(np.sum(self.es_carga))
+        conjunto = list(sumas)
+        if incluir_abierto and self.abierto is not None and self.abierto[1] >= 5 and (self.abierto[5] or incluir_descarga):
+            conjunto.append(self.abierto[4])
+        if not conjunto:
+            raise ValueError("Todavía no hay semiciclos completos.")
+
+        _, _, slope_conjunta, std_err_conjunto = Resolver_Sumas_Integrales(np.asarray(conjunto))
+        if not sumas:
+            return [], [], slope_conjunta, std_err_conjunto, 0
+        slope, std_err, _, _ = Resolver_Sumas_Integrales(np.asarray(sumas))
+        return list(slope), list(std_err), slope_conjunta, std_err_conjunto, cargas
+
+    def tau(self):
+        """ tau conjunto con los datos recibidos hasta el momento. """
+        return -1/self.resultados()[2]
+
+##################################################################################################################################################################
+
+def Procesamiento_Integral(Mediciones_capacitor,Sweep_Time,Frec,Rp,tau_inicial=None,incluir_descarga=True):
+    """
+    Entrada: Vector de muestras del capacitor, tiempo entre muestras, frecuencia, resistencia (patrón + cables),
+             tau inicial opcional y uso de descargas.
+    Retorna: Vector de Cx, vector de pendientes, errores estándar, cantidad de semiciclos, cantidad de cargas,
+             pendiente conjunta y su error estándar.
+    Función: Método de la integral sobre los semiciclos de Segmentos_Exponenciales. Las pendientes se usan igual
+             que las de Procesamiento_Carga_y_Descarga (Cx = -1/(s*Rp)) y con Calculo_Incertidumbre
+             pasando Cantidad_cargas=0, porque el método no depende de V_max.
+             Solo se conservan los semiciclos con pendiente negativa y error estándar menor que Error_relativo_integral
+             de la pendiente; con menos de Min_Semiciclos_Integral válidos lanza ValueError.
+    """
+    valores = np.asarray(Mediciones_capacitor, dtype=float)
+    if tau_inicial is None:
+        tau_inicial = Estimar_Tau_Inicial(valores, Sweep_Time, Frec)
+
+    inicios, fines, es_carga = Segmentos_Exponenciales(valores, Sweep_Time, tau_inicial, incluir_descarga)
+    slope, std_err, _, _ = Regresion_Integral_Ciclos(valores, inicios, fines, Sweep_Time)
+
+    validos = np.isfinite(slope) & (slope < 0) & (std_err < Error_relativo_integral*np.abs(slope))
+    if np.sum(validos) < Min_Semiciclos_Integral:
+        raise ValueError(f"Solo {int(np.sum(validos))} de {len(slope)} semiciclos siguen el modelo de la integral "
+                         f"(se necesitan {Min_Semiciclos_Integral}).")
+    if not np.all(validos):
+        print(f"[AVISO] Se descartan {int(np.sum(~validos))} de {len(slope)} semiciclos que no siguen el modelo de la integral.")
+        inicios, fines, es_carga = inicios[validos], fines[validos], es_carga[validos]
+    slope, std_err, slope_conjunta, std_err_conjunto = Regresion_Integral_Ciclos(valores, inicios, fines, Sweep_Time)
+
+    return (list(-1/(slope*Rp)), list(slope), list(std_err), len(slope), int(np.sum(es_carga)),
+            slope_conjunta, std_err_conjunto)
+
+##################################################################################################################################################################
+
+Metodos_Sin_Vmax = ("EXPONENCIAL", "ARMONICOS", "INTEGRAL")
+
+def Validar_Tau(tau,Sweep_Time,Frec,Rp,Vn_Cx=None):
+    """
+    Entrada: tau estimado, tiempo entre muestras, frecuencia, resistencia (patrón + cables) y Cx nominal opcional en uF.
+    Retorna: Nada; lanza ValueError si el tau no es admisible.
+    Función: Un tau que no es finito y positivo, que dura menos de dos muestras o que no deja al menos
+             Tau_por_semiperiodo_min constantes de tiempo en cada semiperíodo no sale de un registro válido. Con el
+             nominal, además rechaza los Cx que se apartan más de Tolerancia_nominal de Vn_Cx.
+    """
+    if not (np.isfinite(tau) and tau > 0):
+        raise ValueError(f"El tau estimado ({tau}) no es finito y positivo.")
+    if tau < 2*Sweep_Time or tau > 1/(2*Frec*Tau_por_semiperiodo_min):
+        raise ValueError(f"El tau estimado ({tau:.4g} s) está fuera del rango que el registro puede resolver "
+                         f"({2*Sweep_Time:.4g} s a {1/(2*Frec*Tau_por_semiperiodo_min):.4g} s).")
+    if Vn_Cx is not None and abs(tau/Rp*1e6/Vn_Cx - 1) > Tolerancia_nominal:
+        raise ValueError(f"El Cx estimado ({tau/Rp*1e6:.4g} uF) se aparta más del {Tolerancia_nominal*100:.0f} % "
+                         f"del nominal ({Vn_Cx} uF).")
+
+def Procesamiento_Sin_Vmax(Metodo,Mediciones_capacitor,Sweep_Time,Frec,Rp,tau_inicial=None,incluir_descarga=True,Medicion_Generador=None,
+                           Vn_Cx=None):
+    """
+    Entrada: Método ("EXPONENCIAL", "ARMONICOS" o "INTEGRAL"), vector de muestras del capacitor, tiempo entre muestras,
+             frecuencia, resistencia (patrón + cables), tau inicial, uso de descargas, registro opcional del generador
+             y Cx nominal opcional en uF.
+    Retorna: Cx, tau, incertidumbre tipo A de tau y cantidad de semiciclos o armónicos usados.
+    Función: Selección de los estimadores de tau que no usan V_max; su presupuesto se evalúa con
+             Calculo_Incertidumbre_Tau sin el término de gamma. El tau de cualquiera de ellos pasa por Validar_Tau
+             antes de devolverse.
+    """
+    if Metodo == "EXPONENCIAL":
+        Cx, tau, utau_A, Cantidad, _, _ = Procesamiento_Exponencial(Mediciones_capacitor, Sweep_Time, Frec, Rp,
+                                                                    tau_inicial, incluir_descarga)
+    elif Metodo == "ARMONICOS":
+        tau, utau_A, Cantidad, _ = Estimar_Tau_Armonicos(Mediciones_capacitor, Sweep_Time, Frec, Medicion_Generador)
+        Cx = tau/Rp
+    elif Metodo == "INTEGRAL":
+        Cx_vector, slope_vector, _, Cantidad, _, _, _ = Procesamiento_Integral(Mediciones_capacitor, Sweep_Time, Frec, Rp,
+                                                                              tau_inicial, incluir_descarga)
+        slope_promedio = np.mean(slope_vector)
+        Cx     = np.mean(Cx_vector)
+        tau    = -1/slope_promedio
+        utau_A = np.std(slope_vector)/((slope_promedio**2)*np.sqrt(Cantidad))
+    else:
+        raise ValueError(f"Método de ajuste '{Metodo}' no soportado.")
+
+    Validar_Tau(tau, Sweep_Time, Frec, Rp, Vn_Cx)
+    return Cx, tau, utau_A, Cantidad
+
+##################################################################################################################################################################
+##################################################################################################################################################################
 def Calculo_Valor_Medio(Vector):
     """
     Entrada: Vector de datos.
@@ -427,19 +2338,55 @@ def Calculo_Valor_Medio(Vector):
 ##################################################################################################################################################################
 ##################################################################################################################################################################
 
-def Calculo_Incertidumbre(slope_vector,Cantidad_ciclos,V_dig,V_max,Vn_Cx,Vn_Rp):
+def Calculo_Incertidumbre(slope_vector,Cantidad_ciclos,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A=0.0,Cantidad_cargas=None):
+    """
+    uVM_A es la incertidumbre tipo A de V_max (dispersión entre ciclos en el modo de registro único).
+    Cantidad_cargas indica cuántos de los ciclos son cargas cuando se combinan cargas y descargas:
+    la descarga ln(V/V_max) no depende de V_max, así que el término de gamma solo pesa la fracción de cargas.
+    """
 
     slope_promedio     = np.mean(slope_vector)
     slope_desv_est     = np.std(slope_vector)
     tau_promedio       = -1 / slope_promedio
     
-    
+    # Incertidumbre tipo a obtenida de función de linealización
+    utau_A     = slope_desv_est/((slope_promedio**2)*(Cantidad_ciclos)**(1/2))   
+
+    # Fracción de cargas entre los ciclos promediados
+    fraccion_carga = 1.0 if Cantidad_cargas is None else Cantidad_cargas/Cantidad_ciclos
+
+    return Calculo_Incertidumbre_Tau(tau_promedio,utau_A,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A,fraccion_carga)
+
+##################################################################################################################################################################
+
+def Calculo_Incertidumbre_Tau(tau_promedio,utau_A,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A=0.0,fraccion_carga=1.0):
+    """
+    Entrada: tau estimado y su incertidumbre tipo A, V_dig, V_max, valores nominales de Cx y Rp,
+             incertidumbre tipo A de V_max y fracción de cargas entre los ciclos promediados.
+    Salida: Incertidumbre combinada en uF y en %.
+    Función: Presupuesto de incertidumbre a partir de tau, para los estimadores que no entregan un vector de pendientes.
+    """
+    Presupuesto = Presupuesto_Incertidumbre(tau_promedio,utau_A,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A,fraccion_carga)
+    return Presupuesto["uc"], Presupuesto["uc_porcentual"]
+
+##################################################################################################################################################################
+
+def Presupuesto_Incertidumbre(tau_promedio,utau_A,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A=0.0,fraccion_carga=1.0):
+    """
+    Entrada: Las mismas magnitudes que Calculo_Incertidumbre_Tau, como escalares o arreglos compatibles por
+             broadcasting (por ejemplo un archivo completo de corridas o una grilla de diseño de Vn_Cx x Vn_Rp).
+    Salida: Diccionario de arreglos con uc (uF), uc_porcentual, utau y las contribuciones en uF de cada
+            término del presupuesto: tipo A de tau ("tau_A"), tiempo ("Tiempo"), razón de tensiones ("Gamma") y Rp ("Rp").
+    Función: Presupuesto de incertidumbre evaluado elemento a elemento, sin bucles de Python.
+    """
+    tau_promedio,utau_A,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A,fraccion_carga = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (tau_promedio,utau_A,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A,fraccion_carga)])
     #error_C            = std_err_promedio/ ((slope_promedio**2) * Vn_Rp) 
     #intercept_promedio = np.mean(intercept_vector)
     #std_err_promedio   = np.mean(std_err_vector)
     
     # Incertidumbre tipo B (división entre sqrt(3) para distribución rectangular)
-    factor_r    =1/np.sqrt(3)
+    factor_r    =np.sqrt(3)
     factor_g =  2
 
     # Coeficientes de sensibilidad del modelo C=tau/R
@@ -459,7 +2406,7 @@ def Calculo_Incertidumbre(slope_vector,Cantidad_ciclos,V_dig,V_max,Vn_Cx,Vn_Rp):
     dgamma_dVDIG   = 1 / V_max
     dgamma_dVM     = V_dig / V_max**2
 
-    ut     = np.sqrt(((HP3458_Accuracy_T*tau_promedio)+HP3458_Offset_T)/factor_r)**2 + (HP3458_Resolu_T/(2*factor_r))**2 +(HP3458_Jitter_T /(2*factor_r))**2
+    ut     = np.sqrt((((HP3458_Accuracy_T*tau_promedio)+HP3458_Offset_T)/factor_r)**2 + (HP3458_Resolu_T/(2*factor_r))**2 +(HP3458_Jitter_T /(2*factor_r))**2)
 
     uVDIG = np.sqrt(
         (HP3458_Accuracy_V * V_dig / factor_r)**2 + 
@@ -469,23 +2416,211 @@ def Calculo_Incertidumbre(slope_vector,Cantidad_ciclos,V_dig,V_max,Vn_Cx,Vn_Rp):
     ) 
   
     uVM  = np.sqrt(
-        (HP3458_Accuracy_V*V_max/factor_r)**2 + (HP3458_Offset_V/factor_r)**2 +  (HP3458_Gain_error_V*V_max /factor_g)**2 + (HP3458_Resolution_V*V_max  /factor_r)**2 )
+        (HP3458_Accuracy_V*V_max/factor_r)**2 + (HP3458_Offset_V/factor_r)**2 +  (HP3458_Gain_error_V*V_max /factor_g)**2 + (HP3458_Resolution_V*V_max  /factor_r)**2 + uVM_A**2)
         
-    ugamma= np.sqrt((dgamma_dVDIG*uVDIG)**2 +dgamma_dVM*uVM**2)
+    ugamma= np.sqrt((dgamma_dVDIG*uVDIG)**2 +(dgamma_dVM*uVM)**2)
     
-    # Incertidumbre tipo a obtenida de función de linealización
-    utau_A     = slope_desv_est/((slope_promedio**2)*(Cantidad_ciclos)**(1/2))   
-
     # Se suman cuadráticamente las u obtenidas a partir de datos del manual del HP3458
-    utau   = np.sqrt(utau_A**2 + (dtau_dt*ut)**2 + (dtau_dgamma*ugamma)**2)
+    utau   = np.sqrt(utau_A**2 + (dtau_dt*ut)**2 + (fraccion_carga*dtau_dgamma*ugamma)**2)
+
+    # Contribuciones en uF
+    Contribuciones = {
+        "tau_A":  1e6*dC_dtau*utau_A,
+        "Tiempo": 1e6*dC_dtau*np.abs(dtau_dt*ut),
+        "Gamma":  1e6*dC_dtau*np.abs(fraccion_carga*dtau_dgamma*ugamma),
+        "Rp":     1e6*dC_dRp*uRp,
+    }
 
     # Incertidumbre combinada en uF
     uc=1e6*np.sqrt((dC_dtau*utau)**2 + (dC_dRp*uRp)**2)
 
     uc_porcentual= uc*100/Vn_Cx
 
-    return  uc, uc_porcentual
+    return  dict(uc=uc, uc_porcentual=uc_porcentual, utau=utau, **Contribuciones)
+
+
+##################################################################################################################################################################
+
+def Calculo_Incertidumbre_Monte_Carlo(tau_promedio,utau_A,Cantidad_ciclos,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A=0.0,fraccion_carga=1.0,
+                                      Rcables=Rcablegenerador1+Rcablemultimetro1,u_relativa_cables=0.1,incluir_paralelo=True,
+                                      Muestras=10**6,Probabilidad=0.95,Bins=200,semilla=None):
+    """
+    Entrada: Los mismos datos que Calculo_Incertidumbre_Tau más la cantidad de ciclos promediados, resistencia de
+             cables en serie con Rp y su incertidumbre relativa (rectangular), si se considera la carga en paralelo
+             del DVM y de los cables, cantidad de muestras, probabilidad de cobertura, bins del histograma y semilla.
+    Retorna: Diccionario con Cx medio, incertidumbre estándar (uF y %), intervalo de cobertura probabilísticamente
+             simétrico y el más corto (uF), histograma (cuentas, bordes en uF) y las muestras de Cx en uF.
+    Función: Propagación por Monte Carlo (GUM Suplemento 1) del mismo modelo que Calculo_Incertidumbre_Tau:
+                 tau = tau_A * (t/t0) * [ln(1-gamma0)/ln(1-gamma)]^fraccion_carga,   gamma = V_dig/V_max
+                 Cx  = tau / (Rp + Rcables)   (o con la resistencia de carga en paralelo)
+             tau_A sigue una t de Student con Cantidad_ciclos-1 grados de libertad. Las especificaciones del HP3458A
+             son rectangulares con las mismas semiamplitudes que el presupuesto analítico y el error de ganancia es
+             normal con k=2. Todas las muestras se procesan como arreglos, sin bucles.
+    """
+    rng = np.random.default_rng(semilla)
+    M   = int(Muestras)
+
+    def rectangular(semiamplitud):
+        return rng.uniform(-1.0, 1.0, M)*semiamplitud
+
+    def tension(V):
+        return (V + rectangular(HP3458_Accuracy_V*V) + rectangular(HP3458_Offset_V)
+                  + rng.normal(0.0, HP3458_Gain_error_V*V/2, M) + rectangular(HP3458_Resolution_V*V))
+
+    # Tipo A de tau
+    if Cantidad_ciclos > 1:
+        tau_A = tau_promedio + utau_A*rng.standard_t(Cantidad_ciclos - 1, M)
+    else:
+        tau_A = tau_promedio + utau_A*rng.standard_normal(M)
+
+    # Tiempo hasta V_dig
+    gamma0 = V_dig/V_max
+    t0     = -tau_promedio*np.log(1 - gamma0)
+    t      = (t0 + rectangular(HP3458_Accuracy_T*tau_promedio + HP3458_Offset_T)
+                 + rectangular(HP3458_Resolu_T/2) + rectangular(HP3458_Jitter_T/2))
+
+    # Razón de tensiones
+    V_max_m = tension(V_max) + uVM_A*rng.standard_normal(M)
+    gamma   = tension(V_dig)/V_max_m
+
+    tau = tau_A*(t/t0)*(np.log(1 - gamma0)/np.log(1 - gamma))**fraccion_carga
+
+    # Resistencias: patrón, cables en serie y carga en paralelo (DVM y aislación de los cables)
+    R_serie = Vn_Rp + rng.normal(0.0, 12e-6*Vn_Rp, M) + Rcables*(1 + rectangular(u_relativa_cables))
+    if incluir_paralelo:
+        R_paralelo = 1/(1/RDVM + 1/Rcablemultimetro2 + 1/Rcablegenerador2)
+        R_serie    = R_serie*R_paralelo/(R_serie + R_paralelo)
 
+    Cx = 1e6*tau/R_serie
+
+    Cx_medio  = np.mean(Cx)
+    uc        = np.std(Cx, ddof=1)
+    ordenadas = np.sort(Cx)
+    cola      = (1 - Probabilidad)/2
+    simetrico = (np.quantile(ordenadas, cola), np.quantile(ordenadas, 1 - cola))
+
+    # Intervalo más corto que contiene la probabilidad pedida
+    q        = int(np.ceil(Probabilidad*M))
+    anchos   = ordenadas[q - 1:] - ordenadas[:M - q + 1]
+    r        = int(np.argmin(anchos))
+    corto    = (ordenadas[r], ordenadas[r + q - 1])
+
+    cuentas, bordes = np.histogram(Cx, bins=Bins)
+
+    return {"Cx": Cx_medio, "uc": uc, "uc_porcentual": uc*100/Vn_Cx,
+            "Intervalo_simetrico": simetrico, "Intervalo_corto": corto, "Probabilidad": Probabilidad,
+            "Histograma": (cuentas, bordes), "Muestras": Cx}
+
+##################################################################################################################################################################
+
+def Resumen_Bootstrap(slope_replicas,Rp,Probabilidad=0.95):
+    """
+    Entrada: Pendiente media de cada remuestreo, resistencia (patrón + cables) y probabilidad de cobertura.
+    Retorna: Diccionario con tau (s) y Cx (uF) medios, su desviación estándar bootstrap e intervalos percentiles.
+    """
+    tau  = -1/np.asarray(slope_replicas, dtype=float)
+    Cx   = 1e6*tau/Rp
+    cola = (1 - Probabilidad)/2
+
+    return {"tau": np.mean(tau), "utau": np.std(tau, ddof=1), "Intervalo_tau": tuple(np.quantile(tau, (cola, 1 - cola))),
+            "Cx": np.mean(Cx), "uCx": np.std(Cx, ddof=1), "Intervalo_Cx": tuple(np.quantile(Cx, (cola, 1 - cola))),
+            "Probabilidad": Probabilidad, "Remuestreos": len(tau)}
+
+##################################################################################################################################################################
+
+def Bootstrap_Ciclos(slope_vector,Rp,Remuestreos=Remuestreos_Bootstrap,Probabilidad=0.95,semilla=None):
+    """
+    Entrada: Pendientes de los ciclos válidos, resistencia (patrón + cables), cantidad de remuestreos,
+             probabilidad de cobertura y semilla.
+    Retorna: El diccionario de Resumen_Bootstrap.
+    Función: Bootstrap no paramétrico sobre ciclos: cada remuestreo elige con reposición tantos ciclos como
+             ciclos válidos y promedia sus pendientes. No supone normalidad, por lo que es más robusto que
+             std/sqrt(n) cuando pocos ciclos pasan el filtro de R². Los remuestreos se arman por bloques de filas
+             para acotar la memoria.
+    """
+    slopes = np.asarray(slope_vector, dtype=float)
+    n      = len(slopes)
+    if n < 2:
+        raise ValueError("El bootstrap necesita al menos 2 ciclos válidos.")
+
+    rng     = np.random.default_rng(semilla)
+    filas   = max(1, Elementos_Bloque_Bootstrap//n)
+    medias  = np.empty(int(Remuestreos))
+    for k in range(0, len(medias), filas):
+        m = min(filas, len(medias) - k)
+        medias[k:k+m] = slopes[rng.integers(0, n, (m, n))].mean(axis=1)
+
+    return Resumen_Bootstrap(medias, Rp, Probabilidad)
+
+##################################################################################################################################################################
+
+def Bootstrap_Residuos(Mediciones_capacitor,V_max,Sweep_Time,Rp,V_offset=0.0,incluir_descarga=True,Largo_bloque=None,
+                       Remuestreos=Remuestreos_Bootstrap,Probabilidad=0.95,semilla=None,Escala=None,Segmentacion="UMBRAL",Frec=None):
+    """
+    Entrada: Los mismos datos que Procesamiento_Carga_y_Descarga más el largo de bloque en muestras (None usa n^(1/3)
+             de cada ventana), cantidad de remuestreos, probabilidad de cobertura y semilla.
+    Retorna: El diccionario de Resumen_Bootstrap más la cantidad de ciclos válidos ("Ciclos").
+    Función: Bootstrap por bloques móviles de los residuos dentro de cada ciclo. Como la pendiente de mínimos
+             cuadrados es lineal en los datos, la pendiente de cada remuestreo es slope + w·r*, con
+             w = (t - t_medio)/Stt y r* los residuos remuestreados; el aporte de cada bloque posible en cada
+             posición se calcula una vez por ciclo y cada remuestreo queda reducido a sumar esos aportes. Los bloques conservan la correlación entre muestras
+             vecinas (ruido de baja frecuencia, cuantización). Los ciclos se filtran por R² como en Regresion_Ciclos.
+    """
+    valores, valor_inicial, valor_final = Umbrales_Ciclos(Mediciones_capacitor, V_max, V_offset, Escala)
+
+    ventanas = []
+    for descarga in ((False, True) if incluir_descarga else (False,)):
+        inicios, fines, Por_Tiempo = Segmentar_Ciclos(valores, valor_inicial, valor_final, descarga, Segmentacion, Sweep_Time, Frec)
+        ventanas.extend(Ventanas_Linealizadas(valores, inicios, fines, V_max, Sweep_Time, V_offset, descarga, Escala, Por_Tiempo))
+
+    rng    = np.random.default_rng(semilla)
+    B      = int(Remuestreos)
+    suma   = np.zeros(B)
+    ciclos = 0
+    for tiempo, tension_lin in ventanas:
+        m   = len(tiempo)
+        w   = tiempo - tiempo.mean()
+        Stt = np.dot(w, w)
+        slope     = np.dot(w, tension_lin)/Stt
+        residuos  = tension_lin - tension_lin.mean() - slope*w
+        SS        = np.dot(tension_lin - tension_lin.mean(), tension_lin - tension_lin.mean())
+        if SS == 0 or 1 - np.dot(residuos, residuos)/SS <= R_Cuadrado:
+            continue
+
+        # C[k, s]: aporte a la pendiente del bloque de residuos que empieza en s colocado en la posición k
+        L       = min(m, Largo_bloque or max(1, int(round(m**(1/3)))))
+        bloques = -(-m//L)
+        pesos   = np.zeros(bloques*L)
+        pesos[:m] = w/Stt
+        C = pesos.reshape(bloques, L) @ np.lib.stride_tricks.sliding_window_view(residuos, L).T
+
+        inicios_bloque = rng.integers(0, m - L + 1, (B, bloques))
+        suma   += slope + C[np.arange(bloques), inicios_bloque].sum(axis=1)
+        ciclos += 1
+
+    if ciclos == 0:
+        raise ValueError("Ningún ciclo superó el filtro de R².")
+
+    Resultado = Resumen_Bootstrap(suma/ciclos, Rp, Probabilidad)
+    Resultado["Ciclos"] = ciclos
+    return Resultado
+
+##################################################################################################################################################################
+
+def Graficar_Monte_Carlo(Resultado):
+    """
+    Grafica el histograma de Cx del Monte Carlo con el intervalo de cobertura simétrico.
+    """
+    cuentas, bordes = Resultado["Histograma"]
+    plt.figure(figsize=(10, 5))
+    plt.stairs(cuentas, bordes, fill=True)
+    for limite in Resultado["Intervalo_simetrico"]:
+        plt.axvline(limite, color="r", linestyle="--")
+    plt.xlabel("Cx (uF)")
+    plt.ylabel("Cuentas")
+    plt.title(f"Monte Carlo: intervalo de cobertura del {Resultado['Probabilidad']*100:.0f} %")
+    plt.grid(True)
+    plt.show()
 
 ##################################################################################################################################################################
 
@@ -501,6 +2636,24 @@ def Mostrar_Resultados(Cx_promedio,uc,uc_porcentual,Vn_Rp,ruta_medicion_generado
     print(f"Incertidumbre combinada en % : {round(uc_porcentual,5)} %")
 ##################################################################################################################################################################
 
+def Mostrar_Monte_Carlo(Resultado):
+    print(f"\nMonte Carlo ({len(Resultado['Muestras'])} muestras)")
+    print(f"Capacidad promedio (Cx)      : {round(Resultado['Cx'],6)} uF")
+    print(f"Incertidumbre estándar       : {round(Resultado['uc'],7)} uF ({round(Resultado['uc_porcentual'],5)} %)")
+    print(f"Intervalo del {Resultado['Probabilidad']*100:.0f} % (simétrico): [{Resultado['Intervalo_simetrico'][0]:.6f}, {Resultado['Intervalo_simetrico'][1]:.6f}] uF")
+    print(f"Intervalo del {Resultado['Probabilidad']*100:.0f} % (más corto): [{Resultado['Intervalo_corto'][0]:.6f}, {Resultado['Intervalo_corto'][1]:.6f}] uF")
+    Graficar_Monte_Carlo(Resultado)
+
+##################################################################################################################################################################
+
+def Mostrar_Bootstrap(Resultado):
+    print(f"\nBootstrap ({Resultado['Remuestreos']} remuestreos)")
+    print(f"tau                          : {Resultado['tau']:.9f} s ± {Resultado['utau']:.9f} s")
+    print(f"Intervalo del {Resultado['Probabilidad']*100:.0f} % de tau     : [{Resultado['Intervalo_tau'][0]:.9f}, {Resultado['Intervalo_tau'][1]:.9f}] s")
+    print(f"Intervalo del {Resultado['Probabilidad']*100:.0f} % de Cx      : [{Resultado['Intervalo_Cx'][0]:.6f}, {Resultado['Intervalo_Cx'][1]:.6f}] uF")
+
+##################################################################################################################################################################
+
 def Mostrar_Resultado(Cx_promedio,uc,uc_porcentual,Vn_Rp):
     print(f"Valor de resistencia nominal del patrón (Rp)      : {round(Vn_Rp,4)} ohm")
     print(f"Capacidad promedio (Cx)      : {round(Cx_promedio*1e6,6)} uF")
@@ -523,3 +2676,21 @@ def Graficar(datos, sweep_time):
     plt.grid(True)
     plt.show()
 
+
+##################################################################################################################################################################
+
+def Graficar_Vista_Previa(Piramide, sweep_time, Escala=None, inicio=0, fin=None):
+    """
+    Grafica la envolvente de mínimos y máximos de un registro largo a partir de su pirámide (Vista_Previa),
+    sin recorrer las muestras.
+    """
+    tiempo, minimos, maximos = Vista_Previa(Piramide, sweep_time, inicio, fin)
+    escala = 1.0 if Escala is None else Escala
+
+    plt.figure(figsize=(10, 5))
+    plt.fill_between(tiempo, minimos*escala, maximos*escala, step="post")
+    plt.title("Vista previa (mínimos y máximos)")
+    plt.xlabel("Tiempo (s)")
+    plt.ylabel("Tensión (V)")
+    plt.grid(True)
+    plt.show()
@@ -83,6 +83,37 @@ class TektronixAFG1022:
         self.activar_salida(1, True)
         self.activar_salida(2, True)
 
+    # ===================================================
+    # MODO RÁFAGA SINCRONIZADO CON EL MULTÍMETRO
+    # ===================================================
+
+    def configurar_rafaga(self, frecuencia, ciclos, amplitud=1.0, offset=0.5):
+        """
+        Canal 1: ráfaga de `ciclos` períodos de la cuadrada de medición; canal 2: un único pulso TTL al
+        comienzo de la ráfaga. Los dos canales esperan el mismo disparo (disparar_rafaga), así que el
+        multímetro armado con trigger externo empieza a medir en el primer flanco de la cuadrada y, si
+        mide menos de `ciclos` períodos, todas sus lecturas caen dentro de ciclos completos.
+        """
+        self.configurar_senal_medida(frecuencia, amplitud, offset)
+        self.configurar_trigger_ttl(frecuencia)
+        for canal, n in ((1, ciclos), (2, 1)):
+            self.inst.write(f"SOUR{canal}:BURS:STAT ON")
+            self.inst.write(f"SOUR{canal}:BURS:MODE TRIG")
+            self.inst.write(f"SOUR{canal}:BURS:NCYC {n}")
+        self.inst.write("TRIG:SOUR EXT")      # sin disparos del timer interno: solo disparar_rafaga
+        self.sincronizar_canales()
+
+    def configurar_demora_trigger(self, demora):
+        """
+        Demora (s) de la ráfaga del canal 2 respecto del disparo: corre el pulso TTL, y con él la
+        primera lectura del multímetro, hacia adelante dentro del primer ciclo de la cuadrada.
+        """
+        self.inst.write(f"SOUR2:BURS:TDEL {demora}")
+
+    def disparar_rafaga(self):
+        """Disparo manual de las ráfagas de ambos canales."""
+        self.inst.write("*TRG")
+
 """
 # Ejemplo de uso:
 
@@ -0,0 +1,173 @@
+import pyvisa
+import time
+import numpy as np
+
+class DMM_SCPI:
+    """
+    Base común de los multímetros SCPI con memoria de lecturas (HP34401A, HP34420A, Keithley 2110).
+    Maneja la sesión VISA, reset, identificación, la configuración de rango y NPLC (solo se envía lo que
+    cambió), la cola de errores y la adquisición por lotes: SAMP:COUN lecturas por trigger, TRIG:COUN
+    triggers por INIT y las lecturas guardadas se leen con FETCh? directamente a un ndarray.
+    Cada multímetro define su memoria de lecturas en Lecturas_por_transferencia.
+    """
+
+    Funcion                    = "VOLT:DC"
+    Lecturas_por_transferencia = 512
+    Espera_reset               = 0.0
+    Comando_abortar            = "ABOR"   # None si el multímetro no lo implementa
+
+    def __init__(self, resource_name, timeout=5000, terminacion=None):
+        self.rm   = pyvisa.ResourceManager()
+        self.inst = self.rm.open_resource(resource_name)
+        self.inst.timeout = timeout
+        if terminacion is not None:
+            self.inst.write_termination = terminacion
+            self.inst.read_termination  = terminacion
+        self._configuracion       = {}
+        self.muestras_por_trigger = 1
+        self.triggers             = 1
+
+    @property
+    def instrument(self):
+        """Nombre de la sesión VISA que usan los drivers HP."""
+        return self.inst
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # ===================================================
+    # MÉTODOS BÁSICOS
+    # ===================================================
+
+    def idn(self):
+        return self.inst.query("*IDN?")
+
+    def reset(self):
+        self.inst.write("*RST")
+        self.inst.write("*CLS")
+        self._configuracion.clear()
+        if self.Espera_reset:
+            time.sleep(self.Espera_reset)
+
+    def close(self):
+        self.inst.close()
+        self.rm.close()
+
+    def errores(self, maximo=20):
+        """Vacía la cola de errores (SYST:ERR?) y devuelve los mensajes distintos de 'sin error'."""
+        mensajes = []
+        for _ in range(maximo):
+            respuesta = self.inst.query("SYST:ERR?").strip()
+            if int(respuesta.split(",")[0]) == 0:
+                break
+            mensajes.append(respuesta)
+        return mensajes
+
+    def verificar_errores(self):
+        mensajes = self.errores()
+        if mensajes:
+            raise RuntimeError(f"Errores del multímetro: {'; '.join(mensajes)}")
+
+    # ===================================================
+    # CONFIGURACIÓN CON CACHÉ
+    # ===================================================
+
+    def _configurar(self, comando, valor):
+        """Envía 'comando valor' solo si difiere de lo último enviado desde el reset."""
+        if self._configuracion.get(comando) != valor:
+            self.inst.write(f"{comando} {valor}")
+            self._configuracion[comando] = valor
+
+    def configurar_rango(self, rango):
+        self._configurar(f"{self.Funcion}:RANG:AUTO", "OFF")
+        self._configurar(f"{self.Funcion}:RANG", rango)
+
+    def configurar_nplc(self, nplc):
+        self._configurar(f"{self.Funcion}:NPLC", nplc)
+
+    def configurar_disparo(self, muestras=1, triggers=1, fuente="EXT", pendiente=None, demora=0):
+        """
+        Lecturas por trigger (SAMP:COUN), triggers por INIT (TRIG:COUN), fuente, flanco (si el multímetro
+        lo admite) y demora del trigger.
+        """
+        self.abortar()
+        self._configurar("TRIG:SOUR", fuente)
+        if pendiente is not None:
+            self._configurar("TRIG:SLOP", pendiente)
+        self._configurar("TRIG:DEL", demora)
+        self._configurar("SAMP:COUN", muestras)
+        self._configurar("TRIG:COUN", triggers)
+        self.muestras_por_trigger = muestras
+        self.triggers             = triggers
+
+    # ===================================================
+    # ADQUISICIÓN
+    # ===================================================
+
+    def abortar(self):
+        if self.Comando_abortar is not None:
+            self.inst.write(self.Comando_abortar)
+
+    @staticmethod
+    def _lecturas(datos):
+        """Convierte la respuesta ASCII de FETCh? en un ndarray sin recorrerla en Python."""
+        datos = datos.strip().strip(",")
+        return np.array(datos.split(","), dtype=float) if datos else np.array([])
+
+    def armar(self):
+        """Deja el multímetro esperando los triggers configurados (INIT) sin leer."""
+        self.abortar()
+        self.inst.write("INIT")
+
+    def leer(self, duracion_estimada=None):
+        """
+        FETCh? de las lecturas del último INIT en un ndarray. duracion_estimada (s) alarga el timeout de VISA
+        mientras el multímetro termina de medir.
+        """
+        timeout = self.inst.timeout
+        try:
+            if duracion_estimada is not None:
+                self.inst.timeout = max(timeout, int(1000*(duracion_estimada + 10)))
+            return self._lecturas(self.inst.query("FETCh?"))
+        finally:
+            self.inst.timeout = timeout
+
+    def medir_por_trigger(self):
+        """Un INIT con la configuración actual y todas sus lecturas en un ndarray."""
+        self.armar()
+        return self.leer()
+
+    def medir_en_bloque(self, triggers=None, duracion_estimada=None):
+        """
+        Captura `triggers` disparos de muestras_por_trigger lecturas con un INIT y un FETCh? por ronda: el
+        multímetro guarda las lecturas de todos los disparos y se transfieren juntas. Cada ronda tiene como
+        máximo Lecturas_por_transferencia lecturas, así que los cambios de sentido del bus pasan de uno por
+        lectura o por trigger a uno por ronda.
+        duracion_estimada (s) es el tiempo total esperado de la captura; alarga el timeout de VISA mientras
+        el FETCh? espera las lecturas.
+        Retorna: ndarray (triggers x muestras_por_trigger).
+        """
+        triggers  = self.triggers if triggers is None else triggers
+        muestras  = self.muestras_por_trigger
+        por_ronda = max(1, min(triggers, self.Lecturas_por_transferencia // muestras))
+        timeout   = self.inst.timeout
+        filas     = []
+        try:
+            if duracion_estimada is not None:
+                self.inst.timeout = max(timeout, int(1000*(duracion_estimada*por_ronda/triggers + 10)))
+            for desde in range(0, triggers, por_ronda):
+                ronda = min(por_ronda, triggers - desde)
+                self.abortar()
+                self._configurar("TRIG:COUN", ronda)
+                self.inst.write("INIT")
+                lecturas = self._lecturas(self.inst.query("FETCh?"))
+                if len(lecturas) != ronda*muestras:
+                    raise RuntimeError(f"El multímetro devolvió {len(lecturas)} lecturas de {ronda*muestras} esperadas.")
+                filas.append(lecturas.reshape(ronda, muestras))
+        finally:
+            self.inst.timeout = timeout
+            self._configurar("TRIG:COUN", self.triggers)
+        return np.concatenate(filas)
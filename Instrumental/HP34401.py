@@ -1,27 +1,21 @@
-import pyvisa
+from Instrumental.DMM_SCPI import DMM_SCPI
+
+class HP34401A(DMM_SCPI):
+    Lecturas_por_transferencia = 512      # memoria de lecturas del 34401A
+    Comando_abortar            = None     # el 34401A no implementa ABORt
 
-class HP34401A:
     def __init__(self, gpib_address: str = "GPIB0::5::INSTR"):
-        self.rm = pyvisa.ResourceManager()
-        self.instrument = self.rm.open_resource(gpib_address)
-        self.instrument.timeout = 5000
+        super().__init__(gpib_address)
         self.reset()
 
-    def reset(self):
-        self.instrument.write("*RST")
-        self.instrument.write("*CLS")
-
     def identify(self) -> str:
-        return self.instrument.query("*IDN?")
+        return self.idn()
 
     def configure_voltage_dc(self, range_val=10, resolution=0.00001):
-        self.instrument.write("CONF:VOLT:DC")
-        self.instrument.write(f"VOLT:DC:RANG {range_val}")
-        self.instrument.write(f"VOLT:DC:RES {resolution}")
+        self.inst.write("CONF:VOLT:DC")
+        self._configuracion.clear()       # CONF vuelve rango y disparo a sus valores por defecto
+        self._configurar("VOLT:DC:RANG", range_val)
+        self._configurar("VOLT:DC:RES", resolution)
 
     def read(self):
-        return float(self.instrument.query("READ?"))
-
-    def close(self):
-        self.instrument.close()
-        self.rm.close()
\ No newline at end of file
+        return float(self.inst.query("READ?"))
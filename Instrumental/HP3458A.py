@@ -187,11 +187,25 @@ class HP3458A:
 
 #####################################################################################################################   
     
-    def Medicion_de_Tension(self, cant_muestras, sweep_time, aper_time) -> np.ndarray:
+    def Medicion_de_Tension(self, cant_muestras, sweep_time, aper_time, demora=None) -> np.ndarray:
         """
         Configura y ejecuta una medición de voltaje DC en modo barrido (sweep)
         en el multímetro HP3458A, y devuelve los datos como un array de NumPy.
         """
+        codigos, escala = self.Medicion_de_Codigos(cant_muestras, sweep_time, aper_time, demora)
+        return codigos * escala
+
+#####################################################################################################################
+
+    def Medicion_de_Codigos(self, cant_muestras, sweep_time, aper_time, demora=None):
+        """
+        Igual que Medicion_de_Tension pero sin escalar: devuelve los códigos SINT como int16
+        y el factor de escala ISCALE (tensión = código * escala).
+        demora: tiempo (s) entre el flanco de la entrada EXT TRIG y la primera muestra del sweep.
+        Con la entrada conectada a la cuadrada del CHANB del HP3245A, el sweep arranca en el flanco
+        descendente; una demora de medio período lo lleva al flanco ascendente (inicio de una carga).
+        None deja la demora del PRESET FAST.
+        """
 
         # Tiempo máximo de espera (ajustar si es necesario)
         self.instrument.timeout = 30000
@@ -218,6 +232,9 @@ class HP3458A:
         if self.verbose:
             print(f"[INFO] Configuración completa: APER={aper_time}s, SWEEP={sweep_time}s, N={cant_muestras}")
 
+        if demora is not None:
+            self.instrument.write(f"DELAY {demora}")
+
         # Inicia la medición
         self.instrument.write("TARM SYN")
         self.instrument.write("TRIG EXT")
@@ -228,14 +245,13 @@ class HP3458A:
         self.instrument.write("MEM:START?")
         raw_data = self.instrument.read_bytes(cant_muestras * 2)
 
-        # Decodificar datos binarios (signed 16-bit integers)
-        muestras = struct.unpack(">" + "h" * cant_muestras, raw_data)
+        # Decodificar datos binarios (signed 16-bit integers, big endian)
+        codigos = np.frombuffer(raw_data, dtype=">i2").astype(np.int16)
 
-        # Obtener factor de escala y aplicar
+        # Factor de escala de los códigos
         escala = float(self.instrument.query("ISCALE?"))
-        mediciones = np.asarray(muestras) * escala
 
-        return mediciones
+        return codigos, escala
 #####################################################################################################################
   
     
@@ -1,5 +1,5 @@
 import pyvisa
-import time
+from Instrumental.DMM_SCPI import DMM_SCPI
 
 # Variables del Keithley 2110 (DCV, 10 V Range)
 # --------------------------------------------------------------------------------
@@ -25,39 +25,27 @@ Keithley2110_Gain_error_V = 35e-6
 # Usamos 1 ppm del rango como resolución mínima:
 Keithley2110_Resolution_V = 1e-6    # 1 / 1000000
 
-class Keithley2110:
+# Lecturas que se piden en cada FETCh? de una captura por lotes; una captura más grande se arma en varias rondas
+Keithley2110_Lecturas_por_transferencia = 50000
+
+class Keithley2110(DMM_SCPI):
     """
     Controlador para el multímetro Keithley 2110.
     Incluye métodos específicos para medición sincronizada por trigger externo.
     """
 
+    Lecturas_por_transferencia = Keithley2110_Lecturas_por_transferencia
+    Espera_reset               = 0.5
+
     def __init__(self, resource_name=None):
-        self.rm = pyvisa.ResourceManager()
         if resource_name is None:
+            rm = pyvisa.ResourceManager()
             print("Instrumentos detectados:")
-            for res in self.rm.list_resources():
+            for res in rm.list_resources():
                 print(f" - {res}")
+            rm.close()
             raise ValueError("Debe especificar el resource_name del Keithley 2110.")
-        self.inst = self.rm.open_resource(resource_name)
-        self.inst.timeout = 5000
-        self.inst.write_termination = '\n'
-        self.inst.read_termination = '\n'
-
-    # ===================================================
-    # MÉTODOS BÁSICOS
-    # ===================================================
-
-    def idn(self):
-        return self.inst.query("*IDN?")
-
-    def reset(self):
-        self.inst.write("*RST")
-        self.inst.write("*CLS")
-        time.sleep(0.5)
-
-    def close(self):
-        self.inst.close()
-        self.rm.close()
+        super().__init__(resource_name, timeout=5000, terminacion='\n')
 
     # ===================================================
     # CONFIGURACIONES DE MEDICIÓN
@@ -70,29 +58,18 @@ class Keithley2110:
         if rango not in rangos_validos:
             raise ValueError(f"Rango no válido. Rangos permitidos: {rangos_validos}")
 
-        self.inst.write("VOLT:DC:RANG:AUTO OFF")
-        self.inst.write(f"VOLT:DC:RANG {rango}")
+        self.configurar_rango(rango)
         
     # ===================================================
     # MÉTODOS DE ADQUISICIÓN POR TRIGGER EXTERNO
     # ===================================================
-    def configurar_trigger_externo(self, muestras=1):
+    def configurar_trigger_externo(self, muestras=1, triggers=1):
         """
         Trigger externo + flanco ascendente + número de muestras por trigger.
+        Con triggers > 1 el multímetro queda armado para esa cantidad de triggers por INIT (TRIG:COUN)
+        y guarda todas las lecturas en su memoria (ver medir_triggers_en_bloque).
         """
-        self.inst.write("ABOR")               # <- Limpia estados previos
-        self.inst.write("TRIG:SOUR EXT")      # Trigger externo
-        self.inst.write("TRIG:SLOP POS")      # Flanco ascendente
-        self.inst.write("TRIG:DEL 0")         # Sin delay
-        self.inst.write(f"SAMP:COUN {muestras}")  # Cantidad de muestras por trigger
-        self.inst.write("TRIG:COUN 1")        # <- IMPORTANTE: un solo trigger externo
-        self.inst.write("ABOR")               # <- Re-inicializa
-
-    def medir_por_trigger(self):
-        self.inst.write("ABOR")       # Limpia buffers previos
-        self.inst.write("INIT")       # Espera el trigger
-        datos = self.inst.query("FETCh?")
-        return [float(x) for x in datos.split(',') if x]
+        self.configurar_disparo(muestras, triggers, fuente="EXT", pendiente="POS", demora=0)
 
     def medir_n_triggers(self, n):
         """
@@ -102,21 +79,28 @@ class Keithley2110:
         for _ in range(n):
             valores.append(self.medir_por_trigger())
         return valores
+
+    def medir_triggers_en_bloque(self, triggers=None, duracion_estimada=None):
+        """
+        Captura por lotes de DMM_SCPI.medir_en_bloque: cada fila empieza en un flanco del trigger externo.
+        """
+        return self.medir_en_bloque(triggers, duracion_estimada)
+
     # ===================================================
     # VELOCIDADES DE ADQUISICIÓN
     # ===================================================    
     
     def configurar_fast_mode(self):
         """Modo rápido: máxima velocidad de muestreo (~50 lect/s)."""
-        self.inst.write("VOLT:DC:NPLC 0.02")
+        self.configurar_nplc(0.02)
 
     def configurar_normal_mode(self):
         """Modo estándar."""
-        self.inst.write("VOLT:DC:NPLC 1")
+        self.configurar_nplc(1)
 
     def configurar_precise_mode(self):
         """Modo muy preciso pero lento."""
-        self.inst.write("VOLT:DC:NPLC 10")
+        self.configurar_nplc(10)
         
         
 """
@@ -3,10 +3,14 @@ from Instrumental.KL2110 import Keithley2110
 import matplotlib.pyplot as plt
 import Funciones_Archivos
 import Funciones_Medicion
+import Funciones_Adquisicion
 import numpy as np
 
-N = 1
+N = 10                       # triggers por captura, armados juntos y leídos en bloque
 muestras_por_trigger = 2000
+Frec_generador = 1           # Hz, cuadrada del canal 1 y pulso de trigger del canal 2
+Tiempo_equivalente = False   # Ráfagas con el trigger corrido una fracción de Sweep_Time, intercaladas en un registro denso
+Pasadas = 20                 # Ráfagas por registro en tiempo equivalente (intervalo efectivo Sweep_Time/Pasadas)
 
 #estado_actual = "INICIO"
 estado_actual = "INICIO"
@@ -44,20 +48,30 @@ while True:
         # Configuraciones iniciales
         afg.modo_independiente()
         
-        #Canal 1: señal cuadrada 
-        afg.configurar_senal_medida(1)
-        
-        #Canal 2: trigger TTL
-        afg.configurar_trigger_ttl(1)
-        
-        #Sincróniza los canales para que empiecen juntos
-        afg.sincronizar_canales()
+        if Tiempo_equivalente:
+            # Canal 1 en ráfaga de ciclos enteros y canal 2 con un pulso por ráfaga, ambos disparados por *TRG
+            ciclos_rafaga, muestras_rafaga = Funciones_Adquisicion.Ciclos_Rafaga_FRH(Frec_generador, muestras_por_trigger, Sweep_Time)
+            afg.configurar_rafaga(Frec_generador, ciclos_rafaga)
+        else:
+            #Canal 1: señal cuadrada 
+            afg.configurar_senal_medida(Frec_generador)
+            
+            #Canal 2: trigger TTL
+            afg.configurar_trigger_ttl(Frec_generador)
+            
+            #Sincróniza los canales para que empiecen juntos
+            afg.sincronizar_canales()
         
         # Configuraciones del multímetro
         # Configurar rango fijo de 1 V   
         dmm.configurar_dc_range(rango=10)
         dmm.configurar_fast_mode()
-        dmm.configurar_trigger_externo(muestras=muestras_por_trigger)
+        if Tiempo_equivalente:
+            dmm.configurar_trigger_externo(muestras=muestras_rafaga)
+        else:
+            dmm.configurar_trigger_externo(muestras=muestras_por_trigger, triggers=N)
+        duracion_captura = N*(muestras_por_trigger*Sweep_Time + 1/Frec_generador)
+        Sweep_Time_analisis = Sweep_Time
         
         estado_actual = "MEDIR"
         
@@ -65,18 +79,29 @@ while True:
         #Activa las salidas
         afg.iniciar_salidas()
         
-        if Paso_de_medicion == "GENERADOR":
+        if Tiempo_equivalente:
+            # Un único registro reconstruido (una fila) con su intervalo efectivo entre muestras
+            print(f"Midiendo en tiempo equivalente ({Pasadas} ráfagas)...")
+            registro, Sweep_Time_analisis = Funciones_Adquisicion.Adquirir_Tiempo_Equivalente(
+                afg, dmm, Frec_generador, ciclos_rafaga, muestras_rafaga, Pasadas, Sweep_Time)
+            if Paso_de_medicion == "GENERADOR":
+                medicion_gen = registro[None, :]
+            else:
+                medicion_cap = registro[None, :]
+            Funciones_Archivos.Graficar_Mediciones(registro)
+        
+        elif Paso_de_medicion == "GENERADOR":
             print("Medición del canal 1, tensión en el generador cargado\n")                         
             print("Midiendo...")
 
-            medicion_gen = dmm.medir_por_trigger()
-            Funciones_Archivos.Graficar_Mediciones(medicion_gen)  
+            medicion_gen = dmm.medir_triggers_en_bloque(duracion_estimada=duracion_captura)
+            Funciones_Archivos.Graficar_Mediciones(medicion_gen.ravel())  
         
         elif Paso_de_medicion == "CAPACITOR":
             print("Medición del canal 1, tensión en el capacitor\n")                         
             print("Midiendo...")
-            medicion_cap = dmm.medir_por_trigger()
-            Funciones_Archivos.Graficar_Mediciones(medicion_cap)
+            medicion_cap = dmm.medir_triggers_en_bloque(duracion_estimada=duracion_captura)
+            Funciones_Archivos.Graficar_Mediciones(medicion_cap.ravel())
         
         estado_actual = "GUARDAR"       
 
@@ -84,13 +109,13 @@ while True:
         
         # Guardar archivo
         if Paso_de_medicion == "GENERADOR":  
-            Funciones_Archivos.Guardar_Medicion(ARCHIVO_SALIDA_GEN,medicion_gen)
+            Funciones_Archivos.Guardar_Medicion(ARCHIVO_SALIDA_GEN,medicion_gen.ravel())
             print(f"Archivo guardado como: {ARCHIVO_SALIDA_GEN}")
             Paso_de_medicion = "CAPACITOR"
             estado_actual = "MEDIR"
 
         elif Paso_de_medicion == "CAPACITOR":
-            Funciones_Archivos.Guardar_Medicion(ARCHIVO_SALIDA_CAP,medicion_cap)
+            Funciones_Archivos.Guardar_Medicion(ARCHIVO_SALIDA_CAP,medicion_cap.ravel())
             print(f"Archivo guardado como: {ARCHIVO_SALIDA_CAP}")
             Paso_de_medicion = "GENERADOR"
             estado_actual = "ANALIZAR"
@@ -99,15 +124,22 @@ while True:
         
     elif estado_actual == "ANALIZAR":
         Funciones_Archivos.limpiar_pantalla()
-        V_max, V_max_std = Funciones_Medicion.Analizar_senal_Generador(medicion_gen)
+        V_max, V_max_std = Funciones_Medicion.Analizar_senal_Generador(medicion_gen.ravel())
         print(f"Tensión máxima del generador cargado: {V_max:.6f} V ± {V_max_std:.6f} V\n")
 
-        Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig = Funciones_Medicion.Procesamiento_Curva(
-                                                                                                                                    medicion_cap,                                                                                                                                                 
+        # Cada fila es un disparo que empieza en el flanco del trigger: los ciclos se detectan dentro de cada una
+        Cx_vector, slope_vector = [], []
+        for segmento in medicion_cap:
+            Cx_segmento,slope_segmento,_,_,_,_,_,V_dig = Funciones_Medicion.Procesamiento_Curva(
+                                                                                                                                    segmento,
                                                                                                                                     V_max,
-                                                                                                                                    Sweep_Time,
-                                                                                                                                    Vn_Rp
+                                                                                                                                    Sweep_Time_analisis,
+                                                                                                                                    Vn_Rp,
+                                                                                                                                    interactivo=False
                                                                                                                                     )
+            Cx_vector.extend(Cx_segmento)
+            slope_vector.extend(slope_segmento)
+        Cantidad_ciclos_validos = len(slope_vector)
         Cx         = np.mean(Cx_vector)
         ucx, ucxp  = Funciones_Medicion.Calculo_Incertidumbre(slope_vector,Cantidad_ciclos_validos,V_dig,V_max,Vn_Cx,Vn_Rp)
         
@@ -4,6 +4,8 @@
 
 import Funciones_Archivos
 import Funciones_Medicion
+import Funciones_Campania
+import Funciones_Adquisicion
 import numpy as np
 import scipy.stats as stats
 from pathlib import Path
@@ -21,6 +23,12 @@ Cant_Muestras  = 10000
 Aper_Time      = 3e-6
 Rcablegenerador  = 88e-3
 tau_por_ciclo_on = 5
+Incluir_Descarga = True      # En registro único se usan cargas y descargas
+Metodo_Ajuste    = "LINEALIZACION"   # "LINEALIZACION" (ln(1-V/V_max) por ciclo), "SINCRONICO" (promedio de ciclos), "EXPONENCIAL" (ajuste conjunto), "ARMONICOS" (FFT) o "INTEGRAL"
+Incertidumbre_Monte_Carlo = False  # Además del presupuesto analítico, propagación por Monte Carlo (GUM S1)
+Incertidumbre_Bootstrap   = True   # Intervalos percentiles de tau y Cx por bootstrap sobre los ciclos válidos
+Analisis_Por_Bloques      = False  # Registro único linealizado leído por partes (registros más grandes que la memoria)
+Segmentacion_Ciclos       = "UMBRAL" # "UMBRAL": máquina de estados por umbrales; "FASE": ciclos ubicados con Frec y Sweep_time
 
 ######################################################################################################################################################################################
 ######################################################################################################################################################################################
@@ -57,7 +65,12 @@ while True: ######################################################## BUCLE PRINC
             # Obtengo rutas de archivos de medición y configuración
             Ruta_Medicion_Entrada, Ruta_Medicion_Carga_Descarga, Ruta_archivo_config = Funciones_Archivos.Ruta_de_analisis_nuevo()
             
-            Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time, Cantidad_Ciclos = Funciones_Archivos.Configuracion()
+            Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time, Cantidad_Ciclos, Cant_Muestras, Aper_Time = Funciones_Archivos.Configuracion()
+            
+            # Registro único: V_max se estima desde el capacitor y no hace falta medir el generador
+            Modo_Registro = Funciones_Archivos.Menu_Adquisicion()
+            if Modo_Registro == "SECUENCIAL":
+                Objetivo_ucp, Max_Muestras = Funciones_Archivos.Objetivo_Incertidumbre()
             
             estado_actual = "INICIALIZACION"
             
@@ -71,10 +84,16 @@ while True: ######################################################## BUCLE PRINC
             
             # Obtengo rutas y configuración ya existentes
             Ruta_Medicion_Entrada, Ruta_Medicion_Carga_Descarga, Ruta_archivo_config, Archivo_Generador, Archivo_Capacitor, Archivo_Config = Funciones_Archivos.Ruta_de_analisis_existente()
-            Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time = Funciones_Archivos.extraccion_datos(Ruta_archivo_config)
+            Modo, Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time = Funciones_Archivos.extraccion_datos(Ruta_archivo_config)
+            Modo_Registro = "REGISTRO_UNICO" if Ruta_Medicion_Entrada is None else "DOS_REGISTROS"
             
             estado_actual = "EXTRACCION"
         
+        # Opción 3: Campaña de mediciones desatendida
+        elif modo_u== '3':
+            Ruta_campania = Funciones_Archivos.Ruta_de_campania()
+            estado_actual = "CAMPANIA"
+        
         else:
             Funciones_Archivos.limpiar_pantalla()
             print("Opción incorrecta")
@@ -90,12 +109,21 @@ while True: ######################################################## BUCLE PRINC
 
     elif estado_actual == "INICIALIZACION":   
         
+        # El instrumental queda reservado hasta el último registro: una campaña en otra instancia no puede
+        # reconfigurar el generador mientras se cambia la llave entre el registro del generador y el del capacitor
+        Bloqueo = Funciones_Adquisicion.Bloqueo_Instrumental().tomar()
+        
         with HP3245A("GPIB0::9::INSTR") as gen:
             gen.configurar_generador_full(
             Frec= Frec,
             Sweep_Time     = Sweep_time,    
         )
-        estado_actual = "MEDICION_GEN"
+        if Modo_Registro == "DOS_REGISTROS":
+            estado_actual = "MEDICION_GEN"
+        elif Modo_Registro == "SECUENCIAL":
+            estado_actual = "MEDICION_SEC"
+        else:
+            estado_actual = "MEDICION_MUL"
 
 ######################################################################################################################################################################################
 ########################################################## CONFIGURA MULTIMETRO Y MIDE GENERADOR DE TENSION ######################################################################
@@ -119,14 +147,75 @@ while True: ######################################################## BUCLE PRINC
 
     elif estado_actual == "MEDICION_MUL":
         
+        # El registro del capacitor se conserva como códigos SINT + ISCALE (int16 en memoria y en disco)
         with HP3458A("GPIB0::22::INSTR") as dvm:
-            Medicion_Capacitor=dvm.configurar_y_medir_tension(Cant_Muestras, Sweep_time, Aper_Time)
+            Medicion_Capacitor, Escala_Capacitor = dvm.Medicion_de_Codigos(Cant_Muestras, Sweep_time, Aper_Time, Funciones_Adquisicion.Demora_Sincronizada_INTI(Frec, Sweep_time))
+            dvm.Graficar_datos(Funciones_Medicion.Tension_Registro(Medicion_Capacitor,Escala_Capacitor), Sweep_time)
         
-        Funciones_Archivos.Guardar_Medicion(Ruta_Medicion_Carga_Descarga,Medicion_Capacitor)
+        Funciones_Adquisicion.Verificar_Arranque_INTI(Medicion_Capacitor, Sweep_time, Frec)
+        Ruta_Medicion_Carga_Descarga = Funciones_Archivos.Guardar_Registro(Ruta_Medicion_Carga_Descarga,Medicion_Capacitor,Escala_Capacitor)
+        Piramide_Capacitor = Funciones_Archivos.Cargar_Piramide(Ruta_Medicion_Carga_Descarga,Medicion_Capacitor)
+        
+        if Modo_Registro == "REGISTRO_UNICO":
+            Funciones_Archivos.Guardar_Medicion_Config(Ruta_archivo_config,modo_u,Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time)
         
+        # Triage del registro antes del análisis: si se rechaza se puede repetir la adquisición enseguida
+        Triage = Funciones_Medicion.Triage_Registro(Medicion_Capacitor,Sweep_time,Frec,Escala_Capacitor)
+        if not Triage["Valido"]:
+            print("Registro rechazado por el triage:\n - " + "\n - ".join(Triage["Motivos"]))
+            if input("¿Repetir la medición del capacitor? (s/n): ").strip().lower() == "s":
+                continue
         
+        Bloqueo.liberar()
         estado_actual = "CALCULO"
 
+######################################################################################################################################################################################
+###################################################### MEDICION SECUENCIAL HASTA LA INCERTIDUMBRE OBJETIVO ######################################################################
+######################################################################################################################################################################################            
+
+    elif estado_actual == "MEDICION_SEC":
+        
+        Cx, ucx, ucxp, slope_vector, Cantidad_ciclos_validos, Cantidad_de_muestras, V_max, Motivo, Medicion_Capacitor = Funciones_Adquisicion.Medir_Secuencial(
+                                                                                                                                    "Set INTI",
+                                                                                                                                    Sweep_time,
+                                                                                                                                    Frec,
+                                                                                                                                    Vn_Rp + Rcablegenerador,
+                                                                                                                                    Vn_Cx,
+                                                                                                                                    Vn_Rp,
+                                                                                                                                    Objetivo_ucp,
+                                                                                                                                    Apertura=Aper_Time,
+                                                                                                                                    Max_Muestras=Max_Muestras,
+                                                                                                                                    tau_inicial=Vn_Tau,
+                                                                                                                                    incluir_descarga=Incluir_Descarga)
+        Bloqueo.liberar()
+        
+        Funciones_Archivos.Guardar_Medicion(Ruta_Medicion_Carga_Descarga,Medicion_Capacitor)
+        Funciones_Archivos.Guardar_Medicion_Config(Ruta_archivo_config,modo_u,Vn_Cx, Vn_Rp, Vn_Tau, Frec, Sweep_time)
+        
+        Funciones_Archivos.limpiar_pantalla()
+        print(f"Adquisición finalizada por {Motivo}: {Cantidad_de_muestras} muestras, {Cantidad_ciclos_validos} ciclos válidos\n")
+        print(f"Tensión máxima del generador: {V_max:.6f} V\n")
+        
+        Funciones_Medicion.Mostrar_Resultados(Cx,ucx, ucxp, Vn_Rp,None,Ruta_Medicion_Carga_Descarga,Ruta_archivo_config)
+        
+        input("Presionar Enter para continuar") 
+        Funciones_Archivos.limpiar_pantalla()
+        estado_actual = "FINALIZACION"
+
+######################################################################################################################################################################################
+################################################################# CAMPAÑA DE MEDICIONES ##############################################################################################
+######################################################################################################################################################################################     
+
+    elif estado_actual == "CAMPANIA":
+        
+        Funciones_Archivos.limpiar_pantalla()
+        Trabajos = Funciones_Campania.Cargar_Campania(Ruta_campania)
+        Ruta_tabla_campania = Funciones_Campania.Ejecutar_Campania(Trabajos)
+        
+        print(f"Tabla de la campaña:\n {Ruta_tabla_campania}\n")
+        input("Presionar Enter para continuar") 
+        estado_actual = "FINALIZACION"
+
 ######################################################################################################################################################################################
 ################################################################# EXTRAE MEDICIONES DE ARCHIVOS YA CREADOS ###########################################################################
 ######################################################################################################################################################################################     
@@ -135,13 +224,26 @@ while True: ######################################################## BUCLE PRINC
         
         Funciones_Archivos.limpiar_pantalla()
         
-        # Se transforman los archivos en formato txt a ndarrays
-        Medicion_Generador = np.loadtxt(Ruta_Medicion_Entrada)            
-        Medicion_Capacitor = np.loadtxt(Ruta_Medicion_Carga_Descarga)
+        # Se transforman los archivos a ndarrays (los .npy quedan como códigos SINT con su escala)
+        if Analisis_Por_Bloques and Modo_Registro == "REGISTRO_UNICO" and Metodo_Ajuste == "LINEALIZACION":
+            # Solo se abre el registro; Procesamiento_Por_Bloques lo lee de a un bloque
+            Medicion_Capacitor, Escala_Capacitor = Funciones_Archivos.Cargar_Registro(Ruta_Medicion_Carga_Descarga) if Ruta_Medicion_Carga_Descarga.endswith(".npy") else (Ruta_Medicion_Carga_Descarga, None)
+        else:
+            Medicion_Capacitor, Escala_Capacitor = Funciones_Archivos.Cargar_Registro(Ruta_Medicion_Carga_Descarga)
+        
+        # Pirámide de mínimos y máximos guardada junto a los registros .npy (detección de grueso a fino)
+        Piramide_Capacitor = Funciones_Archivos.Cargar_Piramide(Ruta_Medicion_Carga_Descarga) if Ruta_Medicion_Carga_Descarga.endswith(".npy") else None
+        if Modo_Registro == "DOS_REGISTROS":
+            Medicion_Generador = np.loadtxt(Ruta_Medicion_Entrada)            
+            print("Datos generador cargados:", Medicion_Generador.shape)
+        
+        if not isinstance(Medicion_Capacitor, str):
+            Triage = Funciones_Medicion.Triage_Registro(Medicion_Capacitor,Sweep_time,Frec,Escala_Capacitor)
+            if not Triage["Valido"]:
+                print("Advertencia, el triage rechaza el registro:\n - " + "\n - ".join(Triage["Motivos"]))
         
         #Muestro por pantalla la cantidad de datos cargados
-        print("Datos generador cargados:", Medicion_Generador.shape)
-        print("Datos capacitor cargados:", Medicion_Capacitor.shape)
+        print("Datos capacitor cargados:", np.shape(Medicion_Capacitor) if not isinstance(Medicion_Capacitor, str) else "por bloques")
 
         estado_actual = "CALCULO"
 
@@ -152,21 +254,91 @@ while True: ######################################################## BUCLE PRINC
     elif estado_actual == "CALCULO":
         
         Funciones_Archivos.limpiar_pantalla()
-        V_max, V_max_std = Funciones_Medicion.analizar_senal_cuadrada(Medicion_Generador)
-
-        Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig = Funciones_Medicion.Procesamiento_CargayDescarga(
-                                                                                                                                    Ruta_Medicion_Carga_Descarga,                                                                                                                                    
-                                                                                                                                    Medicion_Capacitor,
-                                                                                                                                    V_max,
+        
+        if Metodo_Ajuste in Funciones_Medicion.Metodos_Sin_Vmax:
+            Cx, tau, utau_A, Cantidad_ciclos_validos = Funciones_Medicion.Procesamiento_Sin_Vmax(
+                                                                                                                                    Metodo_Ajuste,
+                                                                                                                                    Funciones_Medicion.Tension_Registro(Medicion_Capacitor,Escala_Capacitor),
                                                                                                                                     Sweep_time,
-                                                                                                                                    Vn_Rp,
-                                                                                                                                    Rcablegenerador)
+                                                                                                                                    Frec,
+                                                                                                                                    Vn_Rp + Rcablegenerador,
+                                                                                                                                    tau_inicial=Vn_Tau,
+                                                                                                                                    incluir_descarga=Incluir_Descarga,
+                                                                                                                                    Medicion_Generador=Medicion_Generador if Modo_Registro == "DOS_REGISTROS" else None,
+                                                                                                                                    Vn_Cx=Vn_Cx)
+            print(f"Método {Metodo_Ajuste}: tau = {tau:.9f} s con {Cantidad_ciclos_validos} semiciclos/armónicos\n")
+            
+            # Estos métodos no usan V_max: el término de gamma no interviene
+            V_dig, V_max, uVM_A, fraccion_carga = 1-np.exp(-1), 1.0, 0.0, 0.0
+            ucx, ucxp  = Funciones_Medicion.Calculo_Incertidumbre_Tau(tau,utau_A,V_dig,V_max,Vn_Cx,Vn_Rp,fraccion_carga=fraccion_carga)
         
-        Cx         = np.mean(Cx_vector)
-        ucx, ucxp  = Funciones_Medicion.Calculo_Incertidumbre(Cx,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig,V_max,Vn_Cx,Vn_Rp)
+        else:
+            if Modo_Registro == "REGISTRO_UNICO" and Analisis_Por_Bloques and Metodo_Ajuste == "LINEALIZACION":
+                Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig,Cantidad_cargas,V_max,V_max_std,V_off = Funciones_Medicion.Procesamiento_Por_Bloques(
+                                                                                                                                        Medicion_Capacitor,
+                                                                                                                                        Sweep_time,
+                                                                                                                                        Vn_Rp + Rcablegenerador,
+                                                                                                                                        incluir_descarga=Incluir_Descarga,
+                                                                                                                                        Escala=Escala_Capacitor,
+                                                                                                                                        Frec=Frec,
+                                                                                                                                        tau_inicial=Vn_Tau)
+                uVM_A = V_max_std/np.sqrt(Cantidad_ciclos_validos)
+            elif Modo_Registro == "REGISTRO_UNICO":
+                Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig,Cantidad_cargas,V_max,V_max_std,V_off,Tabla_Calidad = Funciones_Medicion.Procesamiento_Registro_Unico(
+                                                                                                                                        Medicion_Capacitor,
+                                                                                                                                        Sweep_time,
+                                                                                                                                        Frec,
+                                                                                                                                        Vn_Rp + Rcablegenerador,
+                                                                                                                                        tau_inicial=Vn_Tau,
+                                                                                                                                        incluir_descarga=Incluir_Descarga,
+                                                                                                                                        Escala=Escala_Capacitor,
+                                                                                                                                        Piramide=Piramide_Capacitor,
+                                                                                                                                        Segmentacion=Segmentacion_Ciclos,
+                                                                                                                                        Sincronico=Metodo_Ajuste == "SINCRONICO",
+                                                                                                                                        Calidad=True)
+                uVM_A = V_max_std/np.sqrt(Cantidad_ciclos_validos)
+                if Tabla_Calidad is not None:
+                    print(Funciones_Medicion.Resumen_Calidad(Tabla_Calidad))
+                    print(f"Tabla de calidad por ciclo: {Funciones_Archivos.Guardar_Calidad_Ciclos(Ruta_Medicion_Carga_Descarga, Tabla_Calidad)}\n")
+            else:
+                V_max, V_max_std = Funciones_Medicion.analizar_senal_cuadrada(Medicion_Generador)
+                if Metodo_Ajuste == "SINCRONICO":
+                    Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig,_ = Funciones_Medicion.Procesamiento_Sincronico(
+                                                                                                                                        Medicion_Capacitor,
+                                                                                                                                        V_max,
+                                                                                                                                        Sweep_time,
+                                                                                                                                        Frec,
+                                                                                                                                        Vn_Rp + Rcablegenerador,
+                                                                                                                                        incluir_descarga=False,
+                                                                                                                                        Escala=Escala_Capacitor)
+                else:
+                    Cx_vector,slope_vector,intercept_vector,r_value_vector,std_err_vector,Cantidad_ciclos_validos,Cantidad_de_muestras,V_dig = Funciones_Medicion.Procesamiento_Curva(
+                                                                                                                                        Funciones_Medicion.Tension_Registro(Medicion_Capacitor,Escala_Capacitor),
+                                                                                                                                        V_max,
+                                                                                                                                        Sweep_time,
+                                                                                                                                        Vn_Rp + Rcablegenerador)
+                uVM_A = 0.0
+                Cantidad_cargas = None
+            
+            print(f"Tensión máxima del generador: {V_max:.6f} V ± {V_max_std:.6f} V\n")
+            
+            Cx         = np.mean(Cx_vector)
+            ucx, ucxp  = Funciones_Medicion.Calculo_Incertidumbre(slope_vector,Cantidad_ciclos_validos,V_dig,V_max,Vn_Cx,Vn_Rp,uVM_A=uVM_A,Cantidad_cargas=Cantidad_cargas)
+            
+            tau            = -1/np.mean(slope_vector)
+            utau_A         = np.std(slope_vector)/((np.mean(slope_vector)**2)*np.sqrt(Cantidad_ciclos_validos))
+            fraccion_carga = 1.0 if Cantidad_cargas is None else Cantidad_cargas/Cantidad_ciclos_validos
         
         Funciones_Medicion.Mostrar_Resultados(Cx,ucx, ucxp, Vn_Rp,Ruta_Medicion_Entrada,Ruta_Medicion_Carga_Descarga,Ruta_archivo_config)
         
+        if Incertidumbre_Monte_Carlo:
+            Resultado_MC = Funciones_Medicion.Calculo_Incertidumbre_Monte_Carlo(tau,utau_A,Cantidad_ciclos_validos,V_dig,V_max,Vn_Cx,Vn_Rp,
+                                                                                uVM_A=uVM_A,fraccion_carga=fraccion_carga,Rcables=Rcablegenerador)
+            Funciones_Medicion.Mostrar_Monte_Carlo(Resultado_MC)
+        
+        if Incertidumbre_Bootstrap and Metodo_Ajuste not in Funciones_Medicion.Metodos_Sin_Vmax and Cantidad_ciclos_validos > 1:
+            Funciones_Medicion.Mostrar_Bootstrap(Funciones_Medicion.Bootstrap_Ciclos(slope_vector,Vn_Rp + Rcablegenerador))
+        
         input("Presionar Enter para continuar") 
         Funciones_Archivos.limpiar_pantalla()
         estado_actual = "FINALIZACION"